@@ -5,6 +5,7 @@ from fastapi import FastAPI, HTTPException, Body
 from fastapi.responses import JSONResponse
 import uvicorn
 import logging
+import threading
 import time
 
 # from src.qdrant.client import QdrantClientWrapper
@@ -18,19 +19,75 @@ from src.azure_client.azure_search import (
     search_by_tag
     )
 from src.azure_client.azure_recommend import handle_recommendations
+from src.azure_client.config import warm_up as warm_up_search, check_index_dimension
+from src.azure_client.rerank import get_reranker, RERANK_ENABLED
 from src.cache.cache_client import text_search_cache, hybrid_search_cache
+from src.cache.feature_store import get_feature_store
+from src.embedding.service import embed_query
+from src.embedding.registry import registry, DimensionMismatchError
+from src.llm.llm_helpers import warm_up as warm_up_llm
+from src.llm.gateway import gateway
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
 app = FastAPI(title="Code-Semantic-Search API")
 # qdrant = QdrantClientWrapper()
 
+def warm_up():
+    """
+    Create the clients and load the models this API uses before the first request needs them.
+    Only the Azure search backends are touched; Qdrant and Elasticsearch are never loaded here.
+    """
+    start_time = time.time()
+    hooks = [
+        ("search clients", lambda: warm_up_search(model=False)),
+        ("query encoder", lambda: embed_query("warm up")),
+        ("llm", warm_up_llm),
+        ("feature store", get_feature_store),
+    ]
+    if RERANK_ENABLED:
+        hooks.append(("reranker", lambda: get_reranker().warm_up()))
+    for name, hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.warning(f"[WARM-UP] {name} failed: {e}")
+    logger.info(f"[WARM-UP] Done in {time.time() - start_time:.2f} s, models: {registry.memory_report()}")
+
+def verify_index_dimension():
+    """
+    Refuse to start when the query encoder does not match the index's vector field: every
+    vector search would fail or return garbage. Only a confirmed mismatch aborts; if the
+    index cannot be reached or is not configured, the check is skipped with a warning.
+    """
+    try:
+        check_index_dimension()
+    except DimensionMismatchError:
+        raise
+    except Exception as e:
+        logger.warning(f"[STARTUP] Could not verify the index dimension: {e}")
+
+@app.on_event("startup")
+def start_warm_up():
+    # Runs before the server accepts connections; raising here aborts startup
+    verify_index_dimension()
+    # Warm up in the background so the server accepts connections immediately
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 # Root endpoint
 @app.get("/")
 def read_root():
     return {"message": "API is running"}
 
+# Per-prompt LLM latency, throttling and token usage, and hedging/breaker state since startup
+@app.get("/llm/stats")
+def llm_stats():
+    return {"prompts": gateway.report(), "hedging": gateway.hedger.report()}
+
 # Endpoint to index data
 # @app.post("/index", response_model=dict)
 # async def index_data(request: IndexRequest):
@@ -47,9 +104,11 @@ def read_root():
 #         logger.error(f"Error indexing data: {str(e)}")
 #         raise HTTPException(status_code=500, detail=str(e))
 
+# Search endpoints are plain `def`: FastAPI runs them in its threadpool, so concurrent
+# requests block there (not on the event loop) and their query embeddings can be batched
 # Endpoint for vector search
 @app.post("/search/vector", response_model=SearchResponse)
-async def vector_search_api(request: SearchRequest):
+def vector_search_api(request: SearchRequest):
     try:
         start_time = time.time()
 
@@ -65,7 +124,7 @@ async def vector_search_api(request: SearchRequest):
 
 # Endpoint for full text search using Qdrant payload filtering
 @app.post("/search/text", response_model=SearchResponse)
-async def text_search_api(request: SearchRequest):
+def text_search_api(request: SearchRequest):
     try:
         start_time = time.time()
 
@@ -73,6 +132,7 @@ async def text_search_api(request: SearchRequest):
             request.query,
             # text_search_cache.cache,
             top_k=request.limit,
+            scoring_profile=request.scoring_profile,
             # threshold=request.threshold
         )
 
@@ -84,11 +144,11 @@ async def text_search_api(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.post("/search/hybrid", response_model=SearchResponseHybrid)
-async def hybrid_search_api(request: SearchRequest):
+def hybrid_search_api(request: SearchRequest):
     try:
         start_time = time.time()
 
-        search_result = hybrid_search(request.query, request.limit)
+        search_result = hybrid_search(request.query, request.limit, scoring_profile=request.scoring_profile)
         # print(search_result)
         # result=search_result.get('result',[])
         suggest_topic=search_result.get('suggest_topic',{})
@@ -104,11 +164,11 @@ async def hybrid_search_api(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/search/tag", response_model=SearchResponse)
-async def tag_search_api(request: SearchRequest):
+def tag_search_api(request: SearchRequest):
     try:
         start_time = time.time()
 
-        result = search_by_tag(request.query, request.limit)
+        result = search_by_tag(request.query, request.limit, scoring_profile=request.scoring_profile)
 
         elapsed = time.time() - start_time
         logger.info(f"[TAG SEARCH] Query: '{request.query}' | Time: {elapsed:.3f} s")
@@ -4,9 +4,6 @@ import json
 import dotenv
 dotenv.load_dotenv()
 
-print('Host: ',os.getenv("REDIS_HOST"))
-print('key: ', os.getenv("REDIS_PASSWORD"))
-print('port', os.getenv("REDIS_PORT"))
 def get_redis_client():
     return redis.StrictRedis(
         host=os.getenv("REDIS_HOST"),
@@ -32,5 +29,8 @@ def set_cache(key: str, value, ttl=600):
     except Exception as e:
         print(f"[REDIS SET ERROR]: {e}")
 
-set_cache("recommendation", {"test": "Hello Azure Redis!"})
-print(get_cache('recommendation'))
\ No newline at end of file
+if __name__ == "__main__":
+    print('Host: ',os.getenv("REDIS_HOST"))
+    print('port', os.getenv("REDIS_PORT"))
+    set_cache("recommendation", {"test": "Hello Azure Redis!"})
+    print(get_cache('recommendation'))
@@ -19,6 +19,7 @@ class SearchHybridAndTagResponse(BaseModel):
 class SearchRequest(BaseModel):
     query: str
     limit: int = 5
+    scoring_profile: Optional[str] = None
     
 class SearchRequestTextCache(BaseModel):
     query: str
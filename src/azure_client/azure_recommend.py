@@ -2,7 +2,8 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from typing import List
-from src.azure_client.config import search_client
+from src.azure_client.config import get_search_client
+from src.azure_client.filter.odata_filter import escape_odata_string
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import logging
@@ -36,7 +37,7 @@ def search_with_sort(top: int, sort_fields: List[str]) -> List[RepoDoc]:
         order_by = [f"{field} desc" for field in sort_fields]
         # print(f"[DEBUG] order_by: {order_by}")
 
-        results = list(search_client.search(search_text="*", top=top, order_by=order_by))
+        results = list(get_search_client().search(search_text="*", top=top, order_by=order_by))
         # print(f"[DEBUG] Raw results from Azure Search:")
         # for doc in results:
         #     print(doc)
@@ -61,7 +62,7 @@ def search_with_sort_and_date_filter(top: int, from_date: str, sort_fields: List
         filter_expr = f"date ge {from_date}"
         order_by = [f"{field} desc" for field in sort_fields]
         logger.info(f"[search_with_sort_and_date_filter] filter_expr = {filter_expr}, order_by = {order_by}")
-        results = search_client.search(search_text="*", filter=filter_expr, top=top, order_by=order_by)
+        results = get_search_client().search(search_text="*", filter=filter_expr, top=top, order_by=order_by)
         docs = [RepoDoc(**doc) for doc in results]
         logger.info(f"[search_with_sort_and_date_filter] Retrieved {len(docs)} results (sorted in Azure Search)")
         for doc in docs:
@@ -75,9 +76,9 @@ def search_with_sort_and_date_filter(top: int, from_date: str, sort_fields: List
 
 def search_by_tag(tag: str, top: int) -> List[RepoDoc]:
     try:
-        filter_expr = f"tags/any(t: t eq '{tag}')"
+        filter_expr = f"tags/any(t: t eq '{escape_odata_string(tag)}')"
         order_by = ["stars desc"]
-        results = search_client.search(search_text="*", top=top, filter=filter_expr, order_by=order_by)
+        results = get_search_client().search(search_text="*", top=top, filter=filter_expr, order_by=order_by)
         docs = [RepoDoc(**doc) for doc in results]
         logger.info(f"[search_by_tag] Tag '{tag}': found {len(docs)} documents (sorted in Azure Search).")
         for doc in docs:
@@ -93,7 +94,7 @@ def search_by_tag(tag: str, top: int) -> List[RepoDoc]:
 
 def get_top_tags(size: int = 10) -> List[str]:
     try:
-        results = search_client.search(search_text="*", facets=[f"tags,count:{size}"], top=0)
+        results = get_search_client().search(search_text="*", facets=[f"tags,count:{size}"], top=0)
         facets = results.get_facets() if hasattr(results, 'get_facets') else None
         tags_facet = facets.get("tags", []) if facets else []
         return [item["value"] for item in tags_facet if item["value"] != "(none)"]
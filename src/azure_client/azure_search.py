@@ -1,25 +1,35 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.llm.llm_helpers import llm_preprocess, query_generate_related
+from src.llm.llm_helpers import llm_understand_query
 from src.llm.utils import filter_results
-from src.azure_client.boosted_score import sort_results_by_boosted_score
-from src.azure_client.config import index_search_field, index_name,  search_client, model
+from src.azure_client.boosted_score import rank_results_by_boosted_score
+from src.azure_client.rerank import get_reranker, RERANK_ENABLED
+from src.cache.feature_store import get_feature_store
+from src.azure_client.filter.odata_filter import build_odata_filter, escape_odata_string
+from src.azure_client.config import get_index_client, index_name, get_search_client, DEFAULT_SCORING_PROFILE
+from src.embedding.service import embed_query, embed_queries
 from src.cache.cache_client import text_search_cache, hybrid_search_cache
 from src.cache.utils import *
-from azure.search.documents.models import VectorizedQuery
-from typing import List
+from azure.search.documents.models import VectorizedQuery, VectorFilterMode
+from typing import List, Optional, Dict, Any
 import re
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+# Hybrid search also embeds the raw query next to the LLM rewrite (one batched forward pass)
+# and sends both vectors in the same request; Azure Search fuses them with the text query.
+MULTI_VECTOR_QUERY = os.getenv("AZURE_AI_SEARCH_MULTI_VECTOR", "true").lower() in ("1", "true", "yes")
+RAW_QUERY_VECTOR_WEIGHT = float(os.getenv("AZURE_AI_SEARCH_RAW_VECTOR_WEIGHT", "1.0"))
+
 def normalize_query(query: str) -> str:
     query = query.strip().lower()
     return re.sub(r'\s+', ' ', query) 
 
-def get_field_index(exclude: List[str] = ["vector", "id"]) -> List[str]:
-    index = index_search_field.get_index(name=index_name)
+def get_field_index(exclude: List[str] = ["vector"]) -> List[str]:
+    index = get_index_client().get_index(name=index_name)
     exclude_set = set(exclude)
     return [
         f.name for f in index.fields
@@ -27,13 +37,19 @@ def get_field_index(exclude: List[str] = ["vector", "id"]) -> List[str]:
     ]
 
 # # ======== FULL TEXT SEARCH ========
-def full_text_search(query: str, top_k: int = 50):
-    _, parse_query = llm_preprocess(query)
+def full_text_search(query: str, top_k: int = 50, scoring_profile: Optional[str] = None,
+                     parse_query: Optional[Dict[str, Any]] = None):
+    if parse_query is None:
+        _, understanding = llm_understand_query(query)
+        parse_query = understanding.parse_query()
     print(f"Parsed query: {parse_query}")
 
     final_query = parse_query.get("rewritten_query") or query
-    results = search_client.search(
+    filter_expr = build_odata_filter(parse_query.get("filters", {}))
+    results = get_search_client().search(
         search_text=final_query, 
+        filter=filter_expr,
+        scoring_profile=scoring_profile or DEFAULT_SCORING_PROFILE,
         top=top_k,
         select= get_field_index()
         )
@@ -50,11 +66,15 @@ def text_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
     Perform text search with semantic cache.
     If cache hit, return cached result. If miss, query DB and cache the result.
     """
-    _, llm_result = llm_preprocess(query)
+    _, understanding = llm_understand_query(query)
+    llm_result = understanding.parse_query()
     rewritten_query = llm_result.get("rewritten_query") or query
-    intent_str, query_vector, reasoning = get_intent_and_vector(rewritten_query)
-    result = find_in_cache(query_vector, cache, threshold=threshold)
-    logger.info(f"Checking result in cache: {result}")
+    result = query_vector = None
+    if understanding.semantic_cache:
+        intent_str, query_vector, reasoning = get_intent_and_vector(
+            rewritten_query, {"intent": understanding.intent, "reasoning": understanding.intent_reasoning})
+        result = find_in_cache(query_vector, cache, threshold=threshold)
+        logger.info(f"Checking result in cache: {result}")
 
     if result is not None:
         cached_result, sim = result
@@ -69,8 +89,9 @@ def text_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
         return cached_result
     else:
         print("Cache miss. Querying DB...")
-        results = search_client.search(
+        results = get_search_client().search(
             search_text=query, 
+            filter=build_odata_filter(llm_result.get("filters", {})),
             top=top_k,
             select= get_field_index()
             )
@@ -79,7 +100,8 @@ def text_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
         for result in results:
             results_return.append(result)
             
-        cache[query_vector] = results_return
+        if query_vector is not None:
+            store_in_cache(cache, query_vector, results_return)
         
         # # Debug cache info after adding
         # try:
@@ -108,17 +130,42 @@ def text_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
         return results_return
 
 
-def vector_search(query: str, top_k: int = 50):
-    vector_embedding = model.encode(query).tolist()
+def build_vector_queries(texts: List[str], top_k: int = 50, weights: Optional[List[float]] = None) -> List[VectorizedQuery]:
+    """
+    One VectorizedQuery per distinct non-empty text, encoded in a single batch.
+    A weight other than 1.0 scales that vector's contribution to the fused ranking.
+    """
+    weights = weights or [1.0] * len(texts)
+    unique = {}
+    for text, weight in zip(texts, weights):
+        if text and text not in unique:
+            unique[text] = weight
+    vectors = embed_queries(list(unique))
+    return [
+        VectorizedQuery(
+            vector=vector.tolist(),
+            k_nearest_neighbors=top_k,
+            fields="vector",
+            **({"weight": weight} if weight != 1.0 else {})
+        )
+        for vector, weight in zip(vectors, unique.values())
+    ]
+
+
+def vector_search(query: str, top_k: int = 50, filters: Optional[Dict[str, Any]] = None):
+    vector_embedding = embed_query(query).tolist()
     vector_query = VectorizedQuery(
         vector=vector_embedding,                  
         k_nearest_neighbors=top_k,      
         fields="vector"
     )
 
-    results = search_client.search(
+    # Pre-filter so the k nearest neighbours are taken from matching documents only
+    results = get_search_client().search(
         search_text=None,
         vector_queries=[vector_query],
+        filter=build_odata_filter(filters),
+        vector_filter_mode=VectorFilterMode.PRE_FILTER,
         top=top_k,
         select=get_field_index()
     )
@@ -129,50 +176,68 @@ def vector_search(query: str, top_k: int = 50):
     return results_return
 
 
-def hybrid_search(query: str, top_k: int = 50):
+def hybrid_search(query: str, top_k: int = 50, scoring_profile: Optional[str] = None, rerank: Optional[bool] = None):
+    """
+    With a scoring profile (argument or AZURE_AI_SEARCH_SCORING_PROFILE), Azure Search ranks
+    by relevance, freshness and popularity, and the client-side boosted rerank is skipped.
+    With rerank (argument or RERANK_ENABLED), the top candidates are then reordered by a
+    local cross-encoder within a fixed time budget.
+    """
     query = normalize_query(query)
-    _, parse_query = llm_preprocess(query)
+    scoring_profile = scoring_profile or DEFAULT_SCORING_PROFILE
+    # Filters, rewrite and related queries come from one LLM completion
+    _, understanding = llm_understand_query(query)
+    parse_query = understanding.parse_query()
 
     search_text_rewritten = parse_query.get("rewritten_query") or query
     filters = parse_query.get("filters", {})
     topics = filters.get("topics", [])
     query_vector_required = parse_query.get("query_vector_required", True)
+    filter_expr = build_odata_filter(filters)
+    engine_ranked = bool(scoring_profile)
 
     if query_vector_required:
-        vector_embedding = model.encode(search_text_rewritten).tolist()
-        # Hybrid Search function
-        vector_query = VectorizedQuery(
-            vector=vector_embedding,
-            k_nearest_neighbors=top_k,
-            fields="vector"
-        )
+        # Rewritten and raw query vectors (one when they match) plus the text query, fused by Azure Search
+        if MULTI_VECTOR_QUERY:
+            vector_queries = build_vector_queries([search_text_rewritten, query], top_k=top_k,
+                                                  weights=[1.0, RAW_QUERY_VECTOR_WEIGHT])
+        else:
+            vector_queries = build_vector_queries([search_text_rewritten], top_k=top_k)
 
-        results = search_client.search(
+        results = get_search_client().search(
             search_text=query,
-            vector_queries=[vector_query],
+            vector_queries=vector_queries,
+            filter=filter_expr,
+            vector_filter_mode=VectorFilterMode.PRE_FILTER,
+            scoring_profile=scoring_profile,
             top=top_k,
             select=get_field_index()
         )
         results = list(results)  # Convert from iterator
     else:
-        results = full_text_search(search_text_rewritten)
+        results = full_text_search(search_text_rewritten, top_k=top_k, scoring_profile=scoring_profile,
+                                   parse_query=parse_query)
         if not results:
-            vector_results = vector_search(search_text_rewritten)
+            vector_results = vector_search(search_text_rewritten, top_k=top_k, filters=filters)
             if vector_results and vector_results[0].get("@search.score", 0) >= 0.5:
                 results = vector_results
+                # Scoring profiles don't apply to pure vector queries
+                engine_ranked = False
             else:
                 logger.info("No result found.")
                 return None
 
+    # Filters are already applied by Azure Search; this only guards the fallback paths
     filtered_results = filter_results(results, filters)
-    ranked_results = sort_results_by_boosted_score(filtered_results)
+    if engine_ranked:
+        ranked_results = filtered_results[:top_k]
+    else:
+        ranked_results = rank_results_by_boosted_score(filtered_results, top_k=top_k, feature_store=get_feature_store())
+
+    if RERANK_ENABLED if rerank is None else rerank:
+        ranked_results = get_reranker().rerank(search_text_rewritten, ranked_results)
 
-    try:
-        _, related_queries_obj = query_generate_related(query)
-        suggest_filters = related_queries_obj.related_queries
-    except Exception as e:
-        logger.warning(f"Failed to generate related queries: {e}")
-        suggest_filters = []
+    suggest_filters = understanding.related_queries
 
     # Debug 
     # from  pprint import pprint
@@ -189,14 +254,16 @@ def hybrid_search(query: str, top_k: int = 50):
 
 def hybrid_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
     query = normalize_query(query)
-    _, parse_query = llm_preprocess(query)
+    _, understanding = llm_understand_query(query)
+    parse_query = understanding.parse_query()
     rewritten_query = parse_query.get("rewritten_query") or query
-    intent_str, query_vector, reasoning = get_intent_and_vector(rewritten_query)
     filters = parse_query.get("filters", {})
     topics = filters.get("topics", [])
     query_vector_required = parse_query.get("query_vector_required", True)
     
-    if query_vector_required:
+    if query_vector_required and understanding.semantic_cache:
+        intent_str, query_vector, reasoning = get_intent_and_vector(
+            rewritten_query, {"intent": understanding.intent, "reasoning": understanding.intent_reasoning})
         result = find_in_cache(query_vector, cache, threshold=threshold)
         logger.info(f"Checking result in cache: {result}")
 
@@ -216,27 +283,40 @@ def hybrid_search_with_semantic_cache(query, cache, top_k=50, threshold=0.8):
     
     pass
 
-def search_by_tag(tag: str, top_k: int = 50) -> list[dict]:
+def search_by_tag(tag: str, top_k: int = 50, scoring_profile: Optional[str] = None) -> list[dict]:
     """s
     Search for repositories that contain an exact tag match.
 
     Args:
         tag (str): The tag to search for (must match exactly).
         top_k (int): Max number of results to return.
+        scoring_profile (str): Optional index scoring profile; when set, Azure Search
+            ranks the results and the client-side rerank is skipped.
 
     Returns:
         List of matching documents.
     """
     # Use OData filter to match tag exactly in the collection
-    filter_expr = f"tags/any(t: t eq '{tag}')"
+    filter_expr = f"tags/any(t: t eq '{escape_odata_string(tag)}')"
+
+    scoring_profile = scoring_profile or DEFAULT_SCORING_PROFILE
+    if scoring_profile:
+        # Match-all query so the profile's freshness/popularity functions order the tag matches
+        results = get_search_client().search(
+            search_text="*",
+            filter=filter_expr,
+            scoring_profile=scoring_profile,
+            top=top_k
+        )
+        return [doc for doc in results]
 
-    results = search_client.search(
+    results = get_search_client().search(
         search_text="",  # empty disables full-text search
         filter=filter_expr,
         top=top_k
     )
     results_unranked = [doc for doc in results]
-    ranked_results = sort_results_by_boosted_score(results_unranked)
+    ranked_results = rank_results_by_boosted_score(results_unranked, top_k=top_k, feature_store=get_feature_store())
 
     return ranked_results
 
@@ -247,11 +327,11 @@ if __name__ == "__main__":
     # query_2 = "Machine Learning with Azure AI"
     # query_3 = "JavaScript libraries for data visualization"
     # print("\n--- First run ---")
-    # result_1 = text_search_with_semantic_cache(query_1, text_search_cache.cache, top_k= 5)
+    # result_1 = text_search_with_semantic_cache(query_1, text_search_cache, top_k= 5)
     # pprint(result_1)
 
     # print("\n--- Second run ---")
-    # result_2 = text_search_with_semantic_cache(query_3, text_search_cache.cache, top_k= 5)
+    # result_2 = text_search_with_semantic_cache(query_3, text_search_cache, top_k= 5)
     # pprint(result_2)
 
 
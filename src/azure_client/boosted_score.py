@@ -1,4 +1,15 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+import time
+import numpy as np
+from src.cache.feature_store import MISSING_DAYS
+
+SEARCH_SCORE_WEIGHT = 0.8
+BOOST_WEIGHT = 0.2
+DEFAULT_DATE = "2024-01-01"
 
 def get_field(doc, field):
     # Prefer meta_data, fallback to top-level
@@ -12,7 +23,7 @@ def sort_results_by_boosted_score(results):
     for r in results:
         # Robustly get stars and date
         stars = get_field(r, "stars") or 0
-        date_str = get_field(r, "date") or r.get("date", "2024-01-01")
+        date_str = get_field(r, "date") or r.get("date", DEFAULT_DATE)
         if "T" in date_str:
             date_str = date_str.split("T")[0]  # removes time and 'Z'
         try:
@@ -24,16 +35,140 @@ def sort_results_by_boosted_score(results):
         boosted_score = stars / days_since_release
 
         search_score = r.get("@search.score") or 0  # fallback if missing
-        final_score = 0.8 * search_score + 0.2 * boosted_score
+        final_score = SEARCH_SCORE_WEIGHT * search_score + BOOST_WEIGHT * boosted_score
 
         r["boosted_score"] = boosted_score
         r["final_score"] = final_score
 
-        print(f"[{r.get('title')}] stars: {stars}, created day: {date_str}, days: {days_since_release}, boosted_score: {boosted_score:.4f}, final_score: {final_score:.4f}")
-    print(today)
     results.sort(key=lambda x: x["final_score"], reverse=True)
     return results
 
+def _parse_dates(date_strs: List[str], today: np.datetime64) -> np.ndarray:
+    """Parse yyyy-mm-dd prefixes into datetime64[D]; unparsable dates count as today."""
+    try:
+        return np.array(date_strs, dtype="datetime64[D]")
+    except ValueError:
+        parsed = np.empty(len(date_strs), dtype="datetime64[D]")
+        for i, date_str in enumerate(date_strs):
+            try:
+                parsed[i] = np.datetime64(date_str, "D")
+            except ValueError:
+                parsed[i] = today
+        return parsed
+
+def extract_rank_features(results: List[Dict[str, Any]], feature_store=None):
+    """
+    Pull stars, creation dates and search scores out of the results in one pass.
+    Returns three numpy arrays aligned with results: stars, creation date as days since
+    epoch, and search scores. With a feature store snapshot, stars and dates of known
+    repositories come from its arrays; only unknown ones are read from the result dicts.
+    Documents indexed with `created_days` skip date parsing.
+    """
+    n = len(results)
+    scores = np.fromiter(((r.get("@search.score") or 0) for r in results), dtype=np.float64, count=n)
+    stars = np.zeros(n, dtype=np.float64)
+    created_days = np.zeros(n, dtype=np.int64)
+    known = np.zeros(n, dtype=bool)
+
+    if feature_store is not None:
+        rows = feature_store.rows([r.get("id") for r in results])
+        known = rows >= 0
+        known_rows = rows[known]
+        stars[known] = feature_store.stars[known_rows]
+        days = feature_store.created_days[known_rows]
+        created_days[known] = days
+        # Repositories without a stored creation date fall back to the result dict
+        known[np.flatnonzero(known)[days == MISSING_DAYS]] = False
+
+    unparsed_idx = []
+    unparsed_dates = []
+    for i in np.flatnonzero(~known).tolist():
+        r = results[i]
+        meta = r.get("meta_data") or {}
+        stars[i] = meta.get("stars", r.get("stars")) or 0
+        days = r.get("created_days")
+        if days is not None:
+            created_days[i] = days
+        else:
+            unparsed_idx.append(i)
+            unparsed_dates.append(str(meta.get("date", r.get("date")) or DEFAULT_DATE)[:10])
+
+    if unparsed_idx:
+        today = np.datetime64(datetime.today().date(), "D")
+        parsed = _parse_dates(unparsed_dates, today)
+        created_days[unparsed_idx] = parsed.astype(np.int64)
+    return stars, created_days, scores
+
+def rank_results_by_boosted_score(results: List[Dict[str, Any]], top_k: Optional[int] = None, feature_store=None) -> List[Dict[str, Any]]:
+    """
+    Vectorized equivalent of sort_results_by_boosted_score.
+
+    Scores are computed with numpy over the whole result set, and only the best
+    `top_k` results are fully sorted (argpartition first). Each returned result gets
+    `boosted_score` and `final_score` like the loop version. `feature_store` is an
+    optional FeatureSnapshot (src/cache/feature_store.py) for O(1) feature lookups.
+    """
+    n = len(results)
+    if n == 0:
+        return []
+    k = n if top_k is None else max(0, min(top_k, n))
+    if k == 0:
+        return []
+
+    stars, created_days, scores = extract_rank_features(results, feature_store)
+    today_days = np.datetime64(datetime.today().date(), "D").astype(np.int64)
+    days = np.maximum(today_days - created_days, 1)
+    boosted = stars / days
+    final = SEARCH_SCORE_WEIGHT * scores + BOOST_WEIGHT * boosted
+
+    if k < n:
+        candidates = np.argpartition(-final, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    # Stable sort keeps the original (engine) order between equal scores
+    order = candidates[np.argsort(-final[candidates], kind="stable")]
+
+    ranked = []
+    for i in order.tolist():
+        r = results[i]
+        r["boosted_score"] = float(boosted[i])
+        r["final_score"] = float(final[i])
+        ranked.append(r)
+    return ranked
+
+def _make_benchmark_results(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    days_ago = rng.integers(1, 4000, size=n)
+    base = np.datetime64(datetime.today().date(), "D")
+    return [
+        {
+            "@search.score": float(rng.random() * 10),
+            "id": str(i),
+            "title": f"repo-{i}",
+            "stars": int(rng.integers(0, 50000)),
+            "date": f"{base - np.timedelta64(int(days_ago[i]), 'D')}T00:00:00Z",
+        }
+        for i in range(n)
+    ]
+
+def benchmark_rankers(sizes=(50, 1000, 100000), top_k: int = 50, repeat: int = 5):
+    """Compare the loop ranker and the vectorized ranker; prints best-of-`repeat` timings."""
+    for n in sizes:
+        template = _make_benchmark_results(n)
+        timings = {}
+        for name, fn in (
+            ("loop", lambda rs: sort_results_by_boosted_score(rs)[:top_k]),
+            ("vectorized", lambda rs: rank_results_by_boosted_score(rs, top_k=top_k)),
+        ):
+            best = float("inf")
+            for _ in range(repeat):
+                results = [dict(r) for r in template]
+                start = time.perf_counter()
+                fn(results)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        speedup = timings["loop"] / timings["vectorized"] if timings["vectorized"] else float("inf")
+        print(f"n={n:>7} | loop: {timings['loop'] * 1000:9.3f} ms | vectorized: {timings['vectorized'] * 1000:9.3f} ms | speedup: {speedup:5.1f}x")
 
 if __name__== "__main__":
     # Fixed test data: both results have meta_data
@@ -83,4 +218,8 @@ if __name__== "__main__":
       "score": 0
     },
     ]
-    sort_results_by_boosted_score(result)
+    for r in rank_results_by_boosted_score(result):
+        print(f"[{r.get('title')}] boosted_score: {r['boosted_score']:.4f}, final_score: {r['final_score']:.4f}")
+
+    print("\n--- Ranker benchmark ---")
+    benchmark_rankers()
@@ -1,45 +1,117 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from azure.search.documents import SearchClient
-from azure.search.documents.indexes import SearchIndexClient
-from sentence_transformers import SentenceTransformer
-from azure.core.credentials import AzureKeyCredential
+import threading
+import logging
 from dotenv import load_dotenv
+from src.embedding.registry import KNOWN_DIMENSIONS, get_encoder, registry
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 search_endpoint = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
 search_key = os.getenv("AZURE_AI_SEARCH_KEY")
 index_name = os.getenv("AZURE_AI_SEARCH_INDEX")
 index_github = os.getenv("AZURE_AI_SEARCH_GITHUB")
 
+API_VERSION = "2024-11-01-Preview"
+EMBEDDING_MODEL_NAME = os.getenv("AZURE_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+EMBEDDING_SIZE = int(os.getenv("AZURE_EMBEDDING_SIZE", KNOWN_DIMENSIONS.get(EMBEDDING_MODEL_NAME, 384)))
+
+# Scoring profile created by CosmosToAzureSearchIndexer.create_search_index, which imports this
+# name. When a request selects it, relevance/freshness/popularity ranking happens inside Azure Search.
+FRESHNESS_POPULARITY_PROFILE = "freshness-popularity"
+DEFAULT_SCORING_PROFILE = os.getenv("AZURE_AI_SEARCH_SCORING_PROFILE") or None
+
+# Clients are created on first use, not at import, so importing this module (and the
+# API that depends on it) stays cheap. The encoder lives in src.embedding.registry,
+# shared with every other pipeline that uses the same model.
+_instances = {}
+_locks = {name: threading.Lock() for name in ("search_client", "index_client", "github_ex_client")}
+
+
+def _singleton(name, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        with _locks[name]:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+
+def _credential():
+    from azure.core.credentials import AzureKeyCredential
+    if not search_endpoint or not search_key or not index_name or not index_github:
+        raise ValueError("Missing required environment variables: AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_KEY, or AZURE_AI_SEARCH_INDEX")
+    return AzureKeyCredential(search_key)
+
+
+def _search_client(index: str):
+    from azure.search.documents import SearchClient
+    return SearchClient(
+        endpoint=search_endpoint,
+        index_name=index,
+        credential=_credential(),
+        api_version=API_VERSION
+    )
+
+
+def get_search_client():
+    """Search client for the repository index."""
+    return _singleton("search_client", lambda: _search_client(index_name))
+
+
+def get_index_client():
+    """Index management client (index definitions, fields, scoring profiles)."""
+    def factory():
+        from azure.search.documents.indexes import SearchIndexClient
+        return SearchIndexClient(endpoint=search_endpoint, credential=_credential())
+    return _singleton("index_client", factory)
+
+
+def get_github_ex_client():
+    """Search client for the index of example queries used in the LLM prompt."""
+    return _singleton("github_ex_client", lambda: _search_client(index_github))
+
 
-if not search_endpoint or not search_key or not index_name or not index_github:
-    raise ValueError("Missing required environment variables: AZURE_AI_SEARCH_ENDPOINT, AZURE_AI_SEARCH_KEY, or AZURE_AI_SEARCH_INDEX")
+def get_model():
+    """
+    Query encoder from the shared model registry; EMBEDDING_BACKEND selects torch, onnx
+    or onnx-int8, all with the SentenceTransformer encode API.
+    """
+    return get_encoder(EMBEDDING_MODEL_NAME)
 
-search_client = SearchClient(
-    endpoint=search_endpoint,
-    index_name=index_name,
-    credential=AzureKeyCredential(search_key),
-    api_version="2024-11-01-Preview"
-)
 
-index_search_field = SearchIndexClient(
-    endpoint=search_endpoint,
-    credential=AzureKeyCredential(search_key),
-)
+def check_index_dimension() -> int:
+    """Fail fast when the encoder does not match the `vector` field of the search index."""
+    fields = {f.name: f for f in get_index_client().get_index(index_name).fields}
+    vector_field = fields.get("vector")
+    expected = getattr(vector_field, "vector_search_dimensions", None) if vector_field else None
+    return registry.check_dimension(EMBEDDING_MODEL_NAME, expected, f"Azure index '{index_name}'")
 
-# Github example client
 
-github_ex_client = SearchClient(
-    endpoint=search_endpoint,
-    index_name=index_github,
-    credential=AzureKeyCredential(search_key),
-    api_version="2024-11-01-Preview"
-)
+def warm_up(model: bool = True):
+    """Create the search clients and, optionally, load the encoder ahead of the first request."""
+    get_search_client()
+    get_index_client()
+    get_github_ex_client()
+    if model:
+        get_model().encode("warm up")
 
-model = SentenceTransformer("BAAI/bge-small-en-v1.5")
-EMBEDDING_SIZE=384
 
+# Backwards compatible attribute access (`config.search_client`, `from config import model`)
+# for scripts; it resolves the singleton at the point of access.
+_LAZY_ATTRIBUTES = {
+    "search_client": get_search_client,
+    "index_search_field": get_index_client,
+    "github_ex_client": get_github_ex_client,
+    "model": get_model,
+}
 
 
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
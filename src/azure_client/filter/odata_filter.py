@@ -0,0 +1,115 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def escape_odata_string(value: Any) -> str:
+    """
+    Escape a value for use inside a single-quoted OData string literal.
+    OData escapes a single quote by doubling it.
+    """
+    return str(value).replace("'", "''")
+
+
+def _parse_date(value: Any, offset_days: int = 0) -> Optional[str]:
+    """Return an OData DateTimeOffset literal for a yyyy-mm-dd value, or None if invalid."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.strptime(value.strip()[:10], "%Y-%m-%d")
+    except ValueError:
+        logger.warning(f"Ignoring invalid date filter: {value}")
+        return None
+    return (parsed + timedelta(days=offset_days)).strftime("%Y-%m-%dT00:00:00Z")
+
+
+def _clean_terms(values: Iterable[Any]) -> List[str]:
+    terms = []
+    for value in values:
+        if value is None:
+            continue
+        term = str(value).strip().lower()
+        # "|" is the search.in delimiter below, so it can't appear inside a term
+        if not term or "|" in term:
+            continue
+        # GitHub topics are hyphenated ("machine-learning"), LLM topics usually are not
+        for variant in (term, term.replace(" ", "-")):
+            if variant not in terms:
+                terms.append(variant)
+    return terms
+
+
+def tag_filter(tags: Iterable[Any]) -> Optional[str]:
+    """Match documents whose tags contain at least one of the given values."""
+    terms = _clean_terms(tags)
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return f"tags/any(t: t eq '{escape_odata_string(terms[0])}')"
+    joined = escape_odata_string("|".join(terms))
+    return f"tags/any(t: search.in(t, '{joined}', '|'))"
+
+
+def build_odata_filter(filters: Optional[Dict[str, Any]], include_tags: bool = True) -> Optional[str]:
+    """
+    Compile the `filters` dict produced by `llm_preprocess` into an OData filter expression.
+
+    Supported keys:
+        stars_min (int): stars ge N
+        created_after / created_before (yyyy-mm-dd): range on `date`
+        language (str) and topics (list): matched against `tags`; a document passes
+            when it carries at least one of the requested values
+
+    Returns None when nothing can be pushed down, so the result can be passed straight
+    to `search_client.search(filter=...)`.
+    """
+    if not filters:
+        return None
+
+    clauses = []
+
+    stars_min = filters.get("stars_min")
+    if stars_min is not None:
+        try:
+            clauses.append(f"stars ge {int(stars_min)}")
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid stars_min filter: {stars_min}")
+
+    created_after = _parse_date(filters.get("created_after"))
+    if created_after:
+        clauses.append(f"date ge {created_after}")
+
+    # created_before is inclusive of the whole day, same as filter_results
+    created_before = _parse_date(filters.get("created_before"), offset_days=1)
+    if created_before:
+        clauses.append(f"date lt {created_before}")
+
+    if include_tags:
+        tag_values = list(filters.get("topics") or [])
+        language = filters.get("language")
+        if isinstance(language, str):
+            tag_values.append(language)
+        tags_clause = tag_filter(tag_values)
+        if tags_clause:
+            clauses.append(tags_clause)
+
+    if not clauses:
+        return None
+    return " and ".join(clauses)
+
+
+if __name__ == "__main__":
+    example = {
+        "language": "python",
+        "created_after": "2024-01-01",
+        "created_before": "2024-12-31",
+        "stars_min": 100,
+        "topics": ["machine learning", "o'reilly"],
+    }
+    print(build_odata_filter(example))
@@ -1,10 +1,10 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from azure_client.config import search_client
+from azure_client.config import get_search_client
 
 def get_top_k_by_date(top_k: int):
-    results = search_client.search(
+    results = get_search_client().search(
         search_text="*",                
         order_by=["date desc"],        # Sort by most recent date
         top=top_k
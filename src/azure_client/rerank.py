@@ -0,0 +1,156 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+from cachetools import LRUCache
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+# Passes allowed in the executor at once (running + queued); requests beyond it keep the boosted order
+RERANK_MAX_PENDING = int(os.getenv("RERANK_MAX_PENDING", "2"))
+
+
+def _doc_id(doc: Dict[str, Any]) -> str:
+    meta = doc.get("meta_data") or {}
+    return str(doc.get("id") or meta.get("id") or doc.get("url") or doc.get("title"))
+
+
+def _doc_text(doc: Dict[str, Any]) -> str:
+    tags = doc.get("tags") or []
+    return " ".join(filter(None, [doc.get("title"), doc.get("short_des"), " ".join(tags)]))
+
+
+class CrossEncoderReranker:
+    """
+    Rerank the top candidates of a result list with a small CPU cross-encoder.
+
+    - The top `top_n` candidates are scored in one batched forward pass.
+    - Scores are cached per (query, doc id) in an LRU cache, so repeated queries
+      only pay for documents they have not seen yet.
+    - Scoring runs under a hard time budget. If the budget runs out, the input
+      (boosted-score) order is returned unchanged. A pass that already started still
+      finishes in the background and warms the cache for the next request; one still
+      queued is cancelled.
+    - At most `max_pending` passes are running or queued. Under sustained load, extra
+      requests skip reranking instead of queueing behind stale passes.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, top_n: int = RERANK_TOP_N,
+                 budget_ms: float = RERANK_BUDGET_MS, cache_size: int = RERANK_CACHE_SIZE,
+                 max_pending: int = RERANK_MAX_PENDING):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.max_pending = max(1, max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        self._cache_lock = threading.Lock()
+        # One worker: forward passes are CPU bound and batched, so they should not overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Loading cross-encoder {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def warm_up(self):
+        """Load the model and run one forward pass so the first request stays within budget."""
+        self._get_model().predict([("warm up", "warm up")], show_progress_bar=False)
+
+    def _score(self, query: str, docs: List[Dict[str, Any]]) -> List[float]:
+        model = self._get_model()
+        pairs = [(query, _doc_text(doc)) for doc in docs]
+        scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        scores = [float(s) for s in scores]
+        with self._cache_lock:
+            for doc, score in zip(docs, scores):
+                self._cache[(query, _doc_id(doc))] = score
+        return scores
+
+    def _cached_scores(self, query: str, docs: List[Dict[str, Any]]) -> Tuple[Dict[int, float], List[int]]:
+        cached, missing = {}, []
+        with self._cache_lock:
+            for i, doc in enumerate(docs):
+                score = self._cache.get((query, _doc_id(doc)))
+                if score is None:
+                    missing.append(i)
+                else:
+                    cached[i] = score
+        return cached, missing
+
+    def _submit(self, query: str, docs: List[Dict[str, Any]]) -> Optional[Future]:
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        future = self._executor.submit(self._score, query, docs)
+        # Also runs for cancelled passes
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        if not query or len(results) < 2:
+            return results
+
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000
+        start = time.perf_counter()
+        candidates, rest = results[:self.top_n], results[self.top_n:]
+        scores, missing = self._cached_scores(query, candidates)
+
+        if missing:
+            future = self._submit(query, [candidates[i] for i in missing])
+            if future is None:
+                logger.info(f"{self.max_pending} rerank passes already pending, keeping boosted order")
+                return results
+            try:
+                fresh = future.result(timeout=max(budget - (time.perf_counter() - start), 0))
+            except FutureTimeoutError:
+                # Drop the pass if it has not started; a running one still warms the cache
+                future.cancel()
+                logger.info(f"Rerank budget of {budget * 1000:.0f} ms exceeded, keeping boosted order")
+                return results
+            except Exception as e:
+                logger.warning(f"Rerank failed, keeping boosted order: {e}")
+                return results
+            scores.update(zip(missing, fresh))
+
+        for i, doc in enumerate(candidates):
+            doc["rerank_score"] = scores[i]
+        # Stable sort: ties keep the boosted order
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        logger.info(f"Reranked {len(candidates)} candidates ({len(missing)} scored) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return [candidates[i] for i in order] + rest
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
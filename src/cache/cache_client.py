@@ -1,5 +1,9 @@
 from cachetools import TTLCache
+from typing import Any, Optional, Tuple
+import hashlib
+import threading
 import math
+import numpy as np
 
 DEFAULT_TTL = 900  # 15 mins
 
@@ -19,5 +23,98 @@ class BaseCache:
     def clear(self):
         self.cache.clear()
 
-text_search_cache = BaseCache()
-hybrid_search_cache = BaseCache()
\ No newline at end of file
+class SemanticCache(BaseCache):
+    """
+    TTL cache keyed by query vector.
+
+    Keys are 16-byte digests of the float32 vector bytes. The vectors themselves are kept
+    L2-normalized as rows of one contiguous float32 matrix, so a lookup is a single
+    matrix-vector product instead of a Python loop over tuples. Rows of expired entries
+    are recycled lazily.
+    """
+
+    def __init__(self, ttl: int = DEFAULT_TTL, initial_capacity: int = 64):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        self._initial_capacity = initial_capacity
+        self._reset()
+
+    def _reset(self):
+        self._matrix: Optional[np.ndarray] = None
+        self._row_of = {}
+        self._keys = []
+        self._free = []
+
+    @staticmethod
+    def key_for(vector) -> bytes:
+        return hashlib.blake2b(np.ascontiguousarray(vector, dtype=np.float32).tobytes(), digest_size=16).digest()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def _alloc_row(self, dim: int) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._matrix is None:
+            self._matrix = np.zeros((self._initial_capacity, dim), dtype=np.float32)
+        elif len(self._keys) == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, dim), dtype=np.float32)
+            grown[:len(self._keys)] = self._matrix
+            self._matrix = grown
+        self._keys.append(None)
+        return len(self._keys) - 1
+
+    def _release_row(self, row: int):
+        del self._row_of[self._keys[row]]
+        self._keys[row] = None
+        self._matrix[row] = 0
+        self._free.append(row)
+
+    def _prune(self):
+        # Expired entries leave their rows behind; reclaim them once they dominate
+        if len(self._row_of) > 2 * len(self.cache) + self._initial_capacity:
+            for key, row in list(self._row_of.items()):
+                if key not in self.cache:
+                    self._release_row(row)
+
+    def put(self, vector, value) -> bytes:
+        key = self.key_for(vector)
+        with self._lock:
+            self.cache[key] = value
+            if key not in self._row_of:
+                unit = self._unit(vector)
+                row = self._alloc_row(unit.shape[0])
+                self._matrix[row] = unit
+                self._keys[row] = key
+                self._row_of[key] = row
+            self._prune()
+        return key
+
+    def lookup(self, vector, threshold: float = 0.8) -> Optional[Tuple[Any, float]]:
+        """Most similar live entry with cosine similarity above `threshold`, as (value, similarity)."""
+        with self._lock:
+            if not self._row_of:
+                return None
+            sims = self._matrix[:len(self._keys)] @ self._unit(vector)
+            candidates = np.flatnonzero(sims > threshold)
+            for row in candidates[np.argsort(-sims[candidates], kind="stable")]:
+                key = self._keys[row]
+                if key is None:
+                    continue
+                value = self.cache.get(key)
+                if value is None:
+                    self._release_row(row)
+                    continue
+                return value, float(sims[row])
+            return None
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._reset()
+
+text_search_cache = SemanticCache()
+hybrid_search_cache = SemanticCache()
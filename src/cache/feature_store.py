@@ -0,0 +1,191 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+import logging
+import numpy as np
+
+from src.data.rank_fields import to_epoch_days
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FEATURE_STORE_ENABLED = os.getenv("FEATURE_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+FEATURE_STORE_CHECK_INTERVAL = float(os.getenv("FEATURE_STORE_CHECK_INTERVAL", "60"))
+
+# Sentinel for an unknown creation date in the int32 created_days column
+MISSING_DAYS = np.iinfo(np.int32).min
+
+FEATURE_QUERY = (
+    "SELECT c.id, c.meta_data.id AS repo_id, c.meta_data.stars AS stars, c.meta_data.fork AS fork, "
+    "c.date, c.created_days, c.tags FROM c"
+)
+GENERATION_QUERY = "SELECT VALUE {'count': COUNT(1), 'max_ts': MAX(c._ts)} FROM c"
+
+
+@dataclass(frozen=True)
+class FeatureSnapshot:
+    """
+    Immutable, column-oriented per-repository features.
+    Row i of every array belongs to the repository whose id maps to i in `row_of`.
+    Tags are stored CSR-style: tag_ids[tag_offsets[i]:tag_offsets[i + 1]].
+    """
+    row_of: Dict[str, int]
+    stars: np.ndarray          # int64
+    created_days: np.ndarray   # int32, MISSING_DAYS when unknown
+    fork: np.ndarray           # uint8
+    tag_offsets: np.ndarray    # int64, len = n + 1
+    tag_ids: np.ndarray        # int32
+    tag_vocab: Dict[str, int]
+    generation: Any = None
+    built_at: float = field(default_factory=time.time)
+
+    def __len__(self) -> int:
+        return len(self.stars)
+
+    def rows(self, ids: Sequence[Any]) -> np.ndarray:
+        """Row index per id, -1 for ids not in the store."""
+        row_of = self.row_of
+        return np.fromiter((row_of.get(str(i), -1) for i in ids), dtype=np.int64, count=len(ids))
+
+    def tags_of(self, row: int) -> np.ndarray:
+        return self.tag_ids[self.tag_offsets[row]:self.tag_offsets[row + 1]]
+
+
+def build_snapshot(docs: Iterable[Dict[str, Any]], generation: Any = None) -> FeatureSnapshot:
+    """Build a snapshot from Cosmos-shaped documents (flat query rows or full RepoDoc dicts)."""
+    row_of: Dict[str, int] = {}
+    stars: List[int] = []
+    created_days: List[int] = []
+    fork: List[int] = []
+    tag_offsets: List[int] = [0]
+    tag_ids: List[int] = []
+    tag_vocab: Dict[str, int] = {}
+
+    for doc in docs:
+        meta = doc.get("meta_data") or {}
+        doc_id = doc.get("id") or doc.get("repo_id") or meta.get("id")
+        if doc_id is None or str(doc_id) in row_of:
+            continue
+        row = len(stars)
+        row_of[str(doc_id)] = row
+        # Search results may carry either the Cosmos id or the GitHub repo id
+        repo_id = doc.get("repo_id") or meta.get("id")
+        if repo_id is not None:
+            row_of.setdefault(str(repo_id), row)
+
+        stars.append(int(doc.get("stars", meta.get("stars")) or 0))
+        days = doc.get("created_days")
+        if days is None:
+            days = to_epoch_days(doc.get("date"))
+        created_days.append(MISSING_DAYS if days is None else int(days))
+        fork.append(1 if doc.get("fork", meta.get("fork")) else 0)
+
+        for tag in doc.get("tags") or []:
+            tag_ids.append(tag_vocab.setdefault(str(tag), len(tag_vocab)))
+        tag_offsets.append(len(tag_ids))
+
+    return FeatureSnapshot(
+        row_of=row_of,
+        stars=np.asarray(stars, dtype=np.int64),
+        created_days=np.asarray(created_days, dtype=np.int32),
+        fork=np.asarray(fork, dtype=np.uint8),
+        tag_offsets=np.asarray(tag_offsets, dtype=np.int64),
+        tag_ids=np.asarray(tag_ids, dtype=np.int32),
+        tag_vocab=tag_vocab,
+        generation=generation,
+    )
+
+
+class FeatureStore:
+    """
+    In-process feature store rebuilt from a Cosmos container whenever its generation
+    (document count + latest _ts) changes. The generation is checked at most every
+    `check_interval` seconds; rebuilds run in a background thread and swap the
+    snapshot atomically, so readers never block on Cosmos after the first build.
+    """
+
+    def __init__(self, container, check_interval: float = FEATURE_STORE_CHECK_INTERVAL):
+        self.container = container
+        self.check_interval = check_interval
+        self._snapshot: Optional[FeatureSnapshot] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._last_check = 0.0
+
+    def _generation(self) -> Tuple[int, int]:
+        result = list(self.container.query_items(query=GENERATION_QUERY, enable_cross_partition_query=True))[0]
+        return int(result.get("count") or 0), int(result.get("max_ts") or 0)
+
+    def rebuild(self, generation: Any = None) -> FeatureSnapshot:
+        start = time.perf_counter()
+        generation = generation if generation is not None else self._generation()
+        docs = self.container.query_items(query=FEATURE_QUERY, enable_cross_partition_query=True)
+        snapshot = build_snapshot(docs, generation=generation)
+        self._snapshot = snapshot
+        logger.info(f"Feature store rebuilt: {len(snapshot)} repos, {len(snapshot.tag_vocab)} tags in {time.perf_counter() - start:.2f}s")
+        return snapshot
+
+    def _rebuild_in_background(self, generation: Any):
+        try:
+            self.rebuild(generation)
+        except Exception as e:
+            logger.warning(f"Feature store rebuild failed: {e}")
+        finally:
+            self._rebuilding = False
+
+    def snapshot(self) -> Optional[FeatureSnapshot]:
+        """Current snapshot; builds synchronously on first use, then refreshes in the background."""
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.rebuild()
+                    self._last_check = time.monotonic()
+            return self._snapshot
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval and not self._rebuilding:
+            with self._lock:
+                if now - self._last_check < self.check_interval or self._rebuilding:
+                    return self._snapshot
+                self._last_check = now
+                try:
+                    generation = self._generation()
+                except Exception as e:
+                    logger.warning(f"Feature store generation check failed: {e}")
+                    return self._snapshot
+                if generation != self._snapshot.generation:
+                    self._rebuilding = True
+                    threading.Thread(target=self._rebuild_in_background, args=(generation,), daemon=True).start()
+        return self._snapshot
+
+
+_feature_store: Optional[FeatureStore] = None
+_feature_store_lock = threading.Lock()
+
+
+def get_feature_store() -> Optional[FeatureSnapshot]:
+    """
+    Snapshot of the repository feature store, or None when FEATURE_STORE_ENABLED is off
+    or Cosmos is unreachable (rankers then fall back to reading the result dicts).
+    """
+    global _feature_store
+    if not FEATURE_STORE_ENABLED:
+        return None
+    try:
+        if _feature_store is None:
+            with _feature_store_lock:
+                if _feature_store is None:
+                    from azure.cosmos import CosmosClient
+                    from src.data.azure_data.cosmos_to_azure_search import COSMOS_ENDPOINT, COSMOS_KEY, DATABASE_NAME, CONTAINER_NAME
+                    if not COSMOS_ENDPOINT or not COSMOS_KEY:
+                        raise ValueError("COSMOS_ENDPOINT and COSMOS_KEY environment variables are required")
+                    container = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY).get_database_client(DATABASE_NAME).get_container_client(CONTAINER_NAME)
+                    _feature_store = FeatureStore(container)
+        return _feature_store.snapshot()
+    except Exception as e:
+        logger.warning(f"Feature store unavailable: {e}")
+        return None
@@ -6,9 +6,11 @@ from typing import List
 from src.cache.cache_client import BaseCache
 from typing import Callable, List
 from src.azure_client.azure_search import normalize_query, get_field_index
-from src.llm.llm_helpers import llm_preprocess
-from src.azure_client.config import search_client, model
-from azure.search.documents.models import VectorizedQuery
+from src.llm.llm_helpers import llm_understand_query
+from src.azure_client.config import get_search_client
+from src.embedding.service import embed_query
+from src.azure_client.filter.odata_filter import build_odata_filter, escape_odata_string
+from azure.search.documents.models import VectorizedQuery, VectorFilterMode
 from datetime import datetime, timedelta
 # Create repo cache
 
@@ -26,21 +28,28 @@ def get_topic_repo_id(topic:str, fallback_fn) -> List[str]:
     return repo_ids
 
 def query_cosmosdb_by_topic(topic: str, top_k: int = 100) -> List[str]:
-    filter_expr = f"tags/any(t: t eq '{topic}')"
-    results = search_client.search(search_text="", filter=filter_expr, top=top_k)
+    filter_expr = f"tags/any(t: t eq '{escape_odata_string(topic)}')"
+    results = get_search_client().search(search_text="", filter=filter_expr, top=top_k)
     return [r["rid"] for r in results]
 
 
 def hybrid_search_with_filter(query: str, top_k: int = 50, filter_str:str = None) -> List[dict]:
 
     query = normalize_query(query)
-    _, parse_query = llm_preprocess(query)
+    _, understanding = llm_understand_query(query)
+    parse_query = understanding.parse_query()
 
     rewrite_query = parse_query.get("rewritten_query") or query
     filters = parse_query.get("filters", {})
     topics = filters.get("topics", [])
 
-    vector_embedding = model.encode(rewrite_query).tolist()
+    llm_filter = build_odata_filter(filters)
+    if llm_filter and filter_str:
+        filter_str = f"({filter_str}) and ({llm_filter})"
+    else:
+        filter_str = filter_str or llm_filter
+
+    vector_embedding = embed_query(rewrite_query).tolist()
     vector_query = VectorizedQuery(
         vector=vector_embedding,                  
         k_nearest_neighbors=top_k,      
@@ -48,10 +57,11 @@ def hybrid_search_with_filter(query: str, top_k: int = 50, filter_str:str = None
         fields="vector"
     )
 
-    results = search_client.search(
+    results = get_search_client().search(
         search_text=None,
         vector_queries=[vector_query],
         filter=filter_str,
+        vector_filter_mode=VectorFilterMode.PRE_FILTER,
         top=top_k,
         select=get_field_index()
     )
@@ -73,7 +83,7 @@ def recommend_with_cache_and_vector(query: str, topic: str, top_k: int = 10):
         return []
 
     # Chuyển list repo_ids thành filter string cho Azure Search
-    filter_str = " or ".join([f"rid eq '{rid}'" for rid in repo_ids])
+    filter_str = " or ".join([f"rid eq '{escape_odata_string(rid)}'" for rid in repo_ids])
 
     print(f"Debug filter_str {filter_str}")
 
@@ -1,19 +1,23 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.azure_client.config import model
+from src.embedding.service import embed_query
+from src.embedding.codec import vector_key, key_to_vector
 from src.llm.llm_helpers import agent_intent_query
-from sklearn.metrics.pairwise import cosine_similarity
-from src.cache.cache_client import text_search_cache
+from src.cache.cache_client import text_search_cache, SemanticCache
+import numpy as np
 import logging
 logging.basicConfig(level=logging.INFO) 
 logger = logging.getLogger(__name__)
 
-def get_intent_and_vector(query):
+def get_intent_and_vector(query, intent_obj=None):
     """
-    Returns (intent_str, vector_tuple, reasoning) for a query.
+    Returns (intent_str, vector, reasoning) for a query.
+    vector is the contiguous float32 intent embedding; it is not copied or converted to a list.
+    Pass `intent_obj` ({"intent", "reasoning"}, e.g. from llm_understand_query) to skip the intent LLM call.
     """
-    intent_obj = agent_intent_query(query)
+    if intent_obj is None:
+        intent_obj = agent_intent_query(query)
     if isinstance(intent_obj, dict):
         intent_str = intent_obj.get("intent", "")
         reasoning = intent_obj.get("reasoning", "")
@@ -22,20 +26,35 @@ def get_intent_and_vector(query):
         reasoning = ""
     if not intent_str:
         raise ValueError("Intent string is empty or invalid!")
-    vector = model.encode(intent_str)
+    vector = embed_query(intent_str)
     logger.info(f"Intent string: {intent_str}")
     logger.info(f"Intent vector for query '{query}': {vector[:5]}... (length: {len(vector)})")
     logger.info(f"LLM reasoning: {reasoning}")
-    return intent_str, tuple(vector), reasoning
+    return intent_str, vector, reasoning
+
+
+def store_in_cache(cache, query_vector, value):
+    """Store a result under a query vector (digest key for SemanticCache, int8 key for plain mappings)."""
+    if isinstance(cache, SemanticCache):
+        return cache.put(query_vector, value)
+    key = vector_key(query_vector)
+    cache[key] = value
+    return key
 
 
 def find_in_cache(query_vector, cache, threshold=0.8):
     """
     Search for a cached result by cosine similarity.
-    Prints debug info for all cache items and similarity scores.
+    A SemanticCache answers with one matrix-vector product; plain mappings keyed by
+    vector_key are scanned and their content printed for debugging.
     """
-    import numpy as np
-    query_vector_np = np.array(query_vector)
+    if isinstance(cache, SemanticCache):
+        result = cache.lookup(query_vector, threshold=threshold)
+        logger.info("Cache HIT!" if result is not None else "Cache MISS!")
+        return result
+
+    query_vector_np = np.asarray(query_vector, dtype=np.float32)
+    query_norm = np.linalg.norm(query_vector_np)
     print(f"\n===== DEBUG: SEMANTIC CACHE CONTENT =====")
     for key, value in cache.items():
         # Get TTL
@@ -53,7 +72,7 @@ def find_in_cache(query_vector, cache, threshold=0.8):
                 num_repos = "unknown"
         # Print cache info
         ttl_info = f"TTL left: {ttl_left:.2f} seconds" if ttl_left is not None else "No TTL info"
-        print(f"Key (intent vector, first 5 dims): {key[:5]}... | length: {len(key)} | Num repos: {num_repos} | {ttl_info}")
+        print(f"Key (intent vector, first 5 dims): {key_to_vector(key)[:5]}... | {len(key)} bytes | Num repos: {num_repos} | {ttl_info}")
         # Print repo info if possible
         try:
             for repo in value:
@@ -65,9 +84,9 @@ def find_in_cache(query_vector, cache, threshold=0.8):
 
     print(f"\nQuery vector (first 5): {query_vector_np[:5]}")
     for cached_vector, result in cache.items():
-        cached_vector_np = np.array(cached_vector)
+        cached_vector_np = key_to_vector(cached_vector)
         logger.info(f"Comparing with cached vector (first 5): {cached_vector_np[:5]}")
-        sim = cosine_similarity([query_vector_np], [cached_vector_np])[0][0]
+        sim = float(cached_vector_np @ query_vector_np / (np.linalg.norm(cached_vector_np) * query_norm))
         logger.info(f"Cosine similarity: {sim}")
         if sim > threshold:
             print("Cache HIT!")
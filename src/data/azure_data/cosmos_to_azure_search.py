@@ -24,10 +24,20 @@ from azure.search.documents.indexes.models import (
     SemanticField,
     ScoringProfile,
     TextWeights,
-    HnswParameters
+    HnswParameters,
+    FreshnessScoringFunction,
+    FreshnessScoringParameters,
+    MagnitudeScoringFunction,
+    MagnitudeScoringParameters,
+    ScalarQuantizationCompression,
+    ScalarQuantizationParameters
 )
+from datetime import timedelta
 from azure.core.credentials import AzureKeyCredential
 from tqdm import tqdm
+from src.data.rank_fields import compute_rank_fields, compute_velocity, today_epoch_days
+from src.azure_client.config import EMBEDDING_SIZE, FRESHNESS_POPULARITY_PROFILE
+from src.embedding.codec import vector_to_list
 import argparse
 
 logging.basicConfig(level=logging.INFO)
@@ -46,6 +56,63 @@ DATABASE_NAME = "github-repositories"
 CONTAINER_NAME = "github-container"
 CONTAINER_NAME_GITHUB = "github-examples-prompt"
 
+# "scalar" stores the HNSW graph over int8-quantized vectors (about 4x smaller) and
+# rescores the top candidates with the original float32 vectors
+VECTOR_COMPRESSION = os.getenv("AZURE_AI_SEARCH_VECTOR_COMPRESSION") or None
+SCALAR_COMPRESSION_NAME = "scalar-int8"
+
+def build_vector_compressions(compression: Optional[str], oversampling: float = 4.0) -> List[ScalarQuantizationCompression]:
+    if not compression:
+        return []
+    if compression != "scalar":
+        raise ValueError(f"Unsupported vector compression '{compression}', expected 'scalar'")
+    return [
+        ScalarQuantizationCompression(
+            compression_name=SCALAR_COMPRESSION_NAME,
+            rerank_with_original_vectors=True,
+            default_oversampling=oversampling,
+            parameters=ScalarQuantizationParameters(quantized_data_type="int8")
+        )
+    ]
+
+def rank_index_fields() -> List[SimpleField]:
+    """Index fields for the numeric ranking values computed at ingest."""
+    return [
+        SimpleField(name="created_days", type=SearchFieldDataType.Int32, filterable=True, sortable=True),
+        SimpleField(name="log_stars", type=SearchFieldDataType.Double, filterable=True, sortable=True),
+        SimpleField(name="velocity", type=SearchFieldDataType.Double, filterable=True, sortable=True),
+    ]
+
+def build_freshness_popularity_profile(freshness_boost: float = 2.0, popularity_boost: float = 3.0,
+                                       freshness_days: int = 365, max_log_stars: float = 12.0) -> ScoringProfile:
+    """
+    Freshness on `date` favours repositories created within `freshness_days`.
+    Magnitude on `log_stars` rises linearly in log(stars), up to roughly 160k stars at 12.0.
+    """
+    return ScoringProfile(
+        name=FRESHNESS_POPULARITY_PROFILE,
+        text_weights=TextWeights(weights={"title": 2.0, "short_des": 1.0, "tags": 1.5}),
+        function_aggregation="sum",
+        functions=[
+            FreshnessScoringFunction(
+                field_name="date",
+                boost=freshness_boost,
+                interpolation="quadratic",
+                parameters=FreshnessScoringParameters(boosting_duration=timedelta(days=freshness_days))
+            ),
+            MagnitudeScoringFunction(
+                field_name="log_stars",
+                boost=popularity_boost,
+                interpolation="linear",
+                parameters=MagnitudeScoringParameters(
+                    boosting_range_start=0.0,
+                    boosting_range_end=max_log_stars,
+                    should_boost_beyond_range_by_constant=True
+                )
+            )
+        ]
+    )
+
 class CosmosToAzureSearchIndexer:
     def __init__(self, use_github_container: bool = False, custom_container: Optional[str] = None, custom_index: Optional[str] = None):
         """
@@ -109,12 +176,16 @@ class CosmosToAzureSearchIndexer:
         
         logger.info("✅ Indexer initialized successfully")
 
-    def create_search_index(self, force_recreate: bool = False):
+    def create_search_index(self, force_recreate: bool = False, with_scoring_profile: bool = True,
+                            vector_dimensions: int = EMBEDDING_SIZE, vector_compression: Optional[str] = VECTOR_COMPRESSION):
         """
         Create the Azure AI Search index with vector search capabilities
         
         Args:
             force_recreate: If True, delete existing index before creating new one
+            with_scoring_profile: If True, add the freshness/popularity scoring profile
+            vector_dimensions: Size of the `vector` field (defaults to the query encoder's)
+            vector_compression: "scalar" to enable int8 scalar quantization of the vector index
         """
         try:
             # Check if index exists
@@ -169,9 +240,12 @@ class CosmosToAzureSearchIndexer:
                     SimpleField(name="owner", type=SearchFieldDataType.String, filterable=True, sortable=True, searchable=True),
                     SimpleField(name="url", type=SearchFieldDataType.String, filterable=True, sortable=True, searchable=True),
                 
-                # Vector field for semantic search (384 dimensions for BAAI/bge-small-en-v1.5)
+                # Precomputed numeric ranking fields (see src/data/rank_fields.py)
+                    *rank_index_fields(),
+                
+                # Vector field for semantic search, sized for the encoder that fills it
                 SearchField(name="vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single), 
-                               vector_search_dimensions=384, vector_search_profile_name="default-profile"),
+                               vector_search_dimensions=vector_dimensions, vector_search_profile_name="default-profile"),
                 
                 # Score field
                     SimpleField(name="score", type=SearchFieldDataType.Double, filterable=True, sortable=True)
@@ -186,13 +260,16 @@ class CosmosToAzureSearchIndexer:
                 )
             else:
                 # For default github-container, include vector search configuration
+                compressions = build_vector_compressions(vector_compression)
                 vector_search = VectorSearch(
                     profiles=[
                         VectorSearchProfile(
                             name="default-profile",
-                            algorithm_configuration_name="default-algorithm"
+                            algorithm_configuration_name="default-algorithm",
+                            compression_name=SCALAR_COMPRESSION_NAME if compressions else None
                         )
                     ],
+                    compressions=compressions,
                     algorithms=[
                         HnswAlgorithmConfiguration(
                             name="default-algorithm",
@@ -210,7 +287,8 @@ class CosmosToAzureSearchIndexer:
                 index = SearchIndex(
                     name=str(self.index_name),
                     fields=fields,
-                    vector_search=vector_search
+                    vector_search=vector_search,
+                    scoring_profiles=[build_freshness_popularity_profile()] if with_scoring_profile else []
                 )
             
             self.index_client.create_index(index)
@@ -333,6 +411,11 @@ class CosmosToAzureSearchIndexer:
                 # Transform for default github-container
                 logger.info(f"🔍 Using default github-container transformation for document {doc_id}")
                 meta_data = cosmos_doc.get('meta_data', {})
+                stars = cosmos_doc.get('stars', meta_data.get('stars', 0))
+                rank_fields = compute_rank_fields(stars, cosmos_doc.get('date'))
+                if cosmos_doc.get('created_days') is not None:
+                    rank_fields['created_days'] = cosmos_doc['created_days']
+                    rank_fields['velocity'] = compute_velocity(stars, cosmos_doc['created_days'])
                 search_doc = {
                     'id': str(cosmos_doc.get('id', meta_data.get('id', ''))),
                         'title': str(cosmos_doc.get('title', '')),
@@ -343,14 +426,16 @@ class CosmosToAzureSearchIndexer:
                         'owner': str(cosmos_doc.get('owner', meta_data.get('owner', ''))),
                         'url': str(cosmos_doc.get('url', meta_data.get('url', ''))),
                         'vector': self._ensure_vector(cosmos_doc.get('vector')),
-                        'score': self._ensure_float(cosmos_doc.get('score'))
+                        'score': self._ensure_float(cosmos_doc.get('score')),
+                        **rank_fields
                     }
                 
                 # Remove any fields that are not in the search index schema
                 # Only keep the fields that are defined in the index
                 allowed_fields = {
                     'id', 'title', 'short_des', 'tags', 'date', 'stars', 
-                    'owner', 'url', 'vector', 'score'
+                    'owner', 'url', 'vector', 'score',
+                    'created_days', 'log_stars', 'velocity'
                 }
                 search_doc = {k: v for k, v in search_doc.items() if k in allowed_fields}
                 
@@ -389,9 +474,11 @@ class CosmosToAzureSearchIndexer:
         return [str(value)]
 
     def _ensure_vector(self, value: Any) -> List[float]:
-        """Ensure value is a list of floats for vector field"""
+        """Ensure value is a list of floats for vector field (decodes compact Cosmos vectors)"""
         if value is None:
             return []
+        if isinstance(value, dict):
+            return vector_to_list(value)
         if isinstance(value, list):
             return [float(item) for item in value if item is not None]
         return []
@@ -415,9 +502,15 @@ class CosmosToAzureSearchIndexer:
             elif key == 'tags':
                 # Tags field should be a list of strings
                 cleaned_doc[key] = self._ensure_list(value)
-            elif key == 'score':
-                # Score field should be a float
+            elif key in ['score', 'log_stars', 'velocity']:
+                # Double fields
                 cleaned_doc[key] = self._ensure_float(value)
+            elif key == 'created_days':
+                # Nullable integer field: unknown creation date stays null
+                try:
+                    cleaned_doc[key] = int(value) if value is not None else None
+                except (ValueError, TypeError):
+                    cleaned_doc[key] = None
             elif key in ['stars']:
                 # Integer fields
                 try:
@@ -440,7 +533,7 @@ class CosmosToAzureSearchIndexer:
         return cleaned_doc
 
     def index_documents(self, batch_size: int = 100, max_documents: Optional[int] = None, 
-                       force_recreate: bool = False):
+                       force_recreate: bool = False, vector_compression: Optional[str] = VECTOR_COMPRESSION):
         """
         Index documents from CosmosDB to Azure AI Search
         
@@ -448,10 +541,11 @@ class CosmosToAzureSearchIndexer:
             batch_size: Number of documents to process per batch
             max_documents: Maximum number of documents to index
             force_recreate: Whether to recreate the index
+            vector_compression: "scalar" to create the index with int8 vector compression
         """
         try:
             # Create or recreate the search index
-            self.create_search_index(force_recreate=force_recreate)
+            self.create_search_index(force_recreate=force_recreate, vector_compression=vector_compression)
             
             # Fetch and index documents
             total_indexed = 0
@@ -554,6 +648,81 @@ class CosmosToAzureSearchIndexer:
             logger.error(f"❌ Indexing process failed: {e}")
             raise
 
+    def ensure_scoring_profile(self):
+        """
+        Add (or replace) the freshness/popularity scoring profile on an existing index.
+        Adding fields and scoring profiles does not require rebuilding the index,
+        so missing ranking fields are added here as well.
+        """
+        if self.use_github_container:
+            raise ValueError("Scoring profile only applies to the repository index")
+
+        index = self.index_client.get_index(self.index_name)
+        existing_fields = {f.name for f in index.fields}
+        for field in rank_index_fields():
+            if field.name not in existing_fields:
+                logger.info(f"➕ Adding field '{field.name}' to index {self.index_name}")
+                index.fields.append(field)
+
+        profiles = [p for p in (index.scoring_profiles or []) if p.name != FRESHNESS_POPULARITY_PROFILE]
+        profiles.append(build_freshness_popularity_profile())
+        index.scoring_profiles = profiles
+
+        self.index_client.create_or_update_index(index)
+        logger.info(f"✅ Scoring profile '{FRESHNESS_POPULARITY_PROFILE}' set on index {self.index_name}")
+
+    def refresh_velocity(self, batch_size: int = 500):
+        """
+        Recompute the date-dependent `velocity` field in CosmosDB and in the search index.
+        Meant to run once a day; created_days and log_stars never change after ingest.
+        """
+        if self.use_github_container:
+            raise ValueError("Velocity refresh only applies to the repository container")
+
+        today_days = today_epoch_days()
+        query = "SELECT c.id, c.date, c.created_days, c.meta_data.stars AS stars FROM c"
+        updated = 0
+        errors = 0
+        batch = []
+
+        def flush():
+            nonlocal updated, errors, batch
+            if not batch:
+                return
+            result = self.search_client.merge_documents(batch)
+            succeeded = sum(1 for r in result if r.succeeded)
+            updated += succeeded
+            errors += len(result) - succeeded
+            batch = []
+
+        for doc in tqdm(self.container.query_items(query=query, enable_cross_partition_query=True),
+                        desc="🔁 Refreshing velocity", unit="doc"):
+            created_days = doc.get('created_days')
+            if created_days is None:
+                created_days = compute_rank_fields(0, doc.get('date'))['created_days']
+            velocity = compute_velocity(doc.get('stars'), created_days, today_days)
+            try:
+                self.container.patch_item(
+                    item=doc['id'],
+                    partition_key=doc['id'],
+                    patch_operations=[
+                        {"op": "set", "path": "/created_days", "value": created_days},
+                        {"op": "set", "path": "/velocity", "value": velocity}
+                    ]
+                )
+            except Exception as e:
+                errors += 1
+                logger.warning(f"⚠️ Failed to patch velocity for {doc['id']} in CosmosDB: {e}")
+                continue
+
+            batch.append({"id": str(doc['id']), "created_days": created_days, "velocity": velocity})
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        logger.info(f"📈 Velocity refreshed: {updated} updated, {errors} errors")
+        return updated, errors
+
     def get_index_stats(self):
         """Get statistics about the search index"""
         try:
@@ -572,8 +741,14 @@ def main():
                        help="Maximum number of documents to index (default: all)")
     parser.add_argument("--force-recreate", action="store_true",
                        help="Force recreate the search index")
+    parser.add_argument("--vector-compression", choices=["scalar"], default=VECTOR_COMPRESSION,
+                       help="Enable int8 scalar quantization on the vector index (applies when the index is created)")
     parser.add_argument("--stats-only", action="store_true",
                        help="Only show index statistics")
+    parser.add_argument("--scoring-profile", action="store_true",
+                       help="Add the freshness/popularity scoring profile to the existing index")
+    parser.add_argument("--refresh-velocity", action="store_true",
+                       help="Recompute the daily velocity field in CosmosDB and the search index")
     parser.add_argument("--github-container", action="store_true",
                        help="Use github-examples-prompt container and github-example-index")
     parser.add_argument("--cosmos-container", type=str, default=None,
@@ -602,11 +777,22 @@ def main():
             print(f"📊 Azure AI Search documents in '{indexer.index_name}': {search_count}")
             return
         
+        if args.scoring_profile:
+            indexer.ensure_scoring_profile()
+            print(f"✅ Scoring profile '{FRESHNESS_POPULARITY_PROFILE}' is set on '{indexer.index_name}'")
+            return
+        
+        if args.refresh_velocity:
+            updated, errors = indexer.refresh_velocity(batch_size=args.batch_size)
+            print(f"📈 Velocity refreshed for {updated} documents ({errors} errors)")
+            return
+        
         # Perform indexing
         total_indexed, total_errors = indexer.index_documents(
             batch_size=args.batch_size,
             max_documents=args.max_documents,
-            force_recreate=args.force_recreate
+            force_recreate=args.force_recreate,
+            vector_compression=args.vector_compression
         )
         
         print(f"\n🎉 Indexing Summary:")
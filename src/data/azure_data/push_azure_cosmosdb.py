@@ -8,6 +8,8 @@ import logging
 from azure.cosmos import CosmosClient, PartitionKey
 from src.data.github_client import GithubClient
 from src.data.schema import RepoDoc, MetaData
+from src.data.rank_fields import add_rank_fields
+from src.embedding.codec import encode_vector
 from src.llm.llm_helpers import llm_generate_shortdes
 from tqdm import tqdm
 import json
@@ -52,6 +54,9 @@ def push_to_cosmosdb(docs):
                     doc_dict = doc.model_dump()  # Use Pydantic's model_dump()
                 else:
                     doc_dict = doc
+                add_rank_fields(doc_dict)
+                # Store the vector compactly (VECTOR_ENCODING), not as a JSON float list
+                doc_dict['vector'] = encode_vector(doc_dict.get('vector'))
                     
                 container.upsert_item(doc_dict)
                 success_count += 1
@@ -218,6 +223,10 @@ def push_from_json_file(json_file_path: str):
                     pbar.update(1)
                     continue
                 
+                # Precompute numeric ranking fields for older exports
+                add_rank_fields(item)
+                item['vector'] = encode_vector(item.get('vector'))
+
                 # Push to CosmosDB
                 container.upsert_item(item)
                 success_count += 1
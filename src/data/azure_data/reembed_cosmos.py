@@ -0,0 +1,338 @@
+import os
+import sys
+# Add the project root to Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, project_root)
+
+import logging
+import re
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from src.data.azure_data.cosmos_to_azure_search import CosmosToAzureSearchIndexer, CONTAINER_NAME
+from src.embedding.backends import load_encoder, EMBEDDING_BACKEND
+from src.embedding.registry import KNOWN_DIMENSIONS
+from src.embedding.codec import encode_vector, vector_to_list
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+# The indexer logs every transformed document at INFO; too chatty for a bulk job
+logging.getLogger("src.data.azure_data.cosmos_to_azure_search").setLevel(logging.WARNING)
+
+REEMBED_QUERY = "SELECT * FROM c"
+
+
+def model_vector_field(model_name: str) -> str:
+    """Cosmos field that holds a migration's vectors next to the live one, e.g. vector_bge_large_en_v1_5."""
+    return "vector_" + re.sub(r"\W+", "_", model_name.split("/")[-1].lower()).strip("_")
+
+
+def embedding_text(doc: Dict[str, Any]) -> str:
+    """The text GithubClient embeds at ingest: title, description and topics."""
+    text = f"{doc.get('title', '')} {doc.get('short_des', '')}"
+    tags = doc.get('tags') or []
+    if tags:
+        text += f" {' '.join(str(t) for t in tags)}"
+    return text
+
+
+# ===== WORKER PROCESS =====
+_worker_encoder = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int):
+    """Load the encoder once per worker, with intra-op threads split between workers."""
+    global _worker_encoder
+    _worker_encoder = load_encoder(model_name, backend, threads=threads)
+
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    vectors = _worker_encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class ReembedJob:
+    """
+    Re-embed every repository document for an embedding model migration.
+
+    Documents are streamed out of CosmosDB page by page, encoded in large batches across
+    a process pool, and written back in bulk: the new vector is patched into CosmosDB
+    under its own field (see `model_vector_field`) and the full document is uploaded to a
+    *new* Azure AI Search index, so live traffic and the regular Cosmos -> Search sync
+    keep using the current `vector` until the switch. Progress is checkpointed by Cosmos
+    continuation token; an interrupted run resumes after the last completed page.
+
+    Switch over by pointing AZURE_AI_SEARCH_INDEX at the new index and
+    AZURE_EMBEDDING_MODEL at the new model together, then run once more with
+    `--in-place` to promote the staged vectors to `vector` (no re-encoding) so the
+    regular sync keeps the new index on the new model.
+    """
+
+    def __init__(self, model_name: str, target_index: str, backend: str = EMBEDDING_BACKEND,
+                 source_container: str = CONTAINER_NAME, cosmos_field: Optional[str] = None,
+                 workers: Optional[int] = None, page_size: int = 1000, chunk_size: int = 256,
+                 encode_batch_size: int = 64, write_threads: int = 8, upload_batch_size: int = 500,
+                 max_pages_in_flight: int = 2, checkpoint_path: Optional[str] = None):
+        """
+        Args:
+            model_name: Encoder to migrate to
+            target_index: New Azure AI Search index to fill (created if missing)
+            backend: torch, onnx or onnx-int8
+            source_container: CosmosDB container holding the repository documents
+            cosmos_field: Cosmos field that receives the new vector (default: `model_vector_field`;
+                "vector" replaces the live vector in place and should only be used after the switch)
+            workers: Encoder processes (default: half the CPUs)
+            page_size: Documents per Cosmos page, the checkpoint unit
+            chunk_size: Texts per task sent to a worker
+            encode_batch_size: Batch size of the encoder forward pass
+            write_threads: Concurrent Cosmos patch requests
+            upload_batch_size: Documents per Azure AI Search upload request
+            max_pages_in_flight: Pages being encoded while earlier pages are written
+            checkpoint_path: Checkpoint file (default: reembed_<target_index>[_in_place].json)
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.target_index = target_index
+        self.cosmos_field = cosmos_field or model_vector_field(model_name)
+        # The live `embedding_model` marker only moves with the live `vector` field
+        self.model_field = "embedding_model" if self.cosmos_field == "vector" else f"{self.cosmos_field}_model"
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.encode_batch_size = encode_batch_size
+        self.write_threads = write_threads
+        self.upload_batch_size = upload_batch_size
+        self.max_pages_in_flight = max(1, max_pages_in_flight)
+        self.checkpoint_path = checkpoint_path or (
+            f"reembed_{target_index}.json" if self.cosmos_field != "vector" else f"reembed_{target_index}_in_place.json"
+        )
+
+        self.indexer = CosmosToAzureSearchIndexer(custom_container=source_container, custom_index=target_index)
+        self.container = self.indexer.container
+        self.search_client = self.indexer.search_client
+
+        self.done = False
+        self.stats = {"read": 0, "encoded": 0, "reused": 0, "cosmos_errors": 0, "indexed": 0, "index_errors": 0}
+
+    # ===== CHECKPOINT =====
+    def load_checkpoint(self) -> Optional[str]:
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if (state.get("model") != self.model_name or state.get("target_index") != self.target_index
+                or state.get("cosmos_field", self.cosmos_field) != self.cosmos_field):
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to {state.get('model')} -> "
+                             f"{state.get('target_index')} ({state.get('cosmos_field')}); "
+                             f"remove it or pass another --checkpoint")
+        self.stats.update(state.get("stats", {}))
+        self.done = bool(state.get("done"))
+        logger.info(f"🔄 Resuming after {self.stats['read']} documents")
+        return state.get("continuation")
+
+    def save_checkpoint(self, continuation: Optional[str], done: bool = False):
+        state = {
+            "model": self.model_name,
+            "target_index": self.target_index,
+            "cosmos_field": self.cosmos_field,
+            "continuation": continuation,
+            "done": done,
+            "stats": self.stats,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ===== PIPELINE =====
+    def _pages(self, continuation: Optional[str]):
+        """Yield (documents, continuation token after this page)."""
+        pager = self.container.query_items(
+            query=REEMBED_QUERY, enable_cross_partition_query=True, max_item_count=self.page_size
+        ).by_page(continuation)
+        for page in pager:
+            docs = list(page)
+            if docs:
+                yield docs, pager.continuation_token
+
+    def _submit_page(self, pool: ProcessPoolExecutor, docs: List[Dict[str, Any]]):
+        """
+        Send the page's texts to the worker pool. Documents already carrying a vector
+        from the target model (from an earlier, interrupted run) are not re-encoded.
+        """
+        todo = [i for i, doc in enumerate(docs) if self._existing_vector(doc) is None]
+        texts = [embedding_text(docs[i]) for i in todo]
+        futures = [pool.submit(_encode_chunk, texts[start:start + self.chunk_size], self.encode_batch_size)
+                   for start in range(0, len(texts), self.chunk_size)]
+        return todo, futures
+
+    def _write_page(self, writer: ThreadPoolExecutor, docs: List[Dict[str, Any]],
+                    todo: List[int], futures) -> None:
+        fresh = np.concatenate([f.result() for f in futures]) if futures else np.zeros((0, 0), dtype=np.float32)
+        vectors: Dict[int, List[float]] = {i: vector_to_list(self._existing_vector(doc)) for i, doc in enumerate(docs)}
+        for i, vector in zip(todo, fresh):
+            vectors[i] = vector.tolist()
+        self.stats["encoded"] += len(todo)
+        self.stats["reused"] += len(docs) - len(todo)
+
+        # CosmosDB: one patch per document not yet holding the vector in `cosmos_field`, issued concurrently
+        stale = [i for i, doc in enumerate(docs)
+                 if not (doc.get(self.model_field) == self.model_name and doc.get(self.cosmos_field))]
+        patches = [writer.submit(self._patch_vector, docs[i]["id"], vectors[i]) for i in stale]
+        self.stats["cosmos_errors"] += sum(0 if p.result() else 1 for p in patches)
+
+        # Azure AI Search: full documents into the new index, in bulk
+        batch = []
+        for i, doc in enumerate(docs):
+            search_doc = self.indexer._transform_document({**doc, "vector": vectors[i]})
+            if search_doc:
+                batch.append(search_doc)
+            if len(batch) >= self.upload_batch_size:
+                self._upload(batch)
+                batch = []
+        if batch:
+            self._upload(batch)
+
+    def _existing_vector(self, doc: Dict[str, Any]):
+        """
+        The doc's vector from the target model, if it already has one: in `cosmos_field`, or,
+        for an in-place run after the switch, in the per-model field an earlier run filled.
+        """
+        for field in dict.fromkeys((self.cosmos_field, model_vector_field(self.model_name))):
+            model_field = "embedding_model" if field == "vector" else f"{field}_model"
+            if doc.get(model_field) == self.model_name and doc.get(field):
+                return doc[field]
+        return None
+
+    def _patch_vector(self, doc_id: str, vector: List[float]) -> bool:
+        try:
+            self.container.patch_item(
+                item=doc_id,
+                partition_key=doc_id,
+                patch_operations=[
+                    {"op": "set", "path": f"/{self.cosmos_field}", "value": encode_vector(vector)},
+                    {"op": "set", "path": f"/{self.model_field}", "value": self.model_name}
+                ]
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to patch vector for {doc_id} in CosmosDB: {e}")
+            return False
+
+    def _upload(self, batch: List[Dict[str, Any]]):
+        try:
+            result = self.search_client.merge_or_upload_documents(batch)
+            succeeded = sum(1 for r in result if r.succeeded)
+            self.stats["indexed"] += succeeded
+            self.stats["index_errors"] += len(result) - succeeded
+        except Exception as e:
+            logger.error(f"❌ Failed to upload {len(batch)} documents to '{self.target_index}': {e}")
+            self.stats["index_errors"] += len(batch)
+
+    def _vector_dimensions(self, pool: ProcessPoolExecutor) -> int:
+        if self.model_name in KNOWN_DIMENSIONS:
+            return KNOWN_DIMENSIONS[self.model_name]
+        return int(pool.submit(_encode_chunk, ["dimension probe"], 1).result().shape[1])
+
+    def run(self, max_documents: Optional[int] = None) -> Dict[str, int]:
+        continuation = self.load_checkpoint()
+        if self.done:
+            logger.info(f"✅ Checkpoint {self.checkpoint_path} says this migration already finished")
+            return self.stats
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        logger.info(f"🚀 Re-embedding with {self.model_name} ({self.backend}): {self.workers} workers x {threads} threads")
+
+        start = time.perf_counter()
+        read_at_start = self.stats["read"]
+        # spawn: workers must not inherit a parent's torch thread pool state
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.model_name, self.backend, threads)) as pool, \
+                ThreadPoolExecutor(max_workers=self.write_threads) as writer:
+            self.indexer.create_search_index(vector_dimensions=self._vector_dimensions(pool))
+
+            in_flight: deque = deque()
+            exhausted = True
+
+            def finish_oldest():
+                nonlocal continuation
+                docs, token, todo, futures = in_flight.popleft()
+                self._write_page(writer, docs, todo, futures)
+                self.stats["read"] += len(docs)
+                # Everything before `token` is written, so a restart can begin there
+                continuation = token
+                # No token after a page means it was the last one: record that, or a crash
+                # before the final save would restart from the beginning
+                self.done = token is None
+                self.save_checkpoint(token, done=self.done)
+                elapsed = time.perf_counter() - start
+                rate = (self.stats["read"] - read_at_start) / elapsed if elapsed else 0.0
+                logger.info(f"📦 {self.stats['read']} documents re-embedded ({rate:.1f} docs/s)")
+
+            for docs, token in self._pages(continuation):
+                if max_documents and self.stats["read"] + sum(len(p[0]) for p in in_flight) >= max_documents:
+                    exhausted = False
+                    break
+                in_flight.append((docs, token, *self._submit_page(pool, docs)))
+                if len(in_flight) > self.max_pages_in_flight:
+                    finish_oldest()
+            while in_flight:
+                finish_oldest()
+
+        # Only a full pass marks the job done (a trailing empty page still leaves a token)
+        self.done = self.done or exhausted
+        self.save_checkpoint(continuation, done=self.done)
+        elapsed = time.perf_counter() - start
+        logger.info(f"🎉 Re-embedding finished in {elapsed:.1f}s: {self.stats}")
+        return self.stats
+
+
+def main():
+    # e.g. python src/data/azure_data/reembed_cosmos.py --model BAAI/bge-large-en-v1.5 --target-index github-repos-bge-large
+    parser = argparse.ArgumentParser(description="Re-embed CosmosDB documents into a new Azure AI Search index")
+    parser.add_argument("--model", required=True, help="Embedding model to migrate to")
+    parser.add_argument("--target-index", required=True, help="New Azure AI Search index to fill")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--cosmos-container", default=CONTAINER_NAME)
+    parser.add_argument("--cosmos-field", default=None,
+                        help="Cosmos field for the new vector (default: vector_<model>)")
+    parser.add_argument("--in-place", action="store_true",
+                        help="overwrite the live 'vector' field; only once search has switched to the new model")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes (default: half the CPUs)")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--encode-batch-size", type=int, default=64)
+    parser.add_argument("--write-threads", type=int, default=8)
+    parser.add_argument("--max-documents", type=int, default=None)
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: reembed_<target-index>.json)")
+    args = parser.parse_args()
+
+    try:
+        job = ReembedJob(
+            model_name=args.model,
+            target_index=args.target_index,
+            backend=args.backend,
+            source_container=args.cosmos_container,
+            cosmos_field="vector" if args.in_place else args.cosmos_field,
+            workers=args.workers,
+            page_size=args.page_size,
+            encode_batch_size=args.encode_batch_size,
+            write_threads=args.write_threads,
+            checkpoint_path=args.checkpoint,
+        )
+        stats = job.run(max_documents=args.max_documents)
+        print(f"✅ Re-embedded {stats['read']} documents into '{args.target_index}' "
+              f"({stats['cosmos_errors']} Cosmos errors, {stats['index_errors']} index errors)")
+    except Exception as e:
+        logger.error(f"❌ Re-embedding failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
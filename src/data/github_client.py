@@ -7,12 +7,13 @@ import json
 import time
 import pickle
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from github import Github, GithubException
 from src.data.schema import RepoDoc, MetaData
+from src.data.rank_fields import compute_rank_fields
 from tqdm import tqdm
-from src.llm.llm_helpers import llm_generate_shortdes
-from src.azure_client.config import model
+from src.data.summarize import ReadmeSummarizer
+from src.azure_client.config import get_model
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ class GithubClient:
         if not token:
             raise ValueError("GITHUB_TOKEN environment variable is not set.")
         self.client = Github(token)
+        self.summarizer = ReadmeSummarizer()
         logger.info("GitHub client initialized.")
 
     def fetch_repo_details(self, owner: str, repo_name: str):
@@ -148,83 +150,131 @@ class GithubClient:
         logger.info(f"✅ Finished. Total unique repos collected: {len(all_repos)}")
         return all_repos
 
-    def _convert_single_repo(self, repo):
+    def _collect_repo_fields(self, repo):
         """
-        Convert a single repository to RepoDoc schema format
+        Network-bound part of the conversion: topics and, for repos without a
+        description, the README. Descriptions are generated afterwards for a whole
+        batch at once by `_fill_descriptions`.
+        Topics are fetched once and reused for the tags and the embedding text.
+        """
+        # Create MetaData object using Pydantic
+        meta_data = MetaData(
+            stars=repo.stargazers_count,
+            owner=repo.owner.login,
+            url=str(repo.html_url) if repo.html_url else "",
+            id=repo.id,
+            fork=bool(repo.fork)
+        )
+        topics = repo.get_topics()
+
+        # Get description - generated from the README later if not available
+        description = repo.description
+        readme_content = None
+        if not description or description.strip() == "":
+            description = None
+            readme_content = ""
+            try:
+                readme = repo.get_readme()
+                readme_content = readme.decoded_content.decode(encoding="utf-8")
+            except:
+                pass  # No README available
+
+        return {
+            "repo": repo,
+            "meta_data": meta_data,
+            "description": description,
+            "readme": readme_content,
+            "topics": topics,
+        }
+
+    def _fill_descriptions(self, collected):
+        """
+        Generate the missing descriptions of a batch with the README summarizer (several
+        repos per LLM request, cached by README hash), then build the embedding texts.
+        """
+        missing = [fields for fields in collected if fields["description"] is None]
+        if missing:
+            try:
+                summaries = self.summarizer.summarize([
+                    {"name": f["repo"].full_name, "topics": f["topics"], "readme": f["readme"]} for f in missing
+                ])
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to generate descriptions for {len(missing)} repos: {e}")
+                summaries = {}
+            for fields in missing:
+                name = fields["repo"].full_name
+                fields["description"] = summaries.get(name, f"Repository: {name}")
+
+        for fields in collected:
+            # Create text for embedding (combine title, description, and topics)
+            embedding_text = f"{fields['repo'].full_name} {fields['description']}"
+            if fields["topics"]:
+                embedding_text += f" {' '.join(fields['topics'])}"
+            fields["embedding_text"] = embedding_text
+        return collected
+
+    def _build_repo_doc(self, fields, embedding):
+        repo = fields["repo"]
+        return RepoDoc(
+            title=repo.full_name,  # Use full_name as title
+            short_des=fields["description"],  # Use description or generated description
+            tags=fields["topics"],  # Use topics as tags
+            date=str(repo.created_at),  # Use created_at as date
+            meta_data=fields["meta_data"],
+            score=0.0,  # Default score
+            vector=embedding,  # Add embedding vector
+            **compute_rank_fields(repo.stargazers_count, repo.created_at)  # Numeric ranking fields
+        )
+
+    def _embed_texts(self, texts, batch_size=64):
         """
+        One batched encode call for many documents. Falls back to one text at a time
+        if the batch fails, so a single bad text only loses its own vector.
+        """
+        if not texts:
+            return []
+        model = get_model()
         try:
-            # Create MetaData object using Pydantic
-            meta_data = MetaData(
-                stars=repo.stargazers_count,
-                owner=repo.owner.login,
-                url=str(repo.html_url) if repo.html_url else "",
-                id=repo.id
-            )
-            
-            # Get description - use LLM-generated if not available
-            description = repo.description
-            if not description or description.strip() == "":
-                logger.debug(f"🤖 Generating description for {repo.full_name}")
-                try:
-                    # Get README content for better description generation
-                    readme_content = ""
-                    try:
-                        readme = repo.get_readme()
-                        readme_content = readme.decoded_content.decode(encoding="utf-8")
-                    except:
-                        pass  # No README available
-                    
-                    description = llm_generate_shortdes(
-                        repo_name=repo.full_name,
-                        repo_topics=repo.get_topics(),
-                        repo_readme=readme_content
-                    )
-                    logger.debug(f"✅ Generated description: {description[:50]}...")
-                except Exception as e:
-                    logger.warning(f"⚠️ Failed to generate description for {repo.full_name}: {e}")
-                    description = f"Repository: {repo.full_name}"
-            
-            # Generate embedding for vector search
+            return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False).tolist()
+        except Exception as e:
+            logger.warning(f"⚠️ Batched embedding of {len(texts)} texts failed, retrying one by one: {e}")
+        embeddings = []
+        for text in texts:
             try:
-                # Create text for embedding (combine title, description, and topics)
-                embedding_text = f"{repo.full_name} {description}"
-                if repo.get_topics():
-                    embedding_text += f" {' '.join(repo.get_topics())}"
-                
-                # Generate embedding using the model
-                embedding = model.encode(embedding_text).tolist()
-                logger.debug(f"📊 Generated embedding for {repo.full_name} (dim: {len(embedding)})")
+                embeddings.append(model.encode(text).tolist())
             except Exception as e:
-                logger.warning(f"⚠️ Failed to generate embedding for {repo.full_name}: {e}")
-                embedding = []  # Empty embedding as fallback
-            
-            # Create RepoDoc object using Pydantic
-            repo_doc = RepoDoc(
-                title=repo.full_name,  # Use full_name as title
-                short_des=description,  # Use description or generated description
-                tags=repo.get_topics(),  # Use topics as tags
-                date=str(repo.created_at),  # Use created_at as date
-                meta_data=meta_data,
-                score=0.0,  # Default score
-                vector=embedding  # Add embedding vector
-            )
-            
-            return repo_doc, None
-            
+                logger.warning(f"⚠️ Failed to generate embedding for '{text[:50]}': {e}")
+                embeddings.append([])  # Empty embedding as fallback
+        return embeddings
+
+    def _convert_single_repo(self, repo):
+        """
+        Convert a single repository to RepoDoc schema format
+        """
+        try:
+            fields = self._fill_descriptions([self._collect_repo_fields(repo)])[0]
+            embedding = self._embed_texts([fields["embedding_text"]])[0]
+            return self._build_repo_doc(fields, embedding), None
         except Exception as e:
             logger.error(f"❌ Failed to convert repo {repo.full_name}: {e}")
             return None, str(e)
 
-    def convert_repos_to_schema(self, repos, batch_size=10, max_workers=4, resume_file=None):
+    def convert_repos_to_schema(self, repos, batch_size=64, max_workers=4, resume_file=None, embed_batch_size=64):
         """
         Convert GitHub repository objects to RepoDoc schema format using Pydantic
         with batch processing and resume functionality
+
+        The network work (topics, README) runs in a thread pool; missing descriptions
+        of each batch are summarized a few repos per LLM request, and the embeddings
+        are computed in one batched encode call on the main thread while the pool
+        already fetches the next batch.
         
         Args:
             repos: List of GitHub repository objects
-            batch_size: Number of repos to process in each batch
-            max_workers: Maximum number of concurrent workers
+            batch_size: Number of repos to process in each batch (and per checkpoint)
+            max_workers: Maximum number of concurrent I/O workers
             resume_file: Path to resume file for checkpointing
+            embed_batch_size: Batch size of the encoder forward pass
         """
         repo_docs = []
         processed_ids = set()
@@ -249,44 +299,58 @@ class GithubClient:
             return repo_docs
         
         # Process in batches
-        total_batches = (len(remaining_repos) + batch_size - 1) // batch_size
+        batches = [remaining_repos[i:i + batch_size] for i in range(0, len(remaining_repos), batch_size)]
+        total_batches = len(batches)
+        start_time = time.perf_counter()
+        embed_seconds = 0.0
+        converted = 0
         
-        with tqdm(total=len(remaining_repos), desc="🔄 Converting to schema", unit="repo") as pbar:
-            for batch_idx in range(0, len(remaining_repos), batch_size):
-                batch = remaining_repos[batch_idx:batch_idx + batch_size]
-                batch_num = batch_idx // batch_size + 1
-                
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=len(remaining_repos), desc="🔄 Converting to schema", unit="repo") as pbar:
+            submit = lambda batch: [(repo, executor.submit(self._collect_repo_fields, repo)) for repo in batch]
+            pending = submit(batches[0])
+
+            for batch_idx, batch in enumerate(batches):
+                batch_num = batch_idx + 1
                 logger.info(f"📦 Processing batch {batch_num}/{total_batches} ({len(batch)} repos)")
-                
-                # Process batch with ThreadPoolExecutor for parallel processing
+
+                futures = pending
+                # Start the next batch's I/O so it overlaps with this batch's embedding
+                pending = submit(batches[batch_idx + 1]) if batch_idx + 1 < total_batches else []
+
+                collected = []
+                for repo, future in futures:
+                    try:
+                        collected.append(future.result())
+                    except Exception as e:
+                        logger.error(f"❌ Failed to convert repo {repo.full_name}: {e}")
+                    pbar.update(1)
+
+                self._fill_descriptions(collected)
+
+                embed_start = time.perf_counter()
+                embeddings = self._embed_texts([f["embedding_text"] for f in collected], batch_size=embed_batch_size)
+                embed_seconds += time.perf_counter() - embed_start
+
                 batch_results = []
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    # Submit all tasks in the batch
-                    future_to_repo = {executor.submit(self._convert_single_repo, repo): repo for repo in batch}
-                    
-                    # Collect results as they complete
-                    for future in as_completed(future_to_repo):
-                        repo = future_to_repo[future]
-                        try:
-                            repo_doc, error = future.result()
-                            if repo_doc:
-                                batch_results.append(repo_doc)
-                                processed_ids.add(repo.id)
-                                logger.debug(f"✅ Converted: {repo.full_name}")
-                            else:
-                                logger.warning(f"❌ Failed to convert {repo.full_name}: {error}")
-                        except Exception as e:
-                            logger.error(f"❌ Exception processing {repo.full_name}: {e}")
-                        
-                        pbar.update(1)
-                        pbar.set_postfix({
-                            "batch": f"{batch_num}/{total_batches}",
-                            "converted": len(repo_docs) + len(batch_results),
-                            "total_processed": len(processed_ids)
-                        })
-                
+                for fields, embedding in zip(collected, embeddings):
+                    repo = fields["repo"]
+                    try:
+                        batch_results.append(self._build_repo_doc(fields, embedding))
+                        processed_ids.add(repo.id)
+                        logger.debug(f"✅ Converted: {repo.full_name}")
+                    except Exception as e:
+                        logger.error(f"❌ Failed to convert repo {repo.full_name}: {e}")
+                converted += len(batch_results)
+
                 # Add batch results to main list
                 repo_docs.extend(batch_results)
+                elapsed = time.perf_counter() - start_time
+                pbar.set_postfix({
+                    "batch": f"{batch_num}/{total_batches}",
+                    "converted": len(repo_docs),
+                    "repos/s": f"{converted / elapsed:.1f}" if elapsed else "-"
+                })
                 
                 # Save checkpoint after each batch
                 if resume_file:
@@ -305,9 +369,14 @@ class GithubClient:
                         logger.warning(f"⚠️ Failed to save checkpoint: {e}")
                 
                 # Add small delay between batches to avoid rate limiting
-                time.sleep(1)
+                if pending:
+                    time.sleep(1)
         
-        logger.info(f"✅ Conversion complete! Processed {len(repo_docs)} repos successfully")
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"✅ Conversion complete! Processed {len(repo_docs)} repos successfully "
+            f"({converted / elapsed:.1f} repos/s, {embed_seconds:.1f}s of {elapsed:.1f}s spent embedding)"
+        )
         return repo_docs
 
     def convert_repos_to_schema_simple(self, repos):
@@ -317,6 +386,7 @@ class GithubClient:
         return self.convert_repos_to_schema(repos, batch_size=1, max_workers=1)
 
 if __name__ == "__main__":
+    pass
     # github_client = GithubClient()
     # repos = github_client.search_diverse_repos(max_repos=5000)
     # print(f"Total unique repos collected: {len(repos)}")
@@ -329,7 +399,7 @@ if __name__ == "__main__":
     # resume_file = "./mock_data/conversion_checkpoint.pkl"
     # repo_docs = github_client.convert_repos_to_schema(
     #     repos, 
-    #     batch_size=20,  # Process 20 repos per batch
+    #     batch_size=64,  # Process 64 repos per batch (one batched encode call each)
     #     max_workers=4,  # Use 4 concurrent workers
     #     resume_file=resume_file
     # )
@@ -0,0 +1,65 @@
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+# Numeric ranking fields computed once at ingest and stored in Cosmos and in the Azure index,
+# so ranking and filtering never have to parse ISO date strings per request.
+RANK_FIELDS = ("created_days", "log_stars", "velocity")
+
+EPOCH = date(1970, 1, 1)
+
+
+def _safe_int(value: Any) -> int:
+    try:
+        return int(value) if value is not None else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def to_epoch_days(value: Any) -> Optional[int]:
+    """Convert a date/datetime or an ISO date string to days since 1970-01-01."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        try:
+            value = datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    return (value - EPOCH).days
+
+
+def today_epoch_days() -> int:
+    return (date.today() - EPOCH).days
+
+
+def compute_velocity(stars: Any, created_days: Optional[int], today_days: Optional[int] = None) -> float:
+    """Stars per day since creation, the same boost the boosted-score ranker uses."""
+    if created_days is None:
+        return 0.0
+    today_days = today_epoch_days() if today_days is None else today_days
+    return _safe_int(stars) / max(today_days - created_days, 1)
+
+
+def compute_rank_fields(stars: Any, created: Any, today_days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Returns created_days (days since epoch, None if the date is unknown),
+    log_stars (log1p of stars) and velocity (stars per day since creation).
+    """
+    created_days = to_epoch_days(created)
+    return {
+        "created_days": created_days,
+        "log_stars": math.log1p(max(_safe_int(stars), 0)),
+        "velocity": compute_velocity(stars, created_days, today_days),
+    }
+
+
+def add_rank_fields(doc: Dict[str, Any], today_days: Optional[int] = None) -> Dict[str, Any]:
+    """Fill in missing ranking fields on a RepoDoc-shaped dict (stars may live under meta_data)."""
+    if all(doc.get(field) is not None for field in RANK_FIELDS):
+        return doc
+    meta_data = doc.get("meta_data") or {}
+    stars = doc.get("stars", meta_data.get("stars", 0))
+    doc.update(compute_rank_fields(stars, doc.get("date"), today_days))
+    return doc
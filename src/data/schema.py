@@ -7,6 +7,7 @@ class MetaData(BaseModel):
     owner: str = Field(description="Repository owner username")
     url: str = Field(description="Repository URL")
     id: int = Field(description="Repository ID")
+    fork: bool = Field(default=False, description="Whether the repository is a fork")
 
 class RepoDoc(BaseModel):
     title: str = Field(description="Repository full name (owner/repo)")
@@ -16,6 +17,9 @@ class RepoDoc(BaseModel):
     meta_data: MetaData = Field(description="Repository metadata")
     score: float = Field(default=0.0, description="Search relevance score")
     vector: List[float] = Field(default_factory=list, description="Embedding vector for vector search")
+    created_days: Optional[int] = Field(default=None, description="Creation date as days since 1970-01-01")
+    log_stars: float = Field(default=0.0, description="log1p of the star count")
+    velocity: float = Field(default=0.0, description="Stars per day since creation, refreshed daily")
     
     class Config:
         # Allow extra fields for flexibility
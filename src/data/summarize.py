@@ -0,0 +1,189 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_PATH = os.getenv(
+    "README_SUMMARY_CACHE",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'mock_data', 'readme_summaries.json'))
+)
+SUMMARY_BATCH_SIZE = int(os.getenv("README_SUMMARY_BATCH_SIZE", "8"))
+SUMMARY_CONCURRENCY = int(os.getenv("README_SUMMARY_CONCURRENCY", "4"))
+SUMMARY_README_CHARS = int(os.getenv("README_SUMMARY_CHARS", "800"))
+# Bump when the prompt changes so cached summaries are regenerated
+SUMMARY_PROMPT_VERSION = "1"
+
+BATCH_PROMPT = """
+You are an expert at analyzing GitHub repositories and creating concise, informative descriptions.
+
+For EACH repository below, generate a short, engaging description that explains what the repository does and its main purpose.
+
+Requirements:
+1. Each description is 1-2 sentences long (max 200 characters)
+2. Focus on the main functionality and purpose
+3. Use clear, technical language
+4. Make it engaging for developers
+5. If no README is available, infer from the name and topics
+
+{repos}
+
+Return ONLY a JSON object with this exact format, one entry per repository id:
+{{
+    "descriptions": [
+        {{"id": 1, "short_des": "Description of repository 1"}},
+        {{"id": 2, "short_des": "Description of repository 2"}}
+    ]
+}}
+"""
+
+
+class RepoDescription(BaseModel):
+    id: int
+    short_des: str
+
+
+class BatchDescriptions(BaseModel):
+    descriptions: List[RepoDescription]
+
+
+def readme_key(repo_name: str, topics: Optional[List[str]], readme: str) -> str:
+    """Cache key over exactly what the prompt sees: name, topics and the README prefix."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (SUMMARY_PROMPT_VERSION, repo_name, ",".join(topics or []), (readme or "")[:SUMMARY_README_CHARS]):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReadmeSummarizer:
+    """
+    Short descriptions for repos without one, several repos per LLM completion.
+
+    Summaries are cached by `readme_key` in a JSON file, so a repeated ingest only
+    summarizes repos whose name, topics or README changed. Batches run on at most
+    `max_concurrency` threads, and every request goes through the LLM gateway's Groq
+    rate limiter, which keeps the stage inside the request/token quota.
+    """
+
+    def __init__(self, cache_path: str = SUMMARY_CACHE_PATH, batch_size: int = SUMMARY_BATCH_SIZE,
+                 max_concurrency: int = SUMMARY_CONCURRENCY, provider: str = "groq"):
+        self.cache_path = cache_path
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.provider = provider
+        self.cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"cached": 0, "summarized": 0, "failed": 0, "requests": 0}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    self.cache = json.load(f)
+                logger.info(f"🔄 Loaded {len(self.cache)} cached README summaries from {cache_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to load summary cache {cache_path}: {e}")
+
+    def _save(self):
+        with self._lock:
+            snapshot = dict(self.cache)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def _prompt(self, batch: List[Dict]) -> str:
+        blocks = []
+        for i, item in enumerate(batch, start=1):
+            topics = item.get("topics") or []
+            readme = (item.get("readme") or "")[:SUMMARY_README_CHARS]
+            blocks.append(
+                f"Repository {i}:\n"
+                f"- Name: {item['name']}\n"
+                f"- Topics: {', '.join(topics) if topics else 'None specified'}\n"
+                f"- README Preview: {readme if readme else 'No README available'}"
+            )
+        return BATCH_PROMPT.format(repos="\n\n".join(blocks))
+
+    def _summarize_batch(self, batch: List[Dict], keys: List[str]) -> Dict[str, str]:
+        from src.llm.gateway import gateway, get_parser
+        with self._lock:
+            self.stats["requests"] += 1
+        message = gateway.complete("shortdes_batch", self._prompt(batch), self.provider, temperature=0.3)
+        parsed = BatchDescriptions.model_validate(get_parser().parse(message.content))
+        by_id = {d.id: d.short_des.strip() for d in parsed.descriptions if d.short_des.strip()}
+        return {key: by_id[i] for i, key in enumerate(keys, start=1) if i in by_id}
+
+    def summarize(self, items: List[Dict]) -> Dict[str, str]:
+        """
+        Descriptions for `items` (dicts with name, topics, readme), keyed by repo name.
+        Repos the LLM could not describe get "Repository: <name>" and are not cached,
+        so the next ingest tries them again.
+        """
+        keys = [readme_key(item["name"], item.get("topics"), item.get("readme", "")) for item in items]
+        with self._lock:
+            misses = [(key, item) for key, item in zip(keys, items) if key not in self.cache]
+        # Same README twice in one call (forks, mirrors) is summarized once
+        unique = list(dict(misses).items())
+        self.stats["cached"] += len(items) - len(misses)
+
+        if unique:
+            batches = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+            logger.info(f"🤖 Summarizing {len(unique)} READMEs in {len(batches)} requests "
+                        f"({len(items) - len(misses)} cached)")
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                futures = [(b, executor.submit(self._summarize_batch, [item for _, item in b], [key for key, _ in b]))
+                           for b in batches]
+                for batch, future in futures:
+                    try:
+                        summaries = future.result()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Summary batch of {len(batch)} repos failed: {e}")
+                        summaries = {}
+                    with self._lock:
+                        self.cache.update(summaries)
+                    self.stats["summarized"] += len(summaries)
+                    self.stats["failed"] += len(batch) - len(summaries)
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to save summary cache: {e}")
+
+        with self._lock:
+            return {item["name"]: self.cache.get(key, f"Repository: {item['name']}") for key, item in zip(keys, items)}
+
+
+if __name__ == "__main__":
+    import re
+    import time
+    import tempfile
+    from src.llm.gateway import gateway
+
+    class _FakeGroq:
+        """Echoes one description per repository in the prompt after a fixed latency."""
+        calls = 0
+
+        def invoke(self, prompt, **kwargs):
+            _FakeGroq.calls += 1
+            time.sleep(0.3)
+            n = len(re.findall(r"^Repository \d+:", prompt, flags=re.MULTILINE))
+            content = json.dumps({"descriptions": [{"id": i, "short_des": f"Fake description {i}"} for i in range(1, n + 1)]})
+            return type("Message", (), {"content": content, "usage_metadata": None, "response_metadata": {}})()
+
+    gateway._clients["groq"] = _FakeGroq()
+    repos = [{"name": f"owner/repo-{i}", "topics": ["ai"], "readme": f"README {i}"} for i in range(64)]
+    cache_path = os.path.join(tempfile.mkdtemp(), "summaries.json")
+
+    for run in (1, 2):
+        summarizer = ReadmeSummarizer(cache_path=cache_path)
+        start = time.perf_counter()
+        summarizer.summarize(repos)
+        print(f"Run {run}: {time.perf_counter() - start:.2f} s, {summarizer.stats}")
+    print(f"LLM requests for 64 repos over two runs: {_FakeGroq.calls} (one repo per request would be 128)")
@@ -0,0 +1,291 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+import time
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "torch" (SentenceTransformer), "onnx" (fp32 ONNX Runtime) or "onnx-int8" (dynamically quantized)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "code-search-onnx"))
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Intra-op threads per process: an integer, or "auto" = CPUs / WEB_CONCURRENCY (uvicorn workers).
+# Unset keeps the library default, which uses every core in every worker and oversubscribes the box.
+EMBED_THREADS = os.getenv("EMBED_THREADS", "")
+EMBED_INTEROP_THREADS = int(os.getenv("EMBED_INTEROP_THREADS", "1"))
+
+Texts = Union[str, Sequence[str]]
+
+
+def resolve_threads(value: Optional[str] = None) -> Optional[int]:
+    value = EMBED_THREADS if value is None else str(value)
+    if not value:
+        return None
+    if value == "auto":
+        workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        return max(1, (os.cpu_count() or 1) // workers)
+    return max(1, int(value))
+
+
+_interop_configured = False
+
+
+def configure_threads(threads: Optional[int] = None, interop_threads: int = EMBED_INTEROP_THREADS) -> Optional[int]:
+    """
+    Pin encoder threads for this process (EMBED_THREADS unless `threads` is given) and turn
+    off HuggingFace tokenizer parallelism. Call before the first forward pass.
+    """
+    global _interop_configured
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    threads = resolve_threads() if threads is None else threads
+    if threads is None:
+        return None
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        if not _interop_configured:
+            # Can only be set once, before any inter-op parallel work has started
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError:
+                pass
+            _interop_configured = True
+    except ImportError:
+        pass
+    return threads
+
+
+class TorchEncoder:
+    """SentenceTransformer on PyTorch; the reference backend."""
+
+    backend = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences: Texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        return self.model.encode(sentences, batch_size=batch_size, convert_to_numpy=convert_to_numpy,
+                                 show_progress_bar=show_progress_bar, **kwargs)
+
+
+class OnnxEncoder:
+    """
+    The same transformer exported to ONNX and run with ONNX Runtime on CPU,
+    optionally with dynamic int8 weight quantization.
+
+    Pooling and normalization follow the BGE models' SentenceTransformer config:
+    CLS pooling, then L2 normalization. The exported files are cached in ONNX_CACHE_DIR.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False, pooling: str = "cls",
+                 normalize: bool = True, max_length: int = 512, cache_dir: str = ONNX_CACHE_DIR,
+                 threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.backend = "onnx-int8" if quantize else "onnx"
+        self.pooling = pooling
+        self.normalize = normalize
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        model_path = self._ensure_exported(Path(cache_dir) / model_name.replace("/", "__"))
+        self.model_path = str(model_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        intra_threads = threads or resolve_threads() or int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+        if intra_threads:
+            options.intra_op_num_threads = intra_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension: Optional[int] = None
+
+    def _ensure_exported(self, export_dir: Path) -> Path:
+        fp32_path = export_dir / "model.onnx"
+        int8_path = export_dir / "model.int8.onnx"
+        if not fp32_path.exists():
+            self._export(fp32_path)
+        if not self.quantize:
+            return fp32_path
+        if not int8_path.exists():
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info(f"Quantizing {fp32_path} to int8")
+            quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        return int8_path
+
+    def _export(self, path: Path):
+        import torch
+        from transformers import AutoModel
+
+        logger.info(f"Exporting {self.model_name} to ONNX at {path}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        model = AutoModel.from_pretrained(self.model_name)
+        model.eval()
+        sample = self.tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                str(path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+            )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode("dimension probe").shape[-1])
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self._input_names if name in tokens}
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences: Texts, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Sort by length so each batch pads to a similar length, then scatter back in order
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        vectors = None
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            batch = self._encode_batch([texts[i] for i in idx])
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[idx] = batch
+        return vectors[0] if single else vectors
+
+
+def load_encoder(model_name: str, backend: str = EMBEDDING_BACKEND, threads: Optional[int] = None):
+    """
+    Build an encoder with the SentenceTransformer-compatible `encode` interface,
+    with threads pinned by configure_threads.
+    """
+    threads = configure_threads(threads)
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    if backend == "onnx":
+        return OnnxEncoder(model_name, quantize=False, threads=threads)
+    if backend == "onnx-int8":
+        return OnnxEncoder(model_name, quantize=True, threads=threads)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embedding matrices."""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cos = (ref * cand).sum(axis=1)
+    return {"mean": float(cos.mean()), "min": float(cos.min())}
+
+
+def parity_check(model_name: str, texts: Sequence[str], backends: Sequence[str] = ("onnx", "onnx-int8"),
+                 min_cosine: float = 0.98) -> Dict[str, Dict[str, float]]:
+    """Compare each backend's vectors against the PyTorch vectors for the same texts."""
+    reference = TorchEncoder(model_name).encode(list(texts), convert_to_numpy=True)
+    report = {}
+    for backend in backends:
+        vectors = load_encoder(model_name, backend).encode(list(texts))
+        stats = cosine_parity(reference, vectors)
+        stats["passed"] = stats["min"] >= min_cosine
+        report[backend] = stats
+        logger.info(f"[parity] {backend}: mean cos {stats['mean']:.5f}, min cos {stats['min']:.5f}, passed={stats['passed']}")
+    return report
+
+
+def benchmark_backend(encoder, texts: Sequence[str], batch_size: int = 32, queries: Optional[Sequence[str]] = None,
+                      repeat: int = 3) -> Dict[str, float]:
+    """Bulk throughput (texts/s) and single-query latency percentiles (ms) for one encoder."""
+    texts = list(texts)
+    queries = list(queries or texts[:50])
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # warm up
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoder.encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "throughput": len(texts) / best,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def sample_texts(limit: int = 256) -> List[str]:
+    """
+    Representative texts from mock_data/github_query_metadata.json: short user queries,
+    rewritten queries and the longer LLM reasoning (close to README/description length).
+    """
+    import json
+    path = Path(__file__).resolve().parents[2] / "mock_data" / "github_query_metadata.json"
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for item in json.load(f):
+            llm_output = item.get("llm_output") or {}
+            texts.extend([
+                item.get("original_query", ""),
+                item.get("rewritten_query", ""),
+                llm_output.get("llm_thinking", "") if isinstance(llm_output, dict) else "",
+            ])
+    texts = [t for t in texts if t]
+    return (texts * (limit // max(len(texts), 1) + 1))[:limit]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parity check and benchmark for embedding backends")
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-texts", type=int, default=256)
+    args = parser.parse_args()
+
+    texts = sample_texts(args.num_texts)
+    parity_check(args.model, texts[:64], backends=[b for b in args.backends if b != "torch"])
+
+    print(f"\n{'backend':<10} | {'texts/s':>9} | {'p50 ms':>7} | {'p95 ms':>7}")
+    for backend in args.backends:
+        stats = benchmark_backend(load_encoder(args.model, backend), texts, batch_size=args.batch_size)
+        print(f"{backend:<10} | {stats['throughput']:9.1f} | {stats['p50_ms']:7.2f} | {stats['p95_ms']:7.2f}")
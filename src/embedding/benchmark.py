@@ -0,0 +1,152 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from src.embedding.backends import BACKENDS, benchmark_backend, load_encoder
+
+MOCK_QUERIES = Path(__file__).resolve().parents[2] / "mock_data" / "github_query_metadata.json"
+DEFAULT_BATCH_SIZES = (1, 8, 16, 32, 64, 128)
+
+
+def default_thread_counts() -> List[int]:
+    cpus = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+def load_corpus(texts_file: Optional[str] = None, limit: int = 256) -> Tuple[List[str], List[str]]:
+    """
+    (documents, queries) for the sweep. Queries are the user and rewritten queries from
+    mock_data/github_query_metadata.json. Documents come from `texts_file` (a JSON list of
+    RepoDoc dicts, e.g. an export of github_repos_schema.json) or, without one, from the
+    LLM reasoning text, which is close to repo description length.
+    """
+    with open(MOCK_QUERIES, encoding="utf-8") as f:
+        items = json.load(f)
+    queries = [q for item in items for q in (item.get("original_query"), item.get("rewritten_query")) if q]
+
+    if texts_file:
+        from src.data.azure_data.reembed_cosmos import embedding_text
+        with open(texts_file, encoding="utf-8") as f:
+            docs = [embedding_text(doc) for doc in json.load(f)]
+    else:
+        docs = [item["llm_output"].get("llm_thinking", "") for item in items if isinstance(item.get("llm_output"), dict)]
+    docs = [d for d in docs if d]
+    docs = (docs * (limit // max(len(docs), 1) + 1))[:limit]
+    return docs, queries[:limit]
+
+
+def run_config(model: str, backend: str, threads: int, batch_sizes: Sequence[int],
+               docs: Sequence[str], queries: Sequence[str], repeat: int = 3) -> List[Dict]:
+    """Benchmark one (backend, threads) pair over every batch size in this process."""
+    encoder = load_encoder(model, backend, threads=threads)
+    results = []
+    for batch_size in batch_sizes:
+        stats = benchmark_backend(encoder, docs, batch_size=batch_size, queries=queries, repeat=repeat)
+        results.append({"backend": backend, "threads": threads, "batch_size": batch_size, **stats})
+    return results
+
+
+def sweep(model: str, backends: Sequence[str], thread_counts: Sequence[int], batch_sizes: Sequence[int],
+          texts_file: Optional[str] = None, num_texts: int = 256, repeat: int = 3) -> List[Dict]:
+    """
+    Run every (backend, threads) pair in a fresh subprocess: torch fixes its thread pools
+    on first use, so thread counts cannot be compared reliably inside one process.
+    """
+    results = []
+    for backend in backends:
+        for threads in thread_counts:
+            cmd = [sys.executable, __file__, "--child", "--model", model, "--backends", backend,
+                   "--threads", str(threads), "--batch-sizes", *map(str, batch_sizes),
+                   "--num-texts", str(num_texts), "--repeat", str(repeat)]
+            if texts_file:
+                cmd += ["--texts-file", texts_file]
+            env = {**os.environ, "OMP_NUM_THREADS": str(threads), "MKL_NUM_THREADS": str(threads)}
+            proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+            if proc.returncode != 0:
+                print(f"⚠️ {backend} x {threads} threads failed: {proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            results.extend(json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{"))
+    return results
+
+
+def recommend(results: Sequence[Dict], workers: int, cpus: Optional[int] = None,
+              max_p95_ms: float = 50.0) -> Optional[Dict]:
+    """
+    Best configuration for `workers` encoder processes on `cpus` cores: threads per worker
+    may not oversubscribe the box, query p95 must stay under `max_p95_ms`, and among those
+    the highest total document throughput (per-worker throughput x workers) wins.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    budget = max(1, cpus // max(1, workers))
+    fitting = [r for r in results if r["threads"] <= budget]
+    within_latency = [r for r in fitting if r["p95_ms"] <= max_p95_ms] or fitting
+    if not within_latency:
+        return None
+    best = max(within_latency, key=lambda r: r["throughput"])
+    return {
+        **best,
+        "workers": workers,
+        "box_throughput": best["throughput"] * workers,
+        "env": {
+            "EMBEDDING_BACKEND": best["backend"],
+            "EMBED_THREADS": str(best["threads"]),
+            "EMBED_MAX_BATCH_SIZE": str(best["batch_size"]),
+            "WEB_CONCURRENCY": str(workers),
+        },
+    }
+
+
+def print_table(results: Sequence[Dict]):
+    print(f"{'backend':<10} {'threads':>7} {'batch':>5} {'emb/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in sorted(results, key=lambda r: (r["backend"], r["threads"], r["batch_size"])):
+        print(f"{r['backend']:<10} {r['threads']:>7} {r['batch_size']:>5} {r['throughput']:>9.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep embedding backend, threads and batch size")
+    parser.add_argument("--model", default=os.getenv("AZURE_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--threads", nargs="+", type=int, default=default_thread_counts())
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="uvicorn workers sharing the box, used for the recommendation")
+    parser.add_argument("--max-p95-ms", type=float, default=50.0, help="query latency budget")
+    parser.add_argument("--texts-file", help="JSON list of RepoDoc dicts to use as documents")
+    parser.add_argument("--num-texts", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write all results as JSON lines")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        docs, queries = load_corpus(args.texts_file, args.num_texts)
+        for row in run_config(args.model, args.backends[0], args.threads[0], args.batch_sizes, docs, queries, args.repeat):
+            print(json.dumps(row))
+        sys.exit(0)
+
+    results = sweep(args.model, args.backends, args.threads, args.batch_sizes,
+                    args.texts_file, args.num_texts, args.repeat)
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for row in results:
+                f.write(json.dumps(row) + "\n")
+
+    best = recommend(results, args.workers, max_p95_ms=args.max_p95_ms)
+    if best is None:
+        print("❌ No configuration completed")
+        sys.exit(1)
+    print(f"\n✅ Recommended for {args.workers} worker(s) on {os.cpu_count()} CPUs "
+          f"(~{best['box_throughput']:.0f} emb/s total, query p95 {best['p95_ms']:.1f} ms):")
+    for key, value in best["env"].items():
+        print(f"{key}={value}")
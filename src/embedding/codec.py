@@ -0,0 +1,84 @@
+import os
+import base64
+import struct
+from typing import Any, Dict, Optional, Sequence, Union
+import numpy as np
+
+# Encoding of stored document vectors: "float16" (default), "int8" (per-vector scale) or
+# "float32" (plain JSON list, the legacy format)
+VECTOR_ENCODING = os.getenv("VECTOR_ENCODING", "float16")
+ENCODINGS = ("float32", "float16", "int8")
+
+VectorLike = Union[np.ndarray, Sequence[float]]
+
+_KEY_HEADER = struct.Struct("<f")
+
+
+def quantize_int8(vector: VectorLike):
+    """Symmetric int8 quantization with one scale per vector: v ≈ q * scale."""
+    v = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(v).max()) if v.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    q = np.clip(np.rint(v / scale), -127, 127).astype(np.int8)
+    return q, scale
+
+
+def dequantize_int8(q: np.ndarray, scale: float) -> np.ndarray:
+    return q.astype(np.float32) * np.float32(scale)
+
+
+def encode_vector(vector: Any, encoding: str = VECTOR_ENCODING) -> Union[Dict[str, Any], list]:
+    """
+    Compact, JSON-safe form of a vector (or of an already encoded payload) for Cosmos
+    documents and JSON payloads. 384 floats take ~8 KB as a JSON list, ~1 KB as base64
+    float16 and ~0.5 KB as int8.
+    """
+    v = decode_vector(vector)
+    if v is None or v.size == 0:
+        return []
+    if encoding == "float32":
+        return v.tolist()
+    if encoding == "float16":
+        data = v.astype("<f2").tobytes()
+        return {"encoding": "float16", "dim": int(v.size), "data": base64.b64encode(data).decode("ascii")}
+    if encoding == "int8":
+        q, scale = quantize_int8(v)
+        return {"encoding": "int8", "dim": int(v.size), "scale": scale, "data": base64.b64encode(q.tobytes()).decode("ascii")}
+    raise ValueError(f"Unknown vector encoding '{encoding}', expected one of {ENCODINGS}")
+
+
+def decode_vector(value: Any) -> Optional[np.ndarray]:
+    """float32 array from any stored form: encode_vector payloads or legacy float lists."""
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, dict):
+        data = base64.b64decode(value["data"])
+        encoding = value.get("encoding")
+        if encoding == "float16":
+            return np.frombuffer(data, dtype="<f2").astype(np.float32)
+        if encoding == "int8":
+            return dequantize_int8(np.frombuffer(data, dtype=np.int8), value["scale"])
+        raise ValueError(f"Unknown vector encoding '{encoding}'")
+    return np.asarray(value, dtype=np.float32)
+
+
+def vector_to_list(value: Any) -> list:
+    """Plain float list, for the Azure AI Search SDK and other JSON consumers."""
+    vector = decode_vector(value)
+    return [] if vector is None else vector.tolist()
+
+
+def vector_key(vector: VectorLike) -> bytes:
+    """
+    Hashable int8 cache key: 4-byte scale followed by one byte per dimension,
+    ~390 bytes for 384 dims instead of a tuple of 384 Python floats.
+    """
+    q, scale = quantize_int8(vector)
+    return _KEY_HEADER.pack(scale) + q.tobytes()
+
+
+def key_to_vector(key: bytes) -> np.ndarray:
+    (scale,) = _KEY_HEADER.unpack_from(key)
+    return dequantize_int8(np.frombuffer(key, dtype=np.int8, offset=_KEY_HEADER.size), scale)
@@ -0,0 +1,177 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+import logging
+
+from src.embedding.backends import load_encoder, EMBEDDING_BACKEND
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Output sizes of the models this repo uses, so index and collection schemas can be
+# declared without loading a model
+KNOWN_DIMENSIONS = {
+    "BAAI/bge-small-en-v1.5": 384,
+    "BAAI/bge-base-en-v1.5": 768,
+    "BAAI/bge-large-en-v1.5": 1024,
+}
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def _weight_bytes(encoder) -> int:
+    """Size of the model weights: parameter tensors for torch, the model file for ONNX."""
+    model = getattr(encoder, "model", None)
+    if model is not None and hasattr(model, "parameters"):
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    model_path = getattr(encoder, "model_path", None)
+    if model_path and os.path.exists(model_path):
+        return os.path.getsize(model_path)
+    return 0
+
+
+class DimensionMismatchError(ValueError):
+    pass
+
+
+@dataclass
+class ModelEntry:
+    model_name: str
+    backend: str
+    encoder: Any
+    dimension: int
+    rss_delta_bytes: int
+    weight_bytes: int
+    load_seconds: float
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of embedding models, keyed by (model name, backend).
+
+    Every module that needs an encoder asks the registry, so a model is loaded at most
+    once per process no matter how many configs or pipelines refer to it. Loads of
+    different models run in parallel; concurrent requests for the same model wait for
+    a single load.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], ModelEntry] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, model_name: str, backend: str = EMBEDDING_BACKEND):
+        key = (model_name, backend)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock_for(key):
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._load(model_name, backend)
+                    self._entries[key] = entry
+        return entry.encoder
+
+    def _load(self, model_name: str, backend: str) -> ModelEntry:
+        # RSS deltas are approximate when other models load at the same time
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        encoder = load_encoder(model_name, backend)
+        entry = ModelEntry(
+            model_name=model_name,
+            backend=backend,
+            encoder=encoder,
+            dimension=int(encoder.get_sentence_embedding_dimension()),
+            rss_delta_bytes=max(_rss_bytes() - rss_before, 0),
+            weight_bytes=_weight_bytes(encoder),
+            load_seconds=time.perf_counter() - start,
+        )
+        logger.info(
+            f"Loaded {model_name} ({backend}): {entry.dimension}-d, "
+            f"+{entry.rss_delta_bytes / 2**20:.0f} MiB RSS, {entry.weight_bytes / 2**20:.0f} MiB weights "
+            f"in {entry.load_seconds:.1f}s"
+        )
+        return entry
+
+    def dimension(self, model_name: str, backend: str = EMBEDDING_BACKEND) -> int:
+        """Embedding size; from KNOWN_DIMENSIONS when the model is not loaded yet."""
+        entry = self._entries.get((model_name, backend))
+        if entry is not None:
+            return entry.dimension
+        if model_name in KNOWN_DIMENSIONS:
+            return KNOWN_DIMENSIONS[model_name]
+        self.get(model_name, backend)
+        return self._entries[(model_name, backend)].dimension
+
+    def check_dimension(self, model_name: str, expected: Optional[int], target: str,
+                        backend: str = EMBEDDING_BACKEND) -> int:
+        """Raise DimensionMismatchError (a ValueError) when the model's output size does not match the index or collection it writes to."""
+        actual = self.dimension(model_name, backend)
+        if expected is not None and int(expected) != actual:
+            raise DimensionMismatchError(
+                f"{model_name} produces {actual}-d vectors but {target} expects {expected}-d; "
+                f"re-embed the data or point {target} at a matching model"
+            )
+        logger.info(f"{target}: {model_name} dimension {actual} OK")
+        return actual
+
+    def loaded(self) -> List[ModelEntry]:
+        return list(self._entries.values())
+
+    def memory_report(self) -> List[Dict[str, Any]]:
+        """Resident memory per loaded model, plus the current process RSS."""
+        report = [
+            {
+                "model": e.model_name,
+                "backend": e.backend,
+                "dimension": e.dimension,
+                "rss_mb": round(e.rss_delta_bytes / 2**20, 1),
+                "weights_mb": round(e.weight_bytes / 2**20, 1),
+                "load_seconds": round(e.load_seconds, 2),
+            }
+            for e in self._entries.values()
+        ]
+        report.append({"model": "process", "rss_mb": round(_rss_bytes() / 2**20, 1)})
+        return report
+
+
+registry = ModelRegistry()
+
+
+def get_encoder(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """Shared encoder for `model_name`, loaded on first use."""
+    return registry.get(model_name, backend)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Load embedding models through the registry and report their memory")
+    parser.add_argument("models", nargs="*", default=["BAAI/bge-small-en-v1.5"])
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND)
+    args = parser.parse_args()
+
+    for name in args.models:
+        get_encoder(name, args.backend)
+        get_encoder(name, args.backend)  # second lookup is served from the registry
+    print(json.dumps(registry.memory_report(), indent=2))
@@ -0,0 +1,182 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+import queue
+import threading
+import time
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+_STOP = object()
+
+
+class EmbeddingService:
+    """
+    Dynamic micro-batching front end for a SentenceTransformer-style model.
+
+    Concurrent callers `submit` single texts and get a Future back. A worker thread
+    takes the first waiting request plus everything already queued behind it and runs
+    one `model.encode` call for the whole batch. A request that arrives alone is encoded
+    at once; only when others are queued with it does the worker wait up to
+    `max_wait_ms` for more, until `max_batch_size` is reached. Under load requests pile
+    up while a batch is encoding, so many batch-of-1 forward passes become a few large ones.
+    """
+
+    def __init__(self, model, max_batch_size: int = EMBED_MAX_BATCH_SIZE, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking single-text encode; returns a float32 vector."""
+        return self.submit(text).result(timeout=timeout)
+
+    def encode_many(self, texts: Sequence[str], timeout: Optional[float] = None) -> List[np.ndarray]:
+        futures = [self.submit(text) for text in texts]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # A lone request goes straight to the encoder; wait for stragglers only under concurrency
+                remaining = deadline - time.monotonic()
+                if len(batch) == 1 or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect_batch(first)
+            # Skip requests whose caller already gave up
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+                # One contiguous float32 matrix; each caller gets a row view, no per-query copy
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def close(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join()
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide batching service around the Azure search query encoder."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from src.azure_client.config import get_model
+                _service = EmbeddingService(get_model())
+    return _service
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Encode one query through the shared batching service."""
+    return get_embedding_service().encode(text)
+
+
+def embed_queries(texts: Sequence[str]) -> List[np.ndarray]:
+    """Encode several queries together; they are queued at once and land in one forward pass."""
+    return get_embedding_service().encode_many(texts)
+
+
+if __name__ == "__main__":
+    # Throughput of the real query encoder (AZURE_EMBEDDING_MODEL) under 32 concurrent callers;
+    # --stand-in swaps in a sleep-based model to check the batching logic without loading one
+    from concurrent.futures import ThreadPoolExecutor
+
+    class _SleepModel:
+        """
+        Stand-in for a CPU forward pass: fixed per-call overhead plus per-text cost,
+        one pass at a time (concurrent passes share the same cores).
+        """
+        _lock = threading.Lock()
+
+        def encode(self, texts, **kwargs):
+            with self._lock:
+                time.sleep(0.004 + 0.0002 * len(texts))
+            return np.zeros((len(texts), 384), dtype=np.float32)
+
+    if "--stand-in" in sys.argv:
+        model = _SleepModel()
+    else:
+        from src.azure_client.config import get_model
+        model = get_model()
+        model.encode(["warm up"])
+    label = type(model).__name__
+    texts = [f"query {i}" for i in range(512)]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda t: model.encode([t])[0], texts))
+        unbatched = time.perf_counter() - start
+
+        service = EmbeddingService(model)
+        start = time.perf_counter()
+        list(pool.map(service.encode, texts))
+        batched = time.perf_counter() - start
+        service.close()
+
+    print(f"{label} batch-of-1: {len(texts) / unbatched:8.1f} emb/s")
+    print(f"{label} micro-batch: {len(texts) / batched:8.1f} emb/s (avg batch {service.average_batch_size:.1f})")
@@ -1,22 +1,72 @@
 import os
 import json
 import re
-import requests
+import random
+import time
+import asyncio
+import threading
+import httpx
+from concurrent.futures import Future
 from datetime import date, timedelta
+from typing import Callable, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After (seconds) when it sends one."""
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
 class LLMClient:
-    def __init__(self, model: str = "gemini-1.5-pro"):
+    """
+    Gemini client on a pooled keep-alive httpx.AsyncClient.
+
+    The async client and its event loop live on one background thread owned by the
+    instance, so the sync methods work from plain threads and from inside FastAPI's
+    event loop alike, and concurrent callers share connections. At most
+    LLM_MAX_CONCURRENCY calls are in flight; 429/5xx responses and transport errors
+    are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, model: str = "gemini-1.5-pro", timeout: float = LLM_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 limiter=None, recorder: Optional[Callable] = None):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("⚠️ GOOGLE_API_KEY not set in .env file")
         
         self.model = model
         self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
-        self.headers = {"Content-Type": "application/json"}
+        self.headers = {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        # Optional gateway hooks: a RateLimiter for the Gemini quota and a per-prompt stats recorder
+        self.limiter = limiter
+        self.recorder = recorder
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop_lock = threading.Lock()
 
         today = date.today()
         self.date_context = {
@@ -27,21 +77,114 @@ class LLMClient:
             "365_days_ago": (today - timedelta(days=365)).strftime("%Y-%m-%d"),
         }
 
-    def _call(self, prompt: str) -> str:
+    # ===== EVENT LOOP / CONNECTION POOL =====
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _submit(self, coro) -> Future:
+        """Schedule a coroutine on the client's loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _run(self, coro):
+        return self._submit(coro).result()
+
+    def _get_http(self) -> httpx.AsyncClient:
+        # Only called on the client's loop, so no locking is needed
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def _acall(self, prompt: str, timeout: Optional[float] = None, name: str = "gemini") -> str:
+        http = self._get_http()
         payload = {
             "contents": [{"parts": [{"text": prompt}]}]
         }
+        estimated = max(1, len(prompt) // 4)
+        throttled = [0.0]
+
+        start = time.perf_counter()
+        async with self._semaphore:
+            try:
+                response = await self._post_with_retries(http, payload, timeout, estimated, throttled)
+            except Exception:
+                if self.recorder is not None:
+                    self.recorder(name, (time.perf_counter() - start) * 1000, throttled[0] * 1000, None, error=True)
+                raise
+
+        data = response.json()
+        usage_metadata = data.get("usageMetadata") or {}
+        usage = {
+            "prompt_tokens": usage_metadata.get("promptTokenCount", 0),
+            "completion_tokens": usage_metadata.get("candidatesTokenCount", 0),
+        } if usage_metadata else None
+        if self.limiter is not None:
+            self.limiter.settle(estimated, sum(usage.values()) if usage else None)
+        if self.recorder is not None:
+            self.recorder(name, (time.perf_counter() - start) * 1000, throttled[0] * 1000, usage)
 
-        response = requests.post(
-            f"{self.base_url}?key={self.api_key}",
-            headers=self.headers,
-            json=payload
-        )
-        response.raise_for_status()
-        text = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+        text = data["candidates"][0]["content"]["parts"][0]["text"]
         return re.sub(r"^```(json)?\s*|\s*```$", "", text.strip())
 
+    async def _post_with_retries(self, http: httpx.AsyncClient, payload: dict, timeout: Optional[float],
+                                 estimated: int, throttled: list) -> httpx.Response:
+        """
+        POST with retries. Every attempt, retries included, takes its own request and token
+        quota from the limiter first, so retries after a 429 cannot burst past the quota;
+        the time waited is added to `throttled[0]` (seconds).
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                throttled[0] += await asyncio.to_thread(self.limiter.acquire, estimated)
+            try:
+                response = await http.post(self.base_url, json=payload, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                await asyncio.sleep(backoff_delay(attempt, response.headers.get("retry-after")))
+                continue
+            response.raise_for_status()
+            return response
+
+    def _call(self, prompt: str, timeout: Optional[float] = None, name: str = "gemini") -> str:
+        return self._run(self._acall(prompt, timeout, name))
+
+    async def acall(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Awaitable from any event loop; the request itself runs on the client's loop."""
+        return await asyncio.wrap_future(self._submit(self._acall(prompt, timeout)))
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._http is not None:
+            self._run(self._http.aclose())
+            self._http = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    # ===== PROMPTS =====
+    # Each prompt is a coroutine run on the client's loop, with a sync wrapper and an
+    # awaitable wrapper usable from any other event loop
     def preprocessing(self, query: str) -> dict:
+        return self._run(self._preprocessing(query))
+
+    def generate_filter_chips(self, query: str) -> list:
+        return self._run(self._generate_filter_chips(query))
+
+    async def _preprocessing(self, query: str) -> dict:
         p = self.date_context
         prompt = f"""
 You are a natural language understanding agent that interprets user queries about GitHub repositories.
@@ -75,7 +218,7 @@ User query: "{query}"
 """.strip()
 
         try:
-            raw = self._call(prompt)
+            raw = await self._acall(prompt, name="gemini.preprocessing")
             return json.loads(raw)
         except Exception as e:
             print("⚠️ Preprocessing failed:", e)
@@ -93,7 +236,7 @@ User query: "{query}"
                 "rewritten_query": ""
             }
 
-    def generate_filter_chips(self, query: str) -> list:
+    async def _generate_filter_chips(self, query: str) -> list:
         prompt = f"""
 You are a filter suggestion assistant for a GitHub repository search interface.
 
@@ -111,7 +254,7 @@ User query: "{query}"
 """.strip()
 
         try:
-            raw = self._call(prompt)
+            raw = await self._acall(prompt, name="gemini.filter_chips")
             data = json.loads(raw)
             return data.get("related_queries", [])
         except Exception as e:
@@ -0,0 +1,197 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVAL_INPUT_PATH = os.path.join(BASE_DIR, "json_evaluate", "search_queries.json")
+EVAL_OUTPUT_PATH = os.getenv("EVAL_OUTPUT_PATH", "llm_rewrite_evaluation.jsonl")
+# Items in flight at once; the gateway's rate limiters still pace the actual requests
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+# Provider under test: every preprocess call goes to it alone (no hedging), so answers
+# and latencies are not a mix of providers. The judge (evaluate prompt) always runs on Groq.
+EVAL_PROVIDER = os.getenv("EVAL_PROVIDER", "groq")
+# Label the results are grouped by; defaults to a hash of the prompts, provider and models
+EVAL_PROMPT_VERSION = os.getenv("EVAL_PROMPT_VERSION")
+
+
+def default_prompt_version(provider: str = EVAL_PROVIDER) -> str:
+    """
+    `<provider>-<hash>`, the hash covering the preprocess/evaluate prompt files, the model
+    under test and the judge model, so changing any of them starts a new version.
+    """
+    from src.llm.gateway import PROMPTS, GROQ_MODEL, GEMINI_MODEL
+    digest = hashlib.blake2b(digest_size=6)
+    for name in ("preprocess", "evaluate"):
+        with open(os.path.join(BASE_DIR, "prompt_helpers", PROMPTS[name][0]), "rb") as f:
+            digest.update(f.read())
+    model = {"groq": GROQ_MODEL, "gemini": GEMINI_MODEL}.get(provider, provider)
+    for part in (provider, model, GROQ_MODEL):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"{provider}-{digest.hexdigest()}"
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Records of an evaluation JSONL file; a truncated last line (crash mid-write) is skipped."""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Skipping unreadable line {line_no} of {path}")
+    return records
+
+
+def _terminate_last_line(path: str):
+    # A crash mid-write leaves a partial line; appending straight after it would corrupt the next record too
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def evaluate_item(item: Dict[str, Any], prompt_version: str, provider: str = EVAL_PROVIDER) -> Dict[str, Any]:
+    """
+    Rewrite one test query with the preprocess prompt on `provider` and judge the rewrite
+    with the evaluate prompt, timing both calls. Any error (rate-limit timeout, transport
+    failure, unparseable answer) propagates, so the item is not recorded and is retried
+    on the next run instead of being stored as a wrong label.
+    """
+    from src.llm.llm_helpers import _preprocess_inputs, evaluate_rewrite
+    from src.llm.gateway import gateway
+
+    query = item.get("query")
+    start = time.perf_counter()
+    output = gateway.invoke("preprocess", _preprocess_inputs(query), provider=provider, hedge=False)
+    preprocess_ms = (time.perf_counter() - start) * 1000
+    rewritten_query = output.get("rewritten_query") or ""
+
+    start = time.perf_counter()
+    label, thinking = evaluate_rewrite(query, rewritten_query, strict=True)
+    evaluate_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "id": item.get("id"),
+        "prompt_version": prompt_version,
+        "provider": provider,
+        "original_query": query,
+        "rewritten_query": rewritten_query,
+        "true_label": bool(label),
+        "llm_evaluate_think": thinking,
+        "llm_output": output,
+        "preprocess_ms": round(preprocess_ms, 1),
+        "evaluate_ms": round(evaluate_ms, 1),
+    }
+
+
+def run_evaluation(input_path: str = EVAL_INPUT_PATH, output_path: str = EVAL_OUTPUT_PATH,
+                   concurrency: int = EVAL_CONCURRENCY, prompt_version: Optional[str] = EVAL_PROMPT_VERSION,
+                   limit: Optional[int] = None, provider: str = EVAL_PROVIDER) -> List[Dict[str, Any]]:
+    """
+    Evaluate every query of `input_path` that `output_path` has no record of for this
+    prompt version, `concurrency` items at a time. Each finished item is appended to the
+    JSONL file and flushed immediately, so an interrupted run resumes where it stopped.
+    Returns the records of this prompt version, old and new.
+    """
+    prompt_version = prompt_version or default_prompt_version(provider)
+    with open(input_path, encoding="utf-8") as f:
+        test_items = json.load(f)[:limit]
+
+    done = {r["id"] for r in load_results(output_path) if r.get("prompt_version") == prompt_version}
+    todo = [item for item in test_items if item.get("id") not in done]
+    logger.info(f"📊 Prompt version {prompt_version}: {len(done)} items already evaluated, "
+                f"{len(todo)} to go ({concurrency} at a time)")
+
+    _terminate_last_line(output_path)
+    write_lock = threading.Lock()
+    failed = 0
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(evaluate_item, item, prompt_version, provider): item for item in todo}
+        for n, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                failed += 1
+                logger.warning(f"⚠️ ID {item.get('id')} failed, will retry on the next run: {e}")
+                continue
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            logger.info(f"{'✅' if record['true_label'] else '❌'} [{n}/{len(todo)}] ID {record['id']}: "
+                        f"{record['original_query']} → {record['rewritten_query']} "
+                        f"({record['preprocess_ms']:.0f} + {record['evaluate_ms']:.0f} ms)")
+
+    if todo:
+        logger.info(f"🏁 Evaluated {len(todo) - failed}/{len(todo)} items in {time.perf_counter() - start:.1f}s"
+                    + (f", {failed} failed" if failed else ""))
+    return [r for r in load_results(output_path) if r.get("prompt_version") == prompt_version]
+
+
+def summarize_results(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Accuracy and p50/p95 latency of each prompt call, per prompt version."""
+    by_version = defaultdict(list)
+    for record in records:
+        by_version[record.get("prompt_version", "unversioned")].append(record)
+
+    summary = {}
+    for version, rows in by_version.items():
+        stats = {"items": len(rows), "accuracy": float(np.mean([bool(r.get("true_label")) for r in rows]))}
+        for key in ("preprocess_ms", "evaluate_ms"):
+            latencies = np.asarray([r[key] for r in rows if r.get(key) is not None])
+            stats[f"{key[:-3]}_p50_ms"] = float(np.percentile(latencies, 50)) if latencies.size else None
+            stats[f"{key[:-3]}_p95_ms"] = float(np.percentile(latencies, 95)) if latencies.size else None
+        summary[version] = stats
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]]):
+    fmt = lambda value: f"{value:8.0f}" if value is not None else f"{'-':>8}"
+    print(f"{'version':<20}{'items':>6}{'accuracy':>10}{'pre p50':>9}{'pre p95':>9}{'eval p50':>9}{'eval p95':>9}")
+    for version, s in summary.items():
+        print(f"{version:<20}{s['items']:>6}{s['accuracy']:>10.1%} {fmt(s['preprocess_p50_ms'])} {fmt(s['preprocess_p95_ms'])}"
+              f" {fmt(s['evaluate_p50_ms'])} {fmt(s['evaluate_p95_ms'])}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate LLM query rewrites (resumable, concurrent)")
+    parser.add_argument("input", nargs="?", default=EVAL_INPUT_PATH, help="JSON list of {id, query}")
+    parser.add_argument("--output", default=EVAL_OUTPUT_PATH, help="JSONL results file, appended to")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--provider", default=EVAL_PROVIDER, choices=["groq", "gemini"],
+                        help="LLM answering the preprocess prompt (not hedged)")
+    parser.add_argument("--prompt-version", default=EVAL_PROMPT_VERSION,
+                        help="label for this run's results (default: provider and a hash of the prompts and models)")
+    parser.add_argument("--limit", type=int, help="evaluate only the first N queries")
+    parser.add_argument("--summary-only", action="store_true", help="summarize the output file without calling the LLM")
+    args = parser.parse_args()
+
+    if not args.summary_only:
+        run_evaluation(args.input, args.output, args.concurrency, args.prompt_version, args.limit, args.provider)
+        from src.llm.gateway import gateway
+        for name in ("preprocess", "evaluate"):
+            stats = gateway.report().get(name)
+            if stats:
+                print(f"⏳ {name}: {stats['throttled_ms'] / 1000:.1f}s waiting on the rate limiter over {stats['calls']} calls")
+    print_summary(summarize_results(load_results(args.output)))
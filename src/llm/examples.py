@@ -0,0 +1,210 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import re
+import json
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "azure": the github_ex search index (network call); "local": BM25 over the example file in memory.
+# Switch the default to "local" only once `python src/llm/examples.py --compare` shows its
+# top-3 agrees with the index on the evaluation queries.
+FEW_SHOT_SOURCE = os.getenv("FEW_SHOT_SOURCE", "azure")
+FEW_SHOT_EXAMPLES_PATH = os.getenv(
+    "FEW_SHOT_EXAMPLES_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'mock_data', 'github_query_metadata.json'))
+)
+# How often (seconds) a search checks the file's mtime for changes
+FEW_SHOT_REFRESH_S = float(os.getenv("FEW_SHOT_REFRESH_S", "30"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _example_text(item: Dict[str, Any]) -> str:
+    llm_output = item.get("llm_output") or {}
+    if isinstance(llm_output, str):
+        try:
+            llm_output = json.loads(llm_output)
+        except json.JSONDecodeError:
+            llm_output = {}
+    filters = llm_output.get("filters") or {}
+    topics = [t for t in (filters.get("topics") or []) + (filters.get("libraries") or []) if isinstance(t, str)]
+    return " ".join([item.get("original_query", ""), item.get("rewritten_query", ""), *topics])
+
+
+class ExampleRetriever:
+    """
+    Okapi BM25 over the few-shot example set, held in memory.
+
+    The per-document term weights are precomputed into one dense (examples x vocabulary)
+    float32 matrix, so a query is a column gather and a row sum: a few microseconds for
+    the ~100 examples. The source file is reloaded when its mtime changes.
+    """
+
+    def __init__(self, path: str = FEW_SHOT_EXAMPLES_PATH, k1: float = 1.2, b: float = 0.75,
+                 refresh_s: float = FEW_SHOT_REFRESH_S):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.refresh_s = refresh_s
+        self.examples: List[Dict[str, Any]] = []
+        self.vocab: Dict[str, int] = {}
+        self.weights: Optional[np.ndarray] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            examples = json.load(f)
+
+        docs = [tokenize(_example_text(item)) for item in examples]
+        vocab: Dict[str, int] = {}
+        for tokens in docs:
+            for token in tokens:
+                vocab.setdefault(token, len(vocab))
+
+        tf = np.zeros((len(docs), max(len(vocab), 1)), dtype=np.float32)
+        for row, tokens in enumerate(docs):
+            for token in tokens:
+                tf[row, vocab[token]] += 1
+        lengths = tf.sum(axis=1, keepdims=True)
+        avg_length = float(lengths.mean()) if len(docs) else 1.0
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(avg_length, 1e-9))
+        weights = idf * tf * (self.k1 + 1) / (tf + norm)
+
+        # Swap in one assignment so concurrent searches see the old or the new index, never a mix
+        self.examples, self.vocab, self.weights = examples, vocab, weights
+        self._mtime = mtime
+        logger.info(f"✅ Loaded {len(examples)} few-shot examples ({len(vocab)} terms) from {self.path}")
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.weights is not None and now - self._checked_at < self.refresh_s:
+            return
+        with self._lock:
+            if self.weights is not None and now - self._checked_at < self.refresh_s:
+                return
+            self._checked_at = now
+            try:
+                changed = os.path.getmtime(self.path) != self._mtime
+            except OSError as e:
+                if self.weights is None:
+                    raise
+                logger.warning(f"⚠️ Few-shot example file unavailable, keeping the loaded set: {e}")
+                return
+            if changed:
+                self.load()
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        self._refresh()
+        weights, vocab, examples = self.weights, self.vocab, self.examples
+        ids = [vocab[t] for t in set(tokenize(query)) if t in vocab]
+        if not ids or not examples:
+            return []
+        scores = weights[:, ids].sum(axis=1)
+        top_k = min(top_k, len(examples))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [examples[i] for i in top if scores[i] > 0]
+
+
+_retriever: Optional[ExampleRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_example_retriever() -> ExampleRetriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                retriever = ExampleRetriever()
+                retriever.load()
+                _retriever = retriever
+    return _retriever
+
+
+def search_examples(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    """Few-shot examples for the preprocess prompts, from FEW_SHOT_SOURCE."""
+    if FEW_SHOT_SOURCE == "azure":
+        from src.llm.utils import github_text_search
+        return github_text_search(query, top_k=top_k)
+    return get_example_retriever().search(query, top_k=top_k)
+
+
+def _example_key(item: Dict[str, Any]) -> str:
+    # The original query is present both in the file and in the index documents
+    return str(item.get("original_query") or item.get("id"))
+
+
+def compare_sources(queries: List[str], top_k: int = 3) -> Dict[str, Any]:
+    """
+    Top-k overlap between the local BM25 retriever and the github_ex index (github_text_search)
+    over `queries`: the mean share of the index's examples that BM25 also returns, and how many
+    queries get exactly the same set.
+    """
+    from src.llm.utils import github_text_search
+    retriever = get_example_retriever()
+    rows = []
+    for query in queries:
+        local = {_example_key(item) for item in retriever.search(query, top_k=top_k)}
+        azure = {_example_key(item) for item in github_text_search(query, top_k=top_k)}
+        rows.append({"query": query, "local": sorted(local), "azure": sorted(azure),
+                     "overlap": len(local & azure) / len(azure) if azure else float(not local)})
+    return {
+        "queries": len(rows),
+        "mean_overlap": float(np.mean([r["overlap"] for r in rows])) if rows else 0.0,
+        "identical": sum(r["local"] == r["azure"] for r in rows),
+        "rows": rows,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Few-shot example retrieval")
+    parser.add_argument("--compare", action="store_true",
+                        help="report local BM25 vs github_ex index top-3 overlap on the evaluation queries")
+    parser.add_argument("--queries", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "json_evaluate", "search_queries.json"),
+                        help="JSON list of {id, query} used by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.queries, encoding="utf-8") as f:
+            report = compare_sources([item["query"] for item in json.load(f)])
+        for row in report["rows"]:
+            if row["overlap"] < 1:
+                print(f"  {row['overlap']:.0%}  {row['query']}\n       local {row['local']}  azure {row['azure']}")
+        print(f"\n📊 {report['queries']} queries: mean top-3 overlap {report['mean_overlap']:.1%}, "
+              f"{report['identical']} identical")
+        sys.exit(0)
+
+    queries = [
+        "python ml repos more than 100 stars in 2024",
+        "popular rust cli tools last month",
+        "thư viện xử lý ảnh bằng python",
+        "chatbot using transformers",
+    ]
+    retriever = get_example_retriever()
+    for query in queries:
+        print(f"\n🔎 {query}")
+        for example in retriever.search(query):
+            print(f"  - {example['original_query']}")
+
+    n = 10000
+    start = time.perf_counter()
+    for i in range(n):
+        retriever.search(queries[i % len(queries)])
+    print(f"\n⏱️ {(time.perf_counter() - start) / n * 1e6:.1f} µs per search")
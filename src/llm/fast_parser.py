@@ -0,0 +1,339 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import re
+import json
+import calendar
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+# Queries parsed with at least this confidence skip the LLM entirely. At 0.95, 36% of the
+# mock_data queries bypass, and stars/date filters agree with the stored LLM output on
+# 97-100% of them (`python src/llm/fast_parser.py`); every filter agrees on 75%, against
+# 66% at 0.85. The remaining language mismatches are mostly LLM answers that are not languages
+# ("Flask", "vi", "C++" for a Vietnamese query), which the lexicon rejects on purpose.
+FAST_PARSE_ENABLED = os.getenv("FAST_PARSE_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PARSE_THRESHOLD = float(os.getenv("FAST_PARSE_THRESHOLD", "0.95"))
+POPULAR_STARS_MIN = 500  # same default threshold the preprocess prompt uses for "popular"
+
+# ===== LEXICON =====
+# Canonical language name for each surface form (lowercased). "go" and "c" are matched
+# case-sensitively in parse_query_fast because they are also ordinary words.
+LANGUAGES = {
+    "python": "python", "javascript": "javascript", "js": "javascript", "node.js": "javascript",
+    "nodejs": "javascript", "node": "javascript", "typescript": "typescript", "ts": "typescript",
+    "java": "java", "golang": "go", "rust": "rust", "c++": "c++", "cpp": "c++", "c#": "c#",
+    "csharp": "c#", "ruby": "ruby", "php": "php", "kotlin": "kotlin", "swift": "swift",
+    "scala": "scala", "dart": "dart", "julia": "julia", "haskell": "haskell", "lua": "lua",
+}
+CASE_SENSITIVE_LANGUAGES = {"Go": "go", "C": "c"}
+
+LIBRARIES = {
+    "pytorch": "pytorch", "torch": "pytorch", "tensorflow": "tensorflow", "keras": "keras",
+    "react": "react", "vue": "vue", "angular": "angular", "flask": "flask", "django": "django",
+    "fastapi": "fastapi", "langchain": "langchain", "llamaindex": "llamaindex",
+    "llama index": "llamaindex", "huggingface": "huggingface", "hugging face": "huggingface",
+    "transformers": "transformers", "opencv": "opencv", "scikit-learn": "scikit-learn",
+    "sklearn": "scikit-learn", "pandas": "pandas", "numpy": "numpy", "spark": "spark",
+    "jax": "jax", "bert": "bert", "yolo": "yolo",
+}
+
+TOPICS = {
+    "ai": "ai", "artificial intelligence": "ai", "machine learning": "machine learning",
+    "ml": "machine learning", "deep learning": "deep learning", "nlp": "nlp",
+    "natural language processing": "nlp", "computer vision": "computer vision",
+    "image processing": "image processing", "image classification": "image classification",
+    "object detection": "object detection", "face recognition": "face recognition",
+    "ocr": "ocr", "chatbot": "chatbot", "chatbots": "chatbot", "llm": "llm", "llms": "llm",
+    "large language models": "llm", "rag": "rag", "web scraping": "web scraping",
+    "scraping": "web scraping", "crawler": "web scraping", "data visualization": "data visualization",
+    "visualization": "data visualization", "reinforcement learning": "reinforcement learning",
+    "sentiment analysis": "sentiment analysis", "stable diffusion": "stable diffusion",
+    "recommender systems": "recommender systems", "recommender system": "recommender systems",
+    "anomaly detection": "anomaly detection", "text summarization": "text summarization",
+    "speech to text": "speech to text", "speech-to-text": "speech to text",
+    "deepfake detection": "deepfake detection", "deepfake": "deepfake detection",
+    "web framework": "web framework", "web frameworks": "web framework", "rest api": "rest api",
+    "rest apis": "rest api", "cli": "cli", "cli tools": "cli", "database": "database",
+    "devops": "devops", "kubernetes": "kubernetes", "docker": "docker", "blockchain": "blockchain",
+    "game engine": "game engine", "audio processing": "audio processing",
+    "video processing": "video processing", "time series": "time series",
+    "mlops": "mlops", "fine-tuning": "fine-tuning", "fine tuning": "fine-tuning",
+    "transformer": "transformer", "gan": "gan", "robotics": "robotics",
+}
+
+# Words that carry no filter or topic meaning (English and Vietnamese)
+FILLER = set("""
+a an the any some and or of on in at to for with by from about using use used uses written built
+based made into via that which is are show me find search looking want need list get give
+repo repos repository repositories project projects library libraries lib libs tool tools
+framework frameworks package packages code source open open-source opensource github example
+examples tutorial tutorials sample samples app apps application applications implementation
+implementations created updated published released new good great
+các những về dùng sử dụng viết bằng với có được tạo cập nhật dự án thư viện công cụ repo
+tìm gợi ý cho của và hoặc mã nguồn mở trong ví dụ ứng dụng
+""".split())
+
+POPULAR_WORDS = ["most starred", "top-starred", "top starred", "popular", "trending", "top",
+                 "best", "famous", "hot", "nổi tiếng", "nổi bật", "phổ biến", "thịnh hành", "tốt nhất"]
+
+NUMBER = r"(\d+(?:[.,]\d+)?)\s*(k)?"
+STAR_WORD = r"(?:stars?|sao|⭐)"
+
+STARS_MIN_PATTERNS = [
+    rf"(?:more than|over|above|at least|greater than|min(?:imum)?|>=?|trên|hơn|ít nhất|tối thiểu)\s+{NUMBER}\s*\+?\s*{STAR_WORD}",
+    rf"{NUMBER}\s*\+\s*{STAR_WORD}",
+    rf"{STAR_WORD}\s*(?:>=?|over|above)\s*{NUMBER}",
+    rf"(?:with|có)\s+{NUMBER}\s*{STAR_WORD}",
+]
+# An upper bound has no field in the filter schema; the LLM decides what to do with it
+STARS_MAX_PATTERNS = [
+    rf"(?:fewer than|less than|under|below|at most|<=?|dưới|ít hơn|không quá)\s+{NUMBER}\s*{STAR_WORD}",
+]
+
+YEAR = r"((?:19|20)\d{2})"
+DATE = r"(\d{4}-\d{2}-\d{2})"
+VERB = r"(?:(?:created|updated|published|released|tạo|cập nhật)\s+)?"
+
+RELATIVE_DAYS = [
+    (r"(?:last|past|previous)\s+week|tuần\s+(?:vừa\s+qua|qua|trước)", 7),
+    (r"(?:last|past|previous)\s+month|tháng\s+(?:vừa\s+qua|qua|trước)", 30),
+    (r"(?:last|past|previous)\s+year|năm\s+(?:vừa\s+qua|qua|trước)", 365),
+    (r"recent(?:ly)?|lately|mới\s+đây|gần\s+đây", 90),
+]
+RELATIVE_N = r"(?:(?:within|in)\s+)?(?:the\s+)?(?:last|past)\s+(\d+)\s+(days?|weeks?|months?|years?)|trong\s+vòng\s+(\d+)\s+(ngày|tuần|tháng|năm)(?:\s+gần\s+(?:nhất|đây))?"
+# "early 2024", "cuối năm 2023": partial periods the filter ranges below don't capture
+DATE_MODIFIERS = r"(?<!\w)(?:early|late|mid|end of|beginning of|đầu|cuối|giữa)(?!\w)"
+UNIT_DAYS = {"day": 1, "ngày": 1, "week": 7, "tuần": 7}
+UNIT_MONTHS = {"month": 1, "tháng": 1, "year": 12, "năm": 12}
+
+
+@dataclass
+class FastParse:
+    filters: Dict[str, Any]
+    rewritten_query: str
+    query_vector_required: bool
+    confidence: float
+    unknown: List[str] = field(default_factory=list)
+
+    def parse_query(self) -> dict:
+        """Same shape as the `llm_preprocess` result."""
+        return {
+            "intent": "search_repository",
+            "filters": self.filters,
+            "query_vector_required": self.query_vector_required,
+            "rewritten_query": self.rewritten_query,
+        }
+
+
+def _months_ago(today: date, months: int) -> date:
+    # Calendar months, like the preprocess prompt: 6 months before 2025-06-13 is 2024-12-13
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return date(year, month + 1, min(today.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _number(value: str, thousands: Optional[str]) -> int:
+    number = float(value.replace(",", "."))
+    return int(number * 1000) if thousands else int(number)
+
+
+def _phrase_pattern(phrase: str) -> str:
+    # Phrases may contain regex metacharacters (c++, node.js); spaces also match hyphens
+    escaped = r"[\s\-]+".join(re.escape(part) for part in phrase.split())
+    return rf"(?<![\w+#.]){escaped}(?![\w+#])"
+
+
+def _consume(text: str, pattern: str) -> tuple:
+    """First match of pattern in text, and the text with the match blanked out."""
+    match = re.search(pattern, text, flags=re.IGNORECASE)
+    if not match:
+        return None, text
+    return match, text[:match.start()] + " " + text[match.end():]
+
+
+def _match_lexicon(text: str, lexicon: Dict[str, str]) -> tuple:
+    found = []
+    # Longest phrases first so "machine learning" wins over "learning"
+    for phrase in sorted(lexicon, key=len, reverse=True):
+        while True:
+            match, text = _consume(text, _phrase_pattern(phrase))
+            if not match:
+                break
+            if lexicon[phrase] not in found:
+                found.append(lexicon[phrase])
+    return found, text
+
+
+def parse_query_fast(query: str, today: Optional[date] = None) -> FastParse:
+    """
+    Lexicon and regex parser producing the same `filters` JSON as `llm_preprocess`.
+
+    Confidence is the share of query words the parser understood (filters, known
+    topics/libraries/languages and filler words). Constraints it cannot express, such as
+    an upper bound on stars, or a query with nothing to search for, get a low score.
+    """
+    today = today or date.today()
+    text = re.sub(r"\s+", " ", query.strip())
+    total_words = max(1, len(re.findall(r"[\w+#.\-]+", text)))
+    filters = {"language": None, "libraries": [], "created_after": None,
+               "created_before": None, "stars_min": None, "topics": []}
+    unsupported = False
+
+    # Stars
+    for pattern in STARS_MAX_PATTERNS:
+        match, text = _consume(text, pattern)
+        unsupported = unsupported or bool(match)
+    for pattern in STARS_MIN_PATTERNS:
+        match, text = _consume(text, pattern)
+        if match:
+            filters["stars_min"] = _number(match.group(1), match.group(2))
+            break
+    for word in POPULAR_WORDS:
+        match, text = _consume(text, _phrase_pattern(word))
+        if match and filters["stars_min"] is None:
+            filters["stars_min"] = POPULAR_STARS_MIN
+    text = re.sub(rf"(?<!\w){STAR_WORD}(?!\w)", " ", text, flags=re.IGNORECASE)
+
+    # Dates: explicit days, then years, then relative periods
+    unsupported = unsupported or bool(re.search(DATE_MODIFIERS, text, flags=re.IGNORECASE))
+    match, text = _consume(text, rf"{VERB}(?:after|since|from|sau(?:\s+ngày)?|từ(?:\s+ngày)?)\s+{DATE}")
+    if match:
+        filters["created_after"] = match.group(1)
+    match, text = _consume(text, rf"{VERB}(?:before|until|trước(?:\s+ngày)?)\s+{DATE}")
+    if match:
+        filters["created_before"] = match.group(1)
+    match, text = _consume(text, rf"{VERB}(?:after|since|from|sau(?:\s+năm)?|từ(?:\s+năm)?)\s+{YEAR}(?:\s+(?:onwards?|trở\s+đi))?")
+    if match:
+        filters["created_after"] = f"{match.group(1)}-01-01"
+    match, text = _consume(text, rf"{VERB}(?:before|prior to|trước(?:\s+năm)?)\s+{YEAR}")
+    if match:
+        filters["created_before"] = f"{match.group(1)}-01-01"
+    if not filters["created_after"] and not filters["created_before"]:
+        match, text = _consume(text, rf"{VERB}(?:(?:in|during|trong)\s+)?(?:(?:the\s+)?year\s+|năm\s+)?{YEAR}")
+        if match:
+            filters["created_after"] = f"{match.group(1)}-01-01"
+            filters["created_before"] = f"{match.group(1)}-12-31"
+    match, text = _consume(text, rf"{VERB}{RELATIVE_N}")
+    if match:
+        amount = int(match.group(1) or match.group(3))
+        unit = (match.group(2) or match.group(4)).rstrip("s").lower()
+        if unit in UNIT_MONTHS:
+            filters["created_after"] = _months_ago(today, amount * UNIT_MONTHS[unit]).isoformat()
+        else:
+            filters["created_after"] = (today - timedelta(days=amount * UNIT_DAYS[unit])).isoformat()
+        filters["created_before"] = today.isoformat()
+    for pattern, days in RELATIVE_DAYS:
+        match, text = _consume(text, rf"{VERB}(?:(?:in|within)\s+(?:the\s+)?)?(?:{pattern})")
+        if match:
+            filters["created_after"] = (today - timedelta(days=days)).isoformat()
+            filters["created_before"] = today.isoformat()
+            break
+
+    # Languages, libraries, topics
+    languages, text = _match_lexicon(text, LANGUAGES)
+    for surface, language in CASE_SENSITIVE_LANGUAGES.items():
+        match = re.search(rf"(?<![\w+#]){re.escape(surface)}(?![\w+#])", text)
+        if match:
+            languages.append(language)
+            text = text[:match.start()] + " " + text[match.end():]
+    filters["libraries"], text = _match_lexicon(text, LIBRARIES)
+    filters["topics"], text = _match_lexicon(text, TOPICS)
+    if languages:
+        filters["language"] = languages[0]
+        unsupported = unsupported or len(set(languages)) > 1
+
+    # What is left should be filler; anything else is a word the parser did not understand
+    leftover = re.findall(r"[\w+#.\-]+", text.lower())
+    unknown = [w for w in leftover if w.strip(".-") and w.strip(".-") not in FILLER and not w.isdigit()]
+
+    confidence = 1.0 - len(unknown) / total_words
+    has_subject = bool(filters["topics"] or filters["libraries"] or filters["language"])
+    if unsupported or not has_subject:
+        confidence = min(confidence, 0.5)
+
+    # Rewritten query: the searchable subject (topics, libraries, language and leftover
+    # words), never the star or date filters
+    subject = filters["topics"] + filters["libraries"] + unknown
+    if filters["language"]:
+        subject.append(filters["language"])
+    rewritten_query = " ".join(subject)
+
+    return FastParse(
+        filters=filters,
+        rewritten_query=rewritten_query,
+        query_vector_required=not (filters["topics"] or filters["libraries"]),
+        confidence=round(max(confidence, 0.0), 3),
+        unknown=unknown,
+    )
+
+
+# ===== EVALUATION =====
+def _norm(value):
+    if value in (None, "", "null", "None"):
+        return None
+    return str(value).strip().lower()
+
+
+def _norm_list(values) -> set:
+    return {v for v in (_norm(x) for x in (values or [])) if v}
+
+
+def evaluate(path: str, threshold: float = FAST_PARSE_THRESHOLD, today: date = date(2025, 6, 13)) -> Dict[str, Any]:
+    """
+    Bypass rate and field agreement with the stored LLM output, on queries the fast path
+    would answer. `today` defaults to the date the stored LLM outputs were generated, so
+    relative dates ("recently") are compared on the same reference day.
+    """
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+
+    fields = ("language", "stars_min", "created_after", "created_before")
+    agree = {name: 0 for name in fields}
+    all_agree = 0
+    topic_overlap = 0
+    bypassed = []
+    for item in items:
+        parsed = parse_query_fast(item["original_query"], today=today)
+        if parsed.confidence < threshold:
+            continue
+        llm_filters = (item.get("llm_output") or {}).get("filters") or {}
+        bypassed.append(item["original_query"])
+        matches = [_norm(parsed.filters[name]) == _norm(llm_filters.get(name)) for name in fields]
+        for name, matched in zip(fields, matches):
+            agree[name] += matched
+        all_agree += all(matches)
+        ours = _norm_list(parsed.filters["topics"]) | _norm_list(parsed.filters["libraries"])
+        theirs = _norm_list(llm_filters.get("topics")) | _norm_list(llm_filters.get("libraries"))
+        topic_overlap += bool(ours & theirs) or (not ours and not theirs)
+
+    n = len(bypassed)
+    return {
+        "queries": len(items),
+        "bypassed": n,
+        "bypass_rate": n / len(items) if items else 0.0,
+        "agreement": {name: agree[name] / n if n else None for name in fields},
+        "all_filters_agree": all_agree / n if n else None,
+        "topic_overlap": topic_overlap / n if n else None,
+        "bypassed_queries": bypassed,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from pprint import pprint
+
+    default_path = os.path.join(os.path.dirname(__file__), "..", "..", "mock_data", "github_query_metadata.json")
+    parser = argparse.ArgumentParser(description="Rule-based query parser: parse a query or evaluate against LLM output")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--evaluate", default=os.path.abspath(default_path))
+    parser.add_argument("--threshold", type=float, default=FAST_PARSE_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.query:
+        pprint(parse_query_fast(args.query))
+    else:
+        report = evaluate(args.evaluate, threshold=args.threshold)
+        for query in report.pop("bypassed_queries"):
+            pprint(parse_query_fast(query, today=date(2025, 6, 13)).filters | {"query": query})
+        pprint(report)
@@ -0,0 +1,305 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import time
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Optional
+import numpy as np
+from dotenv import load_dotenv
+from src.llm.hedging import HedgedExecutor, LLM_HEDGE_ENABLED, LLM_HEDGE_PROVIDERS
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+# Groq free-tier quotas for llama-3.1-8b-instant; raise them to match the account's plan
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "6000"))
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+LLM_RATE_LIMIT_TIMEOUT = float(os.getenv("LLM_RATE_LIMIT_TIMEOUT", "30"))
+
+# System prompt file and human message template for each prompt
+PROMPTS = {
+    "preprocess": ("llm_fielter_process.txt", "Query: {query}"),
+    "generate": ("query_generate.txt", "Given the input query: '{query}'"),
+    "filter": ("filter_generate.txt", "Given the input query: {query}"),
+    "evaluate": ("llm_evaluate_process.txt", None),
+    "intent": ("agent_intent_query.txt", "Given the input query: {query}"),
+    "understand": ("query_understanding.txt", "Query: {query}"),
+}
+
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> float:
+        """Block until `amount` is available and take it; returns the time waited."""
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return now - start
+                wait = (amount - self.tokens) / self.rate
+            if timeout is not None and now - start + wait > timeout:
+                raise RateLimitTimeout(f"Rate limit wait of {wait:.1f}s exceeds {timeout:.1f}s")
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens after the fact; may go below zero."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Request and token quotas of one provider, as two per-minute token buckets."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+
+    def acquire(self, estimated_tokens: int, timeout: Optional[float] = LLM_RATE_LIMIT_TIMEOUT) -> float:
+        waited = self.requests.acquire(1, timeout)
+        return waited + self.tokens.acquire(estimated_tokens, timeout)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the provider reports real usage."""
+        if actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+@dataclass
+class PromptStats:
+    calls: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    throttled_ms: float = 0.0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "throttled_ms": round(self.throttled_ms, 1),
+            "p50_ms": float(np.percentile(latencies, 50)) if latencies is not None else None,
+            "p95_ms": float(np.percentile(latencies, 95)) if latencies is not None else None,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; corrected by settle() after the call
+    return max(1, len(text) // 4)
+
+
+def _usage(message) -> Optional[Dict[str, int]]:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return {"prompt_tokens": token_usage.get("prompt_tokens", 0), "completion_tokens": token_usage.get("completion_tokens", 0)}
+    return None
+
+
+def _groq_client():
+    if not GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY environment variable is required")
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        api_key=GROQ_API_KEY,
+        model=GROQ_MODEL,
+        temperature=0.5
+    )
+
+
+def _gemini_client():
+    from src.llm.client import LLMClient
+    return LLMClient(model=GEMINI_MODEL, limiter=gateway.limiter("gemini"), recorder=gateway.record)
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM calls.
+
+    - One client per provider, created on first use and shared by every caller.
+    - Prompt templates are read from prompt_helpers/ and compiled once per process.
+    - Every call waits on the provider's request/token buckets before it is sent, so a
+      burst queues locally instead of being rejected with 429s.
+    - Latency, throttling and token usage are recorded per prompt (see `report`).
+    - Structured (JSON) prompts are hedged across LLM_HEDGE_PROVIDERS: when the primary
+      is slower than its p95, the same prompt goes to the next provider and the first
+      valid answer wins. Tests can swap providers with `hedger.set_provider`.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, Callable[[], Any]] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, PromptStats] = {}
+        self._stats_lock = threading.Lock()
+        self.hedger = HedgedExecutor({"groq": self._groq_text, "gemini": self._gemini_text})
+
+    def _groq_text(self, name: str, messages) -> str:
+        return self.complete(name, messages, "groq").content
+
+    def _gemini_text(self, name: str, messages) -> str:
+        text = messages if isinstance(messages, str) else messages.to_string()
+        return self.get_client("gemini")._call(text, name=f"gemini.{name}")
+
+    def register_provider(self, name: str, factory: Callable[[], Any],
+                          requests_per_minute: float, tokens_per_minute: float):
+        self._providers[name] = factory
+        self._limiters[name] = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def limiter(self, provider: str) -> RateLimiter:
+        return self._limiters[provider]
+
+    def get_client(self, provider: str = "groq"):
+        client = self._clients.get(provider)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(provider)
+                if client is None:
+                    client = self._providers[provider]()
+                    self._clients[provider] = client
+        return client
+
+    def get_prompt(self, name: str):
+        # lru_cache alone may build a template twice under concurrent first calls
+        with self._lock:
+            return _build_prompt(name)
+
+    def record(self, name: str, latency_ms: float, throttled_ms: float,
+                usage: Optional[Dict[str, int]], error: bool = False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, PromptStats())
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.throttled_ms += throttled_ms
+            stats.latencies_ms.append(latency_ms)
+            if usage:
+                stats.prompt_tokens += usage["prompt_tokens"]
+                stats.completion_tokens += usage["completion_tokens"]
+
+    def complete(self, name: str, messages, provider: str = "groq", **kwargs):
+        """
+        Send `messages` (a string or a formatted prompt value) through the provider's
+        rate limiter and record the call under `name`. Extra kwargs (e.g. temperature)
+        are passed to the client for this call only.
+        """
+        client = self.get_client(provider)
+        limiter = self._limiters[provider]
+        text = messages if isinstance(messages, str) else messages.to_string()
+        estimated = estimate_tokens(text)
+        throttled_ms = limiter.acquire(estimated) * 1000
+        start = time.perf_counter()
+        try:
+            message = client.invoke(messages, **kwargs)
+        except Exception:
+            self.record(name, (time.perf_counter() - start) * 1000, throttled_ms, None, error=True)
+            raise
+        usage = _usage(message)
+        limiter.settle(estimated, sum(usage.values()) if usage else None)
+        self.record(name, (time.perf_counter() - start) * 1000, throttled_ms, usage)
+        return message
+
+    def invoke(self, name: str, variables: Dict[str, Any], provider: str = "groq", parse_json: bool = True,
+               validate: Optional[Callable[[Any], Any]] = None, hedge: bool = LLM_HEDGE_ENABLED):
+        """
+        Run a precompiled prompt from PROMPTS; returns parsed JSON (passed through
+        `validate` when given, e.g. a Pydantic model_validate), or the raw message.
+        A hedged prompt whose answers all fail `validate` raises InvalidResponse (a
+        ValueError) and does not count against the providers' circuit breakers.
+        With hedge=False the JSON prompt goes to `provider` only.
+        """
+        messages = self.get_prompt(name).format_prompt(**variables)
+        if not parse_json:
+            return self.complete(name, messages, provider)
+
+        def parse(text: str):
+            data = get_parser().parse(text)
+            return validate(data) if validate else data
+
+        if hedge:
+            providers = [provider] + [p for p in LLM_HEDGE_PROVIDERS if p != provider]
+            return self.hedger.run(name, messages, parse, providers)
+        return parse(self.hedger.providers[provider](name, messages))
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            return {name: stats.summary() for name, stats in self._stats.items()}
+
+    def warm_up(self, provider: str = "groq"):
+        self.get_client(provider)
+        get_parser()
+        for name in PROMPTS:
+            self.get_prompt(name)
+
+
+@lru_cache(maxsize=None)
+def _build_prompt(name: str):
+    from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, PromptTemplate
+    system_file, human_template = PROMPTS[name]
+    messages = [
+        SystemMessagePromptTemplate(
+            prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", system_file), encoding="utf-8")
+        )
+    ]
+    if human_template:
+        messages.append(HumanMessagePromptTemplate(prompt=PromptTemplate.from_template(human_template)))
+    return ChatPromptTemplate.from_messages(messages)
+
+
+@lru_cache(maxsize=None)
+def get_parser():
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser()
+
+
+gateway = LLMGateway()
+gateway.register_provider("groq", _groq_client, GROQ_RPM, GROQ_TPM)
+gateway.register_provider("gemini", _gemini_client, GEMINI_RPM, GEMINI_TPM)
+
+
+if __name__ == "__main__":
+    from pprint import pprint
+
+    bucket = TokenBucket(rate=5, capacity=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    print(f"15 requests at 5/s with burst 5: {time.monotonic() - start:.2f} s (expected ~2.0 s)")
+    pprint(gateway.report())
@@ -0,0 +1,258 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import time
+import random
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PROVIDERS = [p.strip() for p in os.getenv("LLM_HEDGE_PROVIDERS", "groq,gemini").split(",") if p.strip()]
+# Hedge after the primary's p95 latency, within these bounds; the default applies until enough samples exist
+LLM_HEDGE_DELAY_MS = float(os.getenv("LLM_HEDGE_DELAY_MS", "1500"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "200"))
+LLM_HEDGE_MAX_DELAY_MS = float(os.getenv("LLM_HEDGE_MAX_DELAY_MS", "5000"))
+# Whole request gives up after a multiple of the slowest provider's p99, within these bounds
+LLM_HEDGE_MIN_TIMEOUT_S = float(os.getenv("LLM_HEDGE_MIN_TIMEOUT_S", "3"))
+LLM_HEDGE_MAX_TIMEOUT_S = float(os.getenv("LLM_HEDGE_MAX_TIMEOUT_S", "30"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))
+MIN_SAMPLES = 20
+
+
+class AllProvidersFailed(RuntimeError):
+    pass
+
+
+class InvalidResponse(ValueError):
+    """Providers answered, but no answer passed `parse` (e.g. failed schema validation)."""
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` consecutive failures, then open for `reset_timeout`
+    seconds; after that one trial call is let through (half-open) and its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LatencyTracker:
+    def __init__(self, maxlen: int = 200):
+        self.samples: Deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, ms: float):
+        with self._lock:
+            self.samples.append(ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < MIN_SAMPLES:
+                return None
+            return float(np.percentile(np.asarray(self.samples), q))
+
+
+class FakeProvider:
+    """
+    Stand-in provider for tests and local runs: answers `response` (a string or a
+    callable of the prompt) after `latency_ms` (+ jitter), or after `tail_ms` for a
+    `tail_rate` share of calls, failing with `error_rate`.
+    """
+
+    def __init__(self, response: Any = "{}", latency_ms: float = 50, jitter_ms: float = 0,
+                 tail_rate: float = 0.0, tail_ms: float = 0, error_rate: float = 0.0):
+        self.response = response
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def __call__(self, name: str, messages: Any) -> str:
+        self.calls += 1
+        latency_ms = self.tail_ms if random.random() < self.tail_rate else self.latency_ms
+        time.sleep((latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+        if random.random() < self.error_rate:
+            raise ConnectionError("fake provider failure")
+        return self.response(messages) if callable(self.response) else self.response
+
+
+class HedgedExecutor:
+    """
+    Send a structured prompt to the first provider; if it has not produced a valid answer
+    after its p95 latency, send the same prompt to the next one, and so on. The first
+    answer that passes `parse` wins; slower calls finish in the background and still feed
+    the latency and breaker statistics. Providers are callables (prompt name, messages) -> text.
+    """
+
+    def __init__(self, providers: Dict[str, Callable[[str, Any], str]], max_workers: int = 16):
+        self.providers = providers
+        self.breakers = {name: CircuitBreaker() for name in providers}
+        self.latency = {name: LatencyTracker() for name in providers}
+        self.wins = {name: 0 for name in providers}
+        self.hedges = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+
+    def set_provider(self, name: str, provider: Callable[[str, Any], str]):
+        self.providers[name] = provider
+        self.breakers.setdefault(name, CircuitBreaker())
+        self.latency.setdefault(name, LatencyTracker())
+        self.wins.setdefault(name, 0)
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self.latency[provider].percentile(95)
+        delay_ms = LLM_HEDGE_DELAY_MS if p95 is None else p95
+        return min(max(delay_ms, LLM_HEDGE_MIN_DELAY_MS), LLM_HEDGE_MAX_DELAY_MS) / 1000
+
+    def timeout(self, providers: Sequence[str]) -> float:
+        p99s = [p for p in (self.latency[name].percentile(99) for name in providers) if p is not None]
+        if not p99s:
+            return LLM_HEDGE_MAX_TIMEOUT_S
+        return min(max(3 * max(p99s) / 1000, LLM_HEDGE_MIN_TIMEOUT_S), LLM_HEDGE_MAX_TIMEOUT_S)
+
+    def _attempt(self, provider: str, name: str, messages: Any, parse: Callable[[str], Any]):
+        start = time.perf_counter()
+        try:
+            text = self.providers[provider](name, messages)
+        except Exception:
+            self.breakers[provider].record_failure()
+            raise
+        # The provider is up even if its answer is malformed: only transport errors and
+        # timeouts count against the breaker, invalid output just moves on to the next provider
+        self.latency[provider].add((time.perf_counter() - start) * 1000)
+        self.breakers[provider].record_success()
+        try:
+            return parse(text)
+        except Exception as e:
+            raise InvalidResponse(f"{provider} answered '{name}' with invalid output: {e}") from e
+
+    def run(self, name: str, messages: Any, parse: Callable[[str], Any],
+            providers: Optional[Sequence[str]] = None) -> Any:
+        order: List[str] = [p for p in (providers or list(self.providers)) if p in self.providers]
+        # Breakers are consulted only when a provider is about to be called, so a
+        # half-open trial slot is never claimed by a hedge that doesn't happen
+        remaining_providers = deque(order)
+        deadline = time.monotonic() + self.timeout(order)
+        pending = {}
+        errors = []
+        invalid = []
+        hedge_at = time.monotonic()
+        while True:
+            while remaining_providers and (not pending or time.monotonic() >= hedge_at):
+                provider = remaining_providers.popleft()
+                if not self.breakers[provider].allow():
+                    errors.append(f"{provider}: circuit open")
+                    continue
+                if pending:
+                    self.hedges += 1
+                    logger.info(f"[HEDGE] '{name}': no answer from {[*pending.values()]}, also asking {provider}")
+                pending[self._pool.submit(self._attempt, provider, name, messages, parse)] = provider
+                hedge_at = time.monotonic() + self.hedge_delay(provider)
+                break
+
+            if not pending:
+                if invalid:
+                    # At least one provider is reachable; let the caller fall back to another prompt
+                    raise InvalidResponse(f"No valid answer for '{name}': {invalid + errors}")
+                raise AllProvidersFailed(f"All LLM providers failed for '{name}': {errors}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No LLM answered '{name}' within the latency budget ({[*pending.values()]} pending)")
+            timeout = remaining
+            if remaining_providers:
+                timeout = min(timeout, max(0.0, hedge_at - time.monotonic()))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if isinstance(e, InvalidResponse):
+                        invalid.append(str(e))
+                    else:
+                        errors.append(f"{provider}: {e}")
+                    # A failed call hedges immediately instead of waiting out the delay
+                    hedge_at = time.monotonic()
+                    continue
+                self.wins[provider] += 1
+                return result
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "hedges": self.hedges,
+            "providers": {
+                name: {
+                    "breaker": self.breakers[name].state,
+                    "wins": self.wins[name],
+                    "p50_ms": self.latency[name].percentile(50),
+                    "p95_ms": self.latency[name].percentile(95),
+                }
+                for name in self.providers
+            },
+        }
+
+
+if __name__ == "__main__":
+    import json
+    from pprint import pprint
+
+    # Fast primary with a heavy tail (8% of calls take 3 s) and a slower, steady secondary
+    answer = json.dumps({"intent": "find python ai repos", "related_queries": []})
+    primary = FakeProvider(answer, latency_ms=150, jitter_ms=100, tail_rate=0.08, tail_ms=3000)
+    secondary = FakeProvider(answer, latency_ms=400, jitter_ms=100)
+
+    for label, providers in (("groq only", {"groq": primary}), ("hedged", {"groq": primary, "gemini": secondary})):
+        executor = HedgedExecutor(dict(providers))
+        latencies = []
+        for _ in range(100):
+            start = time.perf_counter()
+            executor.run("understand", "query", json.loads)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<10} p50 {np.percentile(latencies, 50):6.0f} ms  p95 {np.percentile(latencies, 95):6.0f} ms  "
+              f"p99 {np.percentile(latencies, 99):6.0f} ms")
+        pprint(executor.report())
@@ -4,11 +4,12 @@ import re
 import string
 import json
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, field_validator
+from cachetools import TTLCache
 from enum import Enum
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 from datetime import timedelta, date
-from  openai import AzureOpenAI
+import threading
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,16 +19,21 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # from langchain_mistralai import ChatMistralAI
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from src.llm.utils import github_text_search, format_example_for_prompt
+from src.llm.utils import format_example_for_prompt
+from src.llm.examples import search_examples, get_example_retriever, FEW_SHOT_SOURCE
+from src.llm.gateway import gateway, get_parser, PROMPTS
+from src.llm.fast_parser import parse_query_fast, FAST_PARSE_ENABLED, FAST_PARSE_THRESHOLD
+from src.llm.hedging import AllProvidersFailed, InvalidResponse
 
 
 # ===== ENV =====
 load_dotenv()
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
 MISTRAL_API_KEY = os.environ.get('MISTRAL_API_KEY')
+# One completion returns filters, rewrite, intent and related queries; false falls back to
+# the separate preprocess / intent / related-query prompts
+LLM_COMBINED_QUERY = os.getenv("LLM_COMBINED_QUERY", "true").lower() in ("1", "true", "yes")
+QUERY_UNDERSTANDING_TTL = int(os.getenv("QUERY_UNDERSTANDING_TTL", "300"))
 
 # ===== PREPROCESS QUERY =====
 def preprocess_query(query: str) -> str:
@@ -38,16 +44,19 @@ def preprocess_query(query: str) -> str:
     return query
 
 # ===== CONFIG LLM =====
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is required")
+# Clients, compiled prompts, rate limiting and per-prompt accounting live in the gateway;
+# these wrappers keep the names older callers import.
+def get_llm():
+    return gateway.get_client("groq")
 
-llm = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model="llama-3.1-8b-instant",  
-    temperature=0.5
-)
+def get_prompt(name: str):
+    return gateway.get_prompt(name)
 
-parser = JsonOutputParser()
+def warm_up():
+    """Build the Groq client, parser, every prompt template and the few-shot index ahead of the first request."""
+    gateway.warm_up("groq")
+    if FEW_SHOT_SOURCE == "local":
+        get_example_retriever()
 
 # ===== PYDANTIC SCHEMAS =====
 class SearchMethodEnum(str, Enum):
@@ -61,17 +70,50 @@ class SearchMethodRequest(BaseModel):
 class RelatedQueries(BaseModel):
     related_queries: List[str]
 
-# ===== PROMPT: LLM PREPROCESS =====
-prompt_method = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate(
-        prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", "llm_fielter_process.txt"), encoding="utf-8")
-    ),
-    HumanMessagePromptTemplate(
-        prompt=PromptTemplate.from_template("Query: {query}")
-    )
-])
+class QueryFilters(BaseModel):
+    language: Optional[str] = None
+    libraries: List[str] = []
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    stars_min: Optional[int] = None
+    topics: List[str] = []
+
+    @field_validator("libraries", "topics", mode="before")
+    @classmethod
+    def _null_to_list(cls, value):
+        if value is None:
+            return []
+        return [value] if isinstance(value, str) else value
+
+class QueryUnderstanding(RelatedQueries):
+    """Everything a search request needs from the LLM, produced by one completion."""
+    filters: QueryFilters = QueryFilters()
+    rewritten_query: str = ""
+    query_vector_required: bool = True
+    intent: str
+    intent_reasoning: str = ""
+    llm_thinking: str = ""
+    # False for rule-based answers: their intent is the bare rewritten query, which drops
+    # the star/date filters, so two queries differing only in filters would share a cache key
+    semantic_cache: bool = True
+
+    @field_validator("rewritten_query", "intent_reasoning", "llm_thinking", mode="before")
+    @classmethod
+    def _null_to_str(cls, value):
+        return value or ""
+
+    def parse_query(self) -> dict:
+        """Same shape as the `llm_preprocess` result, for code that consumes that dict."""
+        return {
+            "intent": self.intent,
+            "llm_thinking": self.llm_thinking,
+            "filters": self.filters.model_dump(),
+            "query_vector_required": self.query_vector_required,
+            "rewritten_query": self.rewritten_query,
+        }
 
-def llm_preprocess(query: str) -> Tuple[str, dict]: 
+# ===== PROMPT: LLM PREPROCESS =====
+def _preprocess_inputs(query: str) -> dict:
     current_date = date.today()
     formatted_current_date = current_date.strftime("%Y-%m-%d")
     date_7_days_ago = (current_date - timedelta(days=7)).strftime("%Y-%m-%d")
@@ -79,11 +121,11 @@ def llm_preprocess(query: str) -> Tuple[str, dict]:
     date_90_days_ago = (current_date - timedelta(days=90)).strftime("%Y-%m-%d")
     date_365_days_ago = (current_date - timedelta(days=365)).strftime("%Y-%m-%d")
 
-    github_example = github_text_search(query, top_k=3)
+    github_example = search_examples(query, top_k=3)
     github_formatted_prompt = format_example_for_prompt(github_example)
     cleaned_query = preprocess_query(query)
 
-    input_vars = {
+    return {
         "query": cleaned_query,
         "current_date_str": formatted_current_date, 
         "date_90_days_ago": date_90_days_ago,
@@ -93,32 +135,22 @@ def llm_preprocess(query: str) -> Tuple[str, dict]:
         "github_example": github_formatted_prompt
     }
 
-    # Debug prompt
-    formatted_prompt = prompt_method.format(**input_vars)
+def llm_preprocess(query: str) -> Tuple[str, dict]: 
+    input_vars = _preprocess_inputs(query)
 
+    # Debug prompt
+    formatted_prompt = get_prompt("preprocess").format(**input_vars)
 
-    chain = prompt_method | llm | parser
-    result = chain.invoke(input_vars)
+    result = gateway.invoke("preprocess", input_vars)
 
     print("===== PROMPT INPUT TO LLM =====")
     print(formatted_prompt) 
     return query, result
 
 # ===== PROMPT: QUERY GENERATE RELATED =====
-prompt_generate = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate(
-        prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", "query_generate.txt"), encoding="utf-8")
-    ),
-    HumanMessagePromptTemplate(
-        prompt=PromptTemplate.from_template("Given the input query: '{query}'")
-    )
-])
-
 def query_generate_related(query: str) -> Tuple[str, RelatedQueries]:
     cleaned_query = preprocess_query(query)
-    chain = prompt_generate | llm | parser
-
-    raw_result = chain.invoke({"query": cleaned_query})
+    raw_result = gateway.invoke("generate", {"query": cleaned_query})
 
     # print("🔍 Raw result from LLM (query_generate_related):", raw_result)
     # print("📄 Type of result:", type(raw_result))
@@ -139,38 +171,102 @@ def query_generate_related(query: str) -> Tuple[str, RelatedQueries]:
     related_request = RelatedQueries(related_queries=parsed_result["related_queries"])
     return query, related_request
 
-# ===== PROMPT: FILTER GENERATION =====
-prompt_filter = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate(
-        prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", "filter_generate.txt"), encoding="utf-8")
-    ),
-    HumanMessagePromptTemplate(
-        prompt=PromptTemplate.from_template("Given the input query: {query}")
+# ===== PROMPT: COMBINED QUERY UNDERSTANDING =====
+_understanding_cache = TTLCache(maxsize=1024, ttl=QUERY_UNDERSTANDING_TTL)
+_understanding_lock = threading.Lock()
+
+def _legacy_understanding(query: str) -> QueryUnderstanding:
+    _, parse_query = llm_preprocess(query)
+    rewritten_query = parse_query.get("rewritten_query") or query
+    intent_obj = agent_intent_query(rewritten_query)
+    try:
+        _, related = query_generate_related(query)
+        related_queries = related.related_queries
+    except Exception as e:
+        logger.warning(f"Failed to generate related queries: {e}")
+        related_queries = []
+    return QueryUnderstanding(
+        filters=parse_query.get("filters") or {},
+        rewritten_query=parse_query.get("rewritten_query"),
+        query_vector_required=parse_query.get("query_vector_required", True),
+        llm_thinking=parse_query.get("llm_thinking"),
+        intent=intent_obj.get("intent", "") if isinstance(intent_obj, dict) else str(intent_obj),
+        intent_reasoning=intent_obj.get("reasoning", "") if isinstance(intent_obj, dict) else "",
+        related_queries=related_queries,
+    )
+
+def _fast_understanding(fast, query: str) -> QueryUnderstanding:
+    return QueryUnderstanding(
+        filters=fast.filters,
+        rewritten_query=fast.rewritten_query,
+        query_vector_required=fast.query_vector_required,
+        intent=fast.rewritten_query or query,
+        related_queries=[],
+        semantic_cache=False,
     )
-])
 
+def llm_understand_query(query: str) -> Tuple[str, QueryUnderstanding]:
+    """
+    Filters, rewritten query, vector flag, cache intent and related queries from one LLM
+    completion, validated with QueryUnderstanding. Results are kept for
+    QUERY_UNDERSTANDING_TTL seconds, so every step of a request (and repeated queries)
+    share a single round trip. An invalid combined answer falls back to the separate prompts.
+
+    Queries the rule-based parser understands with confidence >= FAST_PARSE_THRESHOLD skip
+    the LLM entirely; they get no related queries and bypass the semantic cache.
+    When every LLM provider fails or times out, the fast parse is used whatever its
+    confidence (and is not cached).
+    """
+    key = preprocess_query(query)
+    with _understanding_lock:
+        cached = _understanding_cache.get(key)
+    if cached is not None:
+        return query, cached
+
+    fast = parse_query_fast(query) if FAST_PARSE_ENABLED else None
+    if fast is not None and fast.confidence >= FAST_PARSE_THRESHOLD:
+        logger.info(f"Fast-path parse (confidence {fast.confidence}), skipping LLM: {fast.filters}")
+        understanding = _fast_understanding(fast, key)
+    else:
+        try:
+            if LLM_COMBINED_QUERY:
+                try:
+                    understanding = gateway.invoke("understand", _preprocess_inputs(query),
+                                                   validate=QueryUnderstanding.model_validate)
+                except (ValidationError, InvalidResponse, ValueError) as e:
+                    logger.warning(f"Combined query understanding failed validation, using separate prompts: {e}")
+                    understanding = _legacy_understanding(query)
+            else:
+                understanding = _legacy_understanding(query)
+        except (AllProvidersFailed, InvalidResponse, TimeoutError) as e:
+            if fast is None:
+                raise
+            logger.warning(f"LLM unavailable ({e}), using the rule-based parse (confidence {fast.confidence})")
+            return query, _fast_understanding(fast, key)
+
+    with _understanding_lock:
+        _understanding_cache[key] = understanding
+    return query, understanding
+
+# ===== PROMPT: FILTER GENERATION =====
 def llm_filter_generate(query: str) -> RelatedQueries:
     cleaned_query = preprocess_query(query)
-    chain = prompt_filter | llm | parser
-    result = chain.invoke({"query": cleaned_query})
+    result = gateway.invoke("filter", {"query": cleaned_query})
     return result
 
 # ===== PROMPT: EVALUATION =====
-evaluation_prompt = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate(
-        prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", "llm_evaluate_process.txt"), encoding="utf-8")
-    )
-])
-
-def evaluate_rewrite(original_query: str, rewritten_query: str) -> Tuple[bool, str]:
+def evaluate_rewrite(original_query: str, rewritten_query: str, strict: bool = False) -> Tuple[bool, str]:
+    """
+    LLM judgement of a rewrite as (label, reason). An unparseable answer is a False label,
+    or, with `strict`, a ValueError, so callers like the evaluation runner can retry it.
+    """
     if not rewritten_query.strip():
         return False, "Rewritten query is empty, likely too vague or generic."
 
-    chain = evaluation_prompt | llm  
-    result = chain.invoke({
+    result = gateway.invoke("evaluate", {
         "original_query": original_query,
         "rewritten_query": rewritten_query
-    })
+    }, parse_json=False)
 
     try:
         # Handle different types of result.content
@@ -184,49 +280,19 @@ def evaluate_rewrite(original_query: str, rewritten_query: str) -> Tuple[bool, s
             parsed = {"label": False, "reason": f"Unexpected content type: {type(result.content)}"}
         return parsed["label"], parsed["reason"]
     except Exception as e:
+        if strict:
+            raise ValueError(f"Unparseable evaluation answer: {e}") from e
         return False, f"LLM evaluation failed: {str(e)}"
 
 # ===== BATCH RUN FOR EVALUATION =====
-def run_batch(json_file_path: str):
-    with open(json_file_path, "r", encoding="utf-8") as f:
-        test_items = json.load(f)
-
-    results = []
-
-    for item in test_items:
-        query_id = item.get("id")
-        query_text = item.get("query")
-
-        print(f"🟡 Processing (ID {query_id}): {query_text}")
-        original, output = llm_preprocess(query_text)
-        rewritten_query = output.get("rewritten_query", "")
-
-        try:
-            label, thinking = evaluate_rewrite(original, rewritten_query)
-        except Exception as e:
-            label = False
-            thinking = f"LLM evaluation failed: {str(e)}"
-
-        result = {
-            "id": query_id,
-            "original_query": original,
-            "rewritten_query": rewritten_query,
-            "true_label": label,
-            "llm_evaluate_think": thinking,
-            "llm_output": output
-        }
-
-        results.append(result)
-
-        print(f"✅ Query: {original}")
-        print(f"🔁 Rewritten: {rewritten_query}")
-        print(f"🧠 LLM Thinking: {thinking}")
-        print(f"🏷️ Label: {'True' if label else 'False'}")
-        print("-" * 50)
-
-    with open("llm_rewrite_evaluation_v2.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-
+def run_batch(json_file_path: str, output_path: Optional[str] = None, concurrency: Optional[int] = None):
+    """
+    Rewrite and judge every query of `json_file_path`; see src/llm/evaluation.py. Results
+    are appended to a JSONL file as they finish, so a rerun skips what is already done.
+    """
+    from src.llm.evaluation import run_evaluation, summarize_results, print_summary, EVAL_OUTPUT_PATH, EVAL_CONCURRENCY
+    results = run_evaluation(json_file_path, output_path or EVAL_OUTPUT_PATH, concurrency or EVAL_CONCURRENCY)
+    print_summary(summarize_results(results))
     return results
 
 # ===== PROMPT: AGENT INTENT QUERY FOR CACHE =====
@@ -235,15 +301,6 @@ def agent_intent_query(query: str) -> dict:
     Calls LLM to extract intent and reasoning from a query.
     Returns a dict with 'intent' and 'reasoning' fields.
     """
-    prompt = ChatPromptTemplate.from_messages([
-        SystemMessagePromptTemplate(
-            prompt=PromptTemplate.from_file(os.path.join(BASE_DIR, "prompt_helpers", "agent_intent_query.txt"), encoding="utf-8")
-        ),
-        HumanMessagePromptTemplate(
-            prompt=PromptTemplate.from_template("Given the input query: {query}")
-        )
-    ])
-    
     # llm_agent = ChatMistralAI(
     #     api_key=MISTRAL_API_KEY,
     #     model_name="mistral-small-latest",
@@ -252,9 +309,7 @@ def agent_intent_query(query: str) -> dict:
     #     top_p=0.95
     # )
     
-    chain = prompt | llm | parser
-    result = chain.invoke({"query": query})
-    return result
+    return gateway.invoke("intent", {"query": query})
 
 
 
@@ -296,15 +351,8 @@ Example output:
         if not GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY not available")
             
-        # Use Groq for description generation
-        groq_llm = ChatGroq(
-            api_key=GROQ_API_KEY,
-            model="llama-3.1-8b-instant",
-            temperature=0.3  # Lower temperature for more consistent output
-        )
-        
-        # Get response from Groq
-        response = groq_llm.invoke(prompt)
+        # Shared Groq client; lower temperature for more consistent output
+        response = gateway.complete("shortdes", prompt, temperature=0.3)
         
         # Handle different response formats
         if hasattr(response, 'content'):
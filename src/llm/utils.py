@@ -1,22 +1,26 @@
 import os
 import sys
 import json
-from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.azure_client.config import github_ex_client, model
-from typing import List, Dict, Any
+from src.azure_client.config import get_github_ex_client
+from src.data.rank_fields import to_epoch_days
+from typing import List, Dict, Any, Optional
 import re
 
 from src.llm.client import LLMClient
+from src.llm.gateway import gateway
 
-client = LLMClient()
+
+def get_llm_client() -> LLMClient:
+    """Shared Gemini client from the LLM gateway, created on first use (it requires GOOGLE_API_KEY)."""
+    return gateway.get_client("gemini")
 
 def normalize_query(query: str) -> str:
     query = query.strip().lower()
     return re.sub(r'\s+', ' ', query) 
 
 def github_text_search(query: str, top_k: int = 3) -> List[Dict[str,Any]]:
-    results = github_ex_client.search(search_text=normalize_query(query), top=top_k)
+    results = get_github_ex_client().search(search_text=normalize_query(query), top=top_k)
     example_result =[]
     for result in results:
         example_result.append(result)
@@ -61,24 +65,22 @@ def filter_results(results: List[Dict[str, Any]], filters: Dict[str, Any]) -> Li
     created_before = filters.get("created_before")
     stars_min = filters.get("stars_min")
 
-    def parse_date(date_str):
-        try:
-            return datetime.strptime(date_str[:10], "%Y-%m-%d")
-        except Exception:
-            return None
-
-    after_date = parse_date(created_after) if created_after else None
-    before_date = parse_date(created_before) if created_before else None
+    # Compare as days since epoch; documents indexed with `created_days` need no parsing
+    after_days = to_epoch_days(created_after) if created_after else None
+    before_days = to_epoch_days(created_before) if created_before else None
 
     filtered = []
     for item in results:
-        created_at = parse_date(item.get("date", ""))
-        stars = item.get("meta_data", {}).get("stars", 0)
+        created_days = item.get("created_days")
+        if created_days is None and (after_days is not None or before_days is not None):
+            created_days = to_epoch_days(item.get("date", ""))
+        # Index documents carry stars at the top level, Cosmos documents under meta_data
+        stars = item.get("meta_data", {}).get("stars", item.get("stars", 0))
 
-        if after_date and (not created_at or created_at < after_date):
+        if after_days is not None and (created_days is None or created_days < after_days):
             continue
 
-        if before_date and (not created_at or created_at > before_date):
+        if before_days is not None and (created_days is None or created_days > before_days):
             continue
 
         if stars_min is not None and (stars is None or stars < stars_min):
@@ -89,7 +91,7 @@ def filter_results(results: List[Dict[str, Any]], filters: Dict[str, Any]) -> Li
     return filtered
 
 def parse_user_query(search_query: str) -> dict:
-    parsed = client.preprocessing(search_query)
+    parsed = get_llm_client().preprocessing(search_query)
     return {
         "final_query": parsed.get("rewritten_query", search_query).strip(),
         "query_vector_required": parsed.get("query_vector_required", True),
@@ -100,7 +102,7 @@ def parse_user_query(search_query: str) -> dict:
 
 def suggest_filter(query: str):
     try:
-        return {"related_queries": client.generate_filter_chips(query)}
+        return {"related_queries": get_llm_client().generate_filter_chips(query)}
     except Exception as e:
         print(f"⚠️ Failed to suggest filters: {e}")
         return {"related_queries": []}
@@ -4,9 +4,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 
 import logging
 from typing import List, Dict, Any
-from src.qdrant.config import qd_client, COLLECTION_NAME, EMBEDDING_SIZE
+from src.qdrant.config import get_qdrant_client, COLLECTION_NAME, EMBEDDING_SIZE
 from src.qdrant.push_data import load_data, push_points
-from src.qdrant.qdrant_search import search_query, full_text_search, hybrid_search_func, get_data_from_collection
+from src.qdrant.qdrant_search import search_query, full_text_search, hybrid_search as hybrid_search_func, get_data_from_collection
 
 
 logging.basicConfig(level=logging.INFO)
@@ -15,11 +15,11 @@ logger = logging.getLogger(__name__)
 class QdrantClientWrapper:
     def __init__(
         self,
-        client=qd_client,
+        client=None,
         collection_name: str = COLLECTION_NAME,
         embedding_size: int = EMBEDDING_SIZE
     ):
-        self.client = client
+        self.client = client if client is not None else get_qdrant_client()
         self.collection_name = collection_name
         self.embedding_size = embedding_size
 
@@ -99,7 +99,7 @@ class QdrantClientWrapper:
 
     def get_collection_info(self) -> Dict[str, Any]:
         try:
-            points, _ = qd_client.scroll(collection_name=COLLECTION_NAME, limit=10, with_payload=True)
+            points, _ = get_qdrant_client().scroll(collection_name=COLLECTION_NAME, limit=10, with_payload=True)
             for point in points:
                 print(point.payload)
             return get_data_from_collection()
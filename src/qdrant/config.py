@@ -1,26 +1,64 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+import threading
 from dotenv import load_dotenv
+from src.embedding.registry import KNOWN_DIMENSIONS, get_encoder, registry
 load_dotenv()
 
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME","data")
-EMBEDDING_SIZE = 1024
+EMBEDDING_MODEL_NAME = os.getenv("QDRANT_EMBEDDING_MODEL", "BAAI/bge-large-en-v1.5")
+EMBEDDING_SIZE = int(os.getenv("QDRANT_EMBEDDING_SIZE", KNOWN_DIMENSIONS.get(EMBEDDING_MODEL_NAME, 1024)))
 
-# Create Client
-qd_client = QdrantClient(
-    url=QDRANT_URL, 
-    api_key=QDRANT_API_KEY
-)
-collections = qd_client.get_collections()
-# print("✅ Connected to Qdrant Cloud.")
-# print("📦 Existing collections:", [c.name for c in collections.collections])
+# The client is created on first use and the encoder comes from the shared model
+# registry; importing this module from a service that never touches Qdrant costs nothing.
+# Setting QDRANT_EMBEDDING_MODEL=BAAI/bge-small-en-v1.5 lets Qdrant share the Azure encoder.
+_qd_client = None
+_qd_client_lock = threading.Lock()
 
-# Embedding model 
-embedding_model = SentenceTransformer("BAAI/bge-large-en-v1.5")
-print(embedding_model)
 
+def get_qdrant_client():
+    global _qd_client
+    if _qd_client is None:
+        with _qd_client_lock:
+            if _qd_client is None:
+                from qdrant_client import QdrantClient
+                _qd_client = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY
+                )
+    return _qd_client
+
+
+def get_embedding_model():
+    return get_encoder(EMBEDDING_MODEL_NAME)
+
+
+def check_collection_dimension() -> int:
+    """Fail fast when the encoder does not match the vector size of the collection."""
+    client = get_qdrant_client()
+    expected = EMBEDDING_SIZE
+    if client.collection_exists(COLLECTION_NAME):
+        vectors = client.get_collection(COLLECTION_NAME).config.params.vectors
+        # Unnamed vectors expose .size; named vectors are a dict of VectorParams
+        expected = vectors.size if hasattr(vectors, "size") else next(iter(vectors.values())).size
+    return registry.check_dimension(EMBEDDING_MODEL_NAME, expected, f"Qdrant collection '{COLLECTION_NAME}'")
+
+
+def warm_up(model: bool = True):
+    """Connect to Qdrant (fails fast on a bad URL or key) and optionally load the encoder."""
+    get_qdrant_client().get_collections()
+    if model:
+        get_embedding_model()
+        check_collection_dimension()
+
+
+# Backwards compatible `from src.qdrant.config import qd_client` for scripts
+def __getattr__(name):
+    if name == "qd_client":
+        return get_qdrant_client()
+    if name == "embedding_model":
+        return get_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,7 +2,7 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from src.qdrant.config import embedding_model
+from src.qdrant.config import get_embedding_model
 from typing import Union, List
 import logging
 
@@ -20,7 +20,7 @@ def embed_texts(texts: Union[str, List[str]], batch_size: int = 32) -> List[List
         embeddings = []
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
-            batch_embeddings = embedding_model.encode(batch, convert_to_numpy=True)
+            batch_embeddings = get_embedding_model().encode(batch, convert_to_numpy=True)
             embeddings.extend(batch_embeddings.tolist())
         return embeddings
     except Exception as e:
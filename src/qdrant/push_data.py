@@ -6,7 +6,7 @@ import json
 import uuid
 from typing import List, Dict, Any, Optional
 from qdrant_client.models import PointStruct
-from src.qdrant.config import qdrant_client, COLLECTION_NAME
+from src.qdrant.config import get_qdrant_client, COLLECTION_NAME
 from src.qdrant.embedding_vec import embed_texts
 import logging
 
@@ -52,7 +52,7 @@ def push_points(data: List[Dict[str, Any]]) -> None:
         return
 
     # check collection exist
-    if not qdrant_client.collection_exists(COLLECTION_NAME):
+    if not get_qdrant_client().collection_exists(COLLECTION_NAME):
         logger.error(f"Collection '{COLLECTION_NAME}' does not exist")
         raise ValueError(f"Collection '{COLLECTION_NAME}' does not exist")
 
@@ -69,7 +69,7 @@ def push_points(data: List[Dict[str, Any]]) -> None:
         for embedding, doc in zip(embeddings, docs)
     ]
     try:
-        qdrant_client.upsert(
+        get_qdrant_client().upsert(
             collection_name=COLLECTION_NAME,
             points=points
         )
@@ -2,28 +2,36 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from typing import List, Dict, Any
-from src.qdrant.config import qdrant_client, COLLECTION_NAME
+from typing import List, Dict, Any, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from src.qdrant.config import get_qdrant_client, COLLECTION_NAME
 from src.qdrant.embedding_vec import embed_texts
-from qdrant_client.models import MatchText, FieldCondition, Filter
+from qdrant_client.models import MatchText, FieldCondition, Filter, Prefetch, FusionQuery, Fusion
+import heapq
 import re
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Standard RRF damping constant (Cormack et al.); larger values flatten the rank curve
+RRF_K = 60
+
+# Shared pool for running the vector and text legs of the client-side hybrid search
+_leg_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="qdrant-hybrid")
+
 def normalize_query(query: str) -> str:
     query = query.strip().lower()
     return re.sub(r'\s+', ' ', query) 
 
 
 def search_query(query: str, limit: int = 5) -> List[Dict[str, Any]]:
-    if not qdrant_client.collection_exists(COLLECTION_NAME):
+    if not get_qdrant_client().collection_exists(COLLECTION_NAME):
         logger.error(f"Collection {COLLECTION_NAME} does not exist")
     normalized_query = normalize_query(query)
     try:
         query_vec = embed_texts([normalized_query])[0]  
-        hits = qdrant_client.search(
+        hits = get_qdrant_client().search(
             collection_name=COLLECTION_NAME,
             query_vector=query_vec,
             limit=limit
@@ -35,7 +43,7 @@ def search_query(query: str, limit: int = 5) -> List[Dict[str, Any]]:
         return []
 
 def full_text_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
-    if not qdrant_client.collection_exists(COLLECTION_NAME):
+    if not get_qdrant_client().collection_exists(COLLECTION_NAME):
         logger.error(f"Collection {COLLECTION_NAME} does not exist")
         return []
     normalized_query = normalize_query(query)
@@ -43,7 +51,7 @@ def full_text_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
         text_filter = Filter(
             must=[FieldCondition(key="text", match=MatchText(text=normalized_query))]
         )
-        scroll_result, _ = qdrant_client.scroll(
+        scroll_result, _ = get_qdrant_client().scroll(
             collection_name=COLLECTION_NAME,
             scroll_filter=text_filter,
             limit=limit,
@@ -60,54 +68,161 @@ def full_text_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
         return []
 
 
-def hybrid_search(query: str, limit: int = 5, alpha: float = 0.5) -> List[Dict[str, Any]]:
-   
-    vector_results = search_query(query, limit=limit * 2)  
-    text_results = full_text_search(query, limit=limit * 2)
-
-    def get_key(r):
-        return r["payload"].get("id") or r["payload"].get("url") or str(r["payload"])
-
-    combined = {}
-
-    for r in vector_results:
-        key = get_key(r)
-        combined[key] = {
-            "payload": r["payload"],
-            "score_vector": r["score"],
-            "score_text": 0.0
-        }
-
-    for r in text_results:
-        key = get_key(r)
-        if key in combined:
-            combined[key]["score_text"] = r["score"]
-        else:
-            combined[key] = {
-                "payload": r["payload"],
-                "score_vector": 0.0,
-                "score_text": r["score"]
-            }
-
-    hybrid_results = []
-    for v in combined.values():
-        score_hybrid = alpha * v["score_vector"] + (1 - alpha) * v["score_text"]
-        hybrid_results.append({
-            "payload": v["payload"],
-            "score": score_hybrid
-        })
-
-    hybrid_results.sort(key=lambda x: x["score"], reverse=True)
-    return hybrid_results[:limit]
+def _result_key(r: Dict[str, Any]) -> str:
+    payload = r["payload"]
+    return str(payload.get("id") or payload.get("url") or payload)
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Dict[str, Any]]],
+    limit: int,
+    weights: Optional[Sequence[float]] = None,
+    k: int = RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists with Reciprocal Rank Fusion: score = sum(w / (k + rank)).
+    Only ranks are used, so legs with incomparable scores (cosine vs. text match) mix safely.
+    The top `limit` results are selected with a heap instead of sorting every candidate.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    scores: Dict[str, float] = {}
+    payloads: Dict[str, Any] = {}
+
+    for results, weight in zip(result_lists, weights):
+        # A zero-weight leg contributes nothing, not even zero-score filler results
+        if weight <= 0:
+            continue
+        for rank, r in enumerate(results, start=1):
+            key = _result_key(r)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            payloads.setdefault(key, r["payload"])
+
+    top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    return [{"payload": payloads[key], "score": score} for key, score in top]
+
+
+def server_side_hybrid_search(query: str, limit: int = 5, prefetch_limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Hybrid search in a single round trip with `query_points`: a dense prefetch over the whole
+    collection and a dense prefetch restricted to points whose `text` matches the query,
+    fused by Qdrant with RRF.
+    """
+    normalized_query = normalize_query(query)
+    prefetch_limit = prefetch_limit or limit * 2
+    query_vec = embed_texts([normalized_query])[0]
+    text_filter = Filter(
+        must=[FieldCondition(key="text", match=MatchText(text=normalized_query))]
+    )
+    response = get_qdrant_client().query_points(
+        collection_name=COLLECTION_NAME,
+        prefetch=[
+            Prefetch(query=query_vec, limit=prefetch_limit),
+            Prefetch(query=query_vec, filter=text_filter, limit=prefetch_limit),
+        ],
+        query=FusionQuery(fusion=Fusion.RRF),
+        limit=limit,
+        with_payload=True
+    )
+    return [{"score": point.score, "payload": point.payload} for point in response.points]
+
+
+def hybrid_search(query: str, limit: int = 5, alpha: float = 0.5, server_side: bool = True) -> List[Dict[str, Any]]:
+    """
+    Hybrid vector + full-text search fused with Reciprocal Rank Fusion.
+
+    `alpha` weights the vector leg against the text leg (1.0 = vector only, 0.0 = text
+    only, 0.5 = equal weight). server_side=True runs both legs inside Qdrant (prefetch +
+    fusion) in one request and falls back to the client-side path if the server doesn't
+    support it. Qdrant's RRF weights its prefetches equally, so any other `alpha` always
+    uses the client-side path, which runs both legs concurrently and fuses them locally.
+    """
+    if not 0.0 <= alpha <= 1.0:
+        raise ValueError(f"alpha must be between 0 and 1, got {alpha}")
+    if server_side and alpha == 0.5:
+        try:
+            return server_side_hybrid_search(query, limit=limit)
+        except Exception as e:
+            logger.warning(f"Server-side fusion failed, using client-side fusion: {str(e)}")
+
+    vector_future = _leg_executor.submit(search_query, query, limit * 2)
+    text_future = _leg_executor.submit(full_text_search, query, limit * 2)
+    vector_results = vector_future.result()
+    text_results = text_future.result()
+
+    return reciprocal_rank_fusion(
+        [vector_results, text_results],
+        limit=limit,
+        weights=[2 * alpha, 2 * (1 - alpha)]
+    )
     
 def get_data_from_collection() -> Dict[str, Any]:
     try:
-        info = qdrant_client.get_collection(collection_name=COLLECTION_NAME)
+        info = get_qdrant_client().get_collection(collection_name=COLLECTION_NAME)
         return vars(info)
     except Exception as e:
         logger.error(f"Error getting collection info: {str(e)}")
         return {}
 
+def _self_check():
+    """
+    Run both fusion paths against an in-memory Qdrant with a toy bag-of-words encoder:
+    python src/qdrant/qdrant_search.py --self-check
+    """
+    global COLLECTION_NAME, embed_texts
+    import hashlib
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    import src.qdrant.config as qdrant_config
+
+    def toy_embed(texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 16
+            for word in normalize_query(text).split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 16] += 1.0
+            vectors.append(vector)
+        return vectors
+
+    docs = [
+        "vector search engine in rust", "semantic search with python", "python web framework",
+        "search ui components", "rust web server", "image classification with pytorch",
+        "full text search engine", "python data visualization",
+    ]
+    client = QdrantClient(":memory:")
+    qdrant_config._qd_client = client
+    COLLECTION_NAME, embed_texts = "hybrid_self_check", toy_embed
+    client.create_collection(COLLECTION_NAME, vectors_config=VectorParams(size=16, distance=Distance.COSINE))
+    client.upsert(COLLECTION_NAME, points=[
+        PointStruct(id=i, vector=vector, payload={"id": i, "text": text})
+        for i, (text, vector) in enumerate(zip(docs, toy_embed(docs)))
+    ])
+
+    query, limit = "search engine", 4
+    ids = lambda results: [r["payload"]["id"] for r in results]
+    vector_leg, text_leg = search_query(query, limit * 2), full_text_search(query, limit * 2)
+
+    server = server_side_hybrid_search(query, limit=limit)
+    assert len(server) == limit, server
+    # Docs containing the query text appear in both prefetches and must lead the fused list
+    matching = {i for i, text in enumerate(docs) if query in text}
+    assert set(ids(server)[:len(matching)]) == matching, (ids(server), matching)
+
+    assert ids(hybrid_search(query, limit, alpha=1.0)) == ids(vector_leg)[:limit]
+    assert ids(hybrid_search(query, limit, alpha=0.0)) == ids(text_leg)[:limit]
+    assert ids(hybrid_search(query, limit)) == ids(server)
+    assert ids(hybrid_search(query, limit, server_side=False)) == ids(reciprocal_rank_fusion([vector_leg, text_leg], limit))
+    try:
+        hybrid_search(query, limit, alpha=1.5)
+        raise AssertionError("alpha outside [0, 1] was accepted")
+    except ValueError:
+        pass
+    print(f"✅ Hybrid search self-check passed: server-side {ids(server)}, "
+          f"alpha=1 {ids(vector_leg)[:limit]}, alpha=0 {ids(text_leg)[:limit]}")
+
+
+if __name__ == "__main__" and "--self-check" in sys.argv:
+    _self_check()
+
 # Test
 # if __name__ == "__main__":
 #     query = "search engine"